@@ -29,6 +29,7 @@ class ProfileInLine(admin.StackedInline):
     """
 
     model: Type[Model] = Profile
+    readonly_fields: list = ["following_count", "followers_count", "dweet_count"]
 
 
 @admin.register(User)
@@ -4,6 +4,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/ref/applications/
 """
 from django.apps import AppConfig
+from django.core import checks
 
 
 class DwitterConfig(AppConfig):
@@ -16,3 +17,10 @@ class DwitterConfig(AppConfig):
 
     default_auto_field: str = "django.db.models.BigAutoField"
     name: str = "dwitter"
+
+    def ready(self) -> None:
+        """Register the system checks, see dwitter.checks."""
+        # imported here as the checks read the settings
+        from .checks import check_sharded_features  # pylint: disable=import-outside-toplevel
+
+        checks.register(check_sharded_features)
@@ -0,0 +1 @@
+"""SQLite backend tuned for concurrent readers and writers, see dwitter.backends.sqlite3.base."""
@@ -0,0 +1,57 @@
+"""Bulk loading helpers for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/ref/models/querysets/#bulk-create
+
+bulk_create skips save() and with it every post_save/m2m_changed receiver in dwitter.models, which is what makes
+loading millions of rows fast, but also means the profiles, self follows, counters and timelines those receivers
+maintain have to be written by the loader itself.  Loaders are expected to finish with TimelineEntry.objects.rebuild
+(or the rebuild_timelines command) and correct counters, e.g. from repair_profile_counters.  Dweet.created_at only
+defaults to now, so the created_at set on the loaded Dweets is kept.
+"""
+from typing import Dict, List
+
+from django.db.models import Model
+
+from .models import Profile
+
+
+def create_profiles(profiles: List[Profile], batch_size: int) -> Dict[int, int]:
+    """Insert Profiles along with their self follow, like the create_profile receiver does one user at a time.
+
+    Args:
+        profiles (List[Profile]): unsaved Profiles, user_id, username_lower and the counters already set
+        batch_size (int): rows per INSERT
+
+    Returns
+        Dict[int, int]: primary key of the new Profile of each User, keyed by User primary key
+
+    """
+    Profile.objects.bulk_create(profiles, batch_size=batch_size)
+
+    # only PostgreSQL sets the primary keys on bulk_create in Django 3.2, so look them up
+    user_ids: List[int] = [profile.user_id for profile in profiles]
+    profile_ids: Dict[int, int] = {}
+    for start in range(0, len(user_ids), batch_size):
+        profile_ids.update(
+            Profile.objects.filter(user_id__in=user_ids[start : start + batch_size]).values_list("user_id", "id")
+        )
+
+    create_follows([(profile_id, profile_id) for profile_id in profile_ids.values()], batch_size)
+    return profile_ids
+
+
+def create_follows(follows: List[tuple], batch_size: int) -> None:
+    """Insert (from_profile_id, to_profile_id) follow edges, existing edges are skipped.
+
+    Args:
+        follows (List[tuple]): follow edges to insert
+        batch_size (int): rows per INSERT
+
+    """
+    through: Model = Profile.follows.through  # type: ignore
+    through.objects.bulk_create(
+        [through(from_profile_id=from_id, to_profile_id=to_id) for from_id, to_id in follows],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
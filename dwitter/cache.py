@@ -0,0 +1,202 @@
+"""Caching helpers for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/cache/
+"""
+import uuid
+from typing import Any, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import transaction
+
+from .metrics import registry
+
+
+def get_dweet_card_cache() -> BaseCache:
+    """Cache the rendered dweet cards are stored in, see DWITTER_DWEET_CARD_CACHE.
+
+    Returns
+        BaseCache: configured cache backend
+
+    """
+    return caches[settings.DWITTER_DWEET_CARD_CACHE]
+
+
+def dweet_card_key(dweet: Any) -> str:
+    """Cache key of the rendered card of a Dweet.
+
+    The author's username is part of the key so renaming a user invalidates the cards of all their Dweets at once,
+    the stale entries are left for the cache to evict.  created_at guards against primary keys being reused.
+
+    Args:
+        dweet (Dweet): Dweet, its user should already be loaded
+
+    Returns
+        str: cache key
+
+    """
+    return f"dwitter:dweet-card:{dweet.pk}:{dweet.created_at.timestamp()}:{dweet.user.username}"
+
+
+def invalidate_dweet_card(dweet: Any) -> None:
+    """Drop the rendered card of a Dweet that was changed.
+
+    Args:
+        dweet (Dweet): Dweet that was saved
+
+    """
+    get_dweet_card_cache().delete(dweet_card_key(dweet))
+
+
+def get_timeline_cache() -> BaseCache:
+    """Cache the per-user timeline windows are stored in, see DWITTER_TIMELINE_CACHE.
+
+    Returns
+        BaseCache: configured cache backend
+
+    """
+    return caches[settings.DWITTER_TIMELINE_CACHE]
+
+
+def timeline_version_key(profile_id: int) -> str:
+    """Cache key holding the current version of a Profile's timeline.
+
+    Args:
+        profile_id (int): primary key of the Profile
+
+    Returns
+        str: cache key
+
+    """
+    return f"dwitter:timeline-version:{profile_id}"
+
+
+def bump_timeline_versions(profile_ids: Iterable[int]) -> None:
+    """Invalidate the cached timeline windows of some Profiles.
+
+    The version keys are simply deleted, in a single round trip, and a fresh version is picked on the next read so
+    the old windows can never be reached again and are left for the cache to evict.
+
+    Args:
+        profile_ids (Iterable[int]): primary keys of the Profiles whose timelines changed
+
+    """
+    get_timeline_cache().delete_many([timeline_version_key(profile_id) for profile_id in profile_ids])
+
+
+def get_timeline_window(profile_id: int) -> Tuple[str, Optional[list]]:
+    """Read the cached window of a Profile's timeline.
+
+    Args:
+        profile_id (int): primary key of the Profile
+
+    Returns
+        Tuple[str, Optional[list]]: current version and the cached (created_at, timeline id, dweet id) rows newest
+            first, or None on a miss.  Pass the version back to set_timeline_window so a window computed while the
+            timeline changed is stored under the stale version.
+
+    """
+    cache = get_timeline_cache()
+    version_key: str = timeline_version_key(profile_id)
+    version: Optional[str] = cache.get(version_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, timeout=None):
+            version = cache.get(version_key, version)
+
+    rows: Optional[list] = cache.get(f"dwitter:timeline:{profile_id}:{version}")
+    registry.increment("timeline_cache_misses" if rows is None else "timeline_cache_hits")
+    return version, rows
+
+
+def set_timeline_window(profile_id: int, version: str, rows: list) -> None:
+    """Store the window of a Profile's timeline.
+
+    Args:
+        profile_id (int): primary key of the Profile
+        version (str): version returned by get_timeline_window
+        rows (list): (created_at, timeline id, dweet id) rows newest first
+
+    """
+    get_timeline_cache().set(
+        f"dwitter:timeline:{profile_id}:{version}", rows, timeout=settings.DWITTER_TIMELINE_CACHE_TIMEOUT
+    )
+
+
+def get_trending_cache() -> BaseCache:
+    """Cache the precomputed trending hashtags are stored in, see DWITTER_TRENDING_CACHE.
+
+    Returns
+        BaseCache: configured cache backend
+
+    """
+    return caches[settings.DWITTER_TRENDING_CACHE]
+
+
+def trending_key(window: str) -> str:
+    """Cache key of the trending hashtags of a window.
+
+    Args:
+        window (str): name of the window, see dwitter.trending.WINDOWS
+
+    Returns
+        str: cache key
+
+    """
+    return f"dwitter:trending:{window}"
+
+
+def get_viewer_cache() -> Optional[BaseCache]:
+    """Cache the per-session viewers are stored in, see DWITTER_VIEWER_CACHE.
+
+    Returns
+        Optional[BaseCache]: configured cache backend, None when viewers are not cached
+
+    """
+    if settings.DWITTER_VIEWER_CACHE is None:
+        return None
+    return caches[settings.DWITTER_VIEWER_CACHE]
+
+
+def viewer_key(session_key: str) -> str:
+    """Cache key of the viewer of a session.
+
+    Args:
+        session_key (str): key of the session
+
+    Returns
+        str: cache key
+
+    """
+    return f"dwitter:viewer:{session_key}"
+
+
+def viewer_version_key(user_id: Any) -> str:
+    """Cache key holding the current version of the viewers of a user, shared by all their sessions.
+
+    Args:
+        user_id (Any): primary key of the User
+
+    Returns
+        str: cache key
+
+    """
+    return f"dwitter:viewer-version:{user_id}"
+
+
+def invalidate_viewers(user_ids: Iterable[Any]) -> None:
+    """Invalidate the cached viewers of every session of some users.
+
+    Like the timeline versions, the version keys are deleted in a single round trip and the viewers stored under the
+    old versions are left for the cache to evict.  Inside a transaction they are only deleted once it commits, or a
+    request in between would cache the viewer it loads from the old rows under the fresh version.
+
+    Args:
+        user_ids (Iterable[Any]): primary keys of the Users whose account or follows changed
+
+    """
+    cache: Optional[BaseCache] = get_viewer_cache()
+    if cache is not None:
+        keys: List[str] = [viewer_version_key(user_id) for user_id in user_ids]
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,48 @@
+"""System checks of the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/checks/
+
+Django runs them before runserver and migrate and with manage.py check, so a misconfigured deployment refuses to
+start rather than serving incomplete pages.
+"""
+from typing import Any, List
+
+from django.conf import settings
+from django.core.checks import CheckMessage, Error
+
+
+def check_sharded_features(app_configs: Any, **kwargs) -> List[CheckMessage]:  # pylint: disable=unused-argument
+    """Sharded Dweets cannot be searched nor listed by hashtag or mention.
+
+    The search index and the DweetTag and Mention tables live on the primary and only cover the Dweets left on it,
+    see dwitter.sharding.
+
+    Args:
+        app_configs (Any): applications to check, None for every application
+
+    Returns
+        List[CheckMessage]: an error per feature left on while DWITTER_DWEET_SHARDS is set
+
+    """
+    if not settings.DWITTER_DWEET_SHARDS:
+        return []
+
+    errors: List[CheckMessage] = []
+    if settings.DWITTER_SEARCH_BACKEND is not None:
+        errors.append(
+            Error(
+                "Search does not cover the Dweets of the shards.",
+                hint="Set DWITTER_SEARCH_BACKEND to None while DWITTER_DWEET_SHARDS is set.",
+                id="dwitter.E001",
+            )
+        )
+    if settings.DWITTER_ENTITY_VIEWS:
+        errors.append(
+            Error(
+                "The hashtag and mention pages do not cover the Dweets of the shards.",
+                hint="Set DWITTER_ENTITY_VIEWS to False while DWITTER_DWEET_SHARDS is set.",
+                id="dwitter.E002",
+            )
+        )
+    return errors
@@ -0,0 +1,40 @@
+"""Template context processors for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/ref/templates/api/#writing-your-own-context-processors
+"""
+from typing import Dict
+
+from django.conf import settings
+from django.http import HttpRequest
+
+from .viewer import Viewer, get_request_viewer
+
+
+def viewer(request: HttpRequest) -> Dict[str, Viewer]:
+    """Add the viewer of the request, see dwitter.viewer.
+
+    Args:
+        request (HttpRequest): request the template is rendered for
+
+    Returns
+        Dict[str, Viewer]: the viewer, as "viewer"
+
+    """
+    return {"viewer": get_request_viewer(request)}
+
+
+def features(request: HttpRequest) -> Dict[str, bool]:  # pylint: disable=unused-argument
+    """Add which optional pages are turned on, so the templates only link to those.
+
+    Args:
+        request (HttpRequest): request the template is rendered for
+
+    Returns
+        Dict[str, bool]: "search_enabled" and "entity_views_enabled"
+
+    """
+    return {
+        "search_enabled": settings.DWITTER_SEARCH_BACKEND is not None,
+        "entity_views_enabled": settings.DWITTER_ENTITY_VIEWS,
+    }
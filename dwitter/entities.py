@@ -0,0 +1,85 @@
+"""Hashtags and mentions of the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/ref/models/querysets/#bulk-create
+
+Dweet.body stays the source of truth, #tags and @mentions are parsed out of it once when a Dweet is written and
+every occurrence is stored in the DweetTag and Mention join tables.  Those carry the Dweet's created_at so a tag page
+or the mentions of a user are a single (tag|user, created_at, id) index range read, like the home timeline, instead
+of a LIKE over every body.  Dweets written before the join tables existed, or with bulk_create, are indexed by the
+backfill_entities command.
+"""
+import re
+from typing import Dict, Iterable, List
+
+from django.contrib.auth import get_user_model
+
+from .models import Dweet, DweetTag, Mention
+
+User = get_user_model()
+
+# not preceded by a word character, so neither "C#" nor "me@example.com" count
+HASHTAG = re.compile(r"(?<![\w#])#(\w{1,64})")
+# usernames may contain . + - @ but a mention never ends with punctuation, "@bob." mentions bob
+MENTION = re.compile(r"(?<![\w@])@(\w(?:[\w.+@-]{0,148}\w)?)")
+
+
+def extract_tags(body: str) -> List[str]:
+    """Hashtags of a Dweet body, lowercased, without the # and without duplicates.
+
+    Args:
+        body (str): Dweet body
+
+    Returns
+        List[str]: tags in order of appearance
+
+    """
+    return list(dict.fromkeys(tag.lower() for tag in HASHTAG.findall(body)))
+
+
+def extract_mentions(body: str) -> List[str]:
+    """Usernames mentioned in a Dweet body, without the @ and without duplicates.
+
+    Args:
+        body (str): Dweet body
+
+    Returns
+        List[str]: usernames in order of appearance, whether or not such a user exists
+
+    """
+    return list(dict.fromkeys(MENTION.findall(body)))
+
+
+def index_entities(dweets: Iterable[Dweet]) -> None:
+    """Replace the DweetTag and Mention rows of saved Dweets, mentions of unknown users are dropped.
+
+    Costs one query to resolve the usernames and a delete plus a bulk insert per table, however many Dweets are given.
+
+    Args:
+        dweets (Iterable[Dweet]): saved Dweets
+
+    """
+    dweets = list(dweets)
+    mentions: Dict[int, List[str]] = {dweet.pk: extract_mentions(dweet.body) for dweet in dweets}
+    usernames = {username for names in mentions.values() for username in names}
+    user_ids: Dict[str, int] = dict(
+        User.objects.filter(username__in=usernames, is_active=True).values_list("username", "id")
+    )
+
+    DweetTag.objects.filter(dweet__in=dweets).delete()
+    Mention.objects.filter(dweet__in=dweets).delete()
+    DweetTag.objects.bulk_create(
+        [
+            DweetTag(tag=tag, dweet=dweet, created_at=dweet.created_at)
+            for dweet in dweets
+            for tag in extract_tags(dweet.body)
+        ]
+    )
+    Mention.objects.bulk_create(
+        [
+            Mention(user_id=user_ids[username], dweet=dweet, created_at=dweet.created_at)
+            for dweet in dweets
+            for username in mentions[dweet.pk]
+            if username in user_ids
+        ]
+    )
@@ -0,0 +1,193 @@
+"""Background jobs of the "dwitter" application, queued in the database.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/ref/models/querysets/#select-for-update
+
+Work that does not have to happen before the response (fanning a Dweet out to its followers' timelines, indexing
+its hashtags and mentions, counting it) is queued with a single INSERT into the Job table and done by the run_jobs
+command.  With DWITTER_JOBS_EAGER the jobs run inline instead, when they are queued, which needs no worker.
+
+Workers claim due jobs by taking a lease: status becomes running and locked_until is pushed DWITTER_JOBS_LEASE
+seconds ahead.  A conditional UPDATE is enough on SQLite, which serializes writers.  Databases with SELECT ... FOR
+UPDATE SKIP LOCKED (PostgreSQL, MySQL 8) lock the rows while claiming so concurrent workers skip each other's jobs
+instead of racing for them.  A job whose worker died is claimed again once its lease expires.
+
+A failing job is retried with exponential backoff, after DWITTER_JOBS_MAX_ATTEMPTS attempts it is kept as a dead
+letter (status "dead") with the traceback of the last failure.  A job is deleted in the transaction of its work,
+so its database writes happen exactly once, but whatever it does outside of that transaction (cache writes, other
+databases) must be safe to repeat.
+"""
+import traceback
+import uuid
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .entities import extract_tags, index_entities
+from .models import Dweet, Job, Profile, TimelineEntry
+from .sharding import shard_of
+from .trending import record_tags
+
+JOBS: Dict[str, Callable[..., None]] = {}
+
+
+def register(name: str) -> Callable[[Callable[..., None]], Callable[..., None]]:
+    """Decorator making a function runnable as a job.
+
+    Args:
+        name (str): name the job is queued under
+
+    Returns
+        Callable[[Callable[..., None]], Callable[..., None]]: decorator registering the function in JOBS
+
+    """
+
+    def decorator(function: Callable[..., None]) -> Callable[..., None]:
+        JOBS[name] = function
+        return function
+
+    return decorator
+
+
+def enqueue(name: str, **payload: Any) -> Optional[Job]:
+    """Queue a job, or run it right away with DWITTER_JOBS_EAGER.
+
+    Args:
+        name (str): name of a registered job
+        payload (Any): JSON serializable keyword arguments of the job
+
+    Raises
+        KeyError: no job is registered under that name
+
+    Returns
+        Optional[Job]: the queued job, None when it ran eagerly
+
+    """
+    if name not in JOBS:
+        raise KeyError(f"No job named {name}")
+
+    if settings.DWITTER_JOBS_EAGER:
+        JOBS[name](**payload)
+        return None
+
+    return Job.objects.create(name=name, payload=payload)
+
+
+def claim(worker: str, limit: int, using: str = DEFAULT_DB_ALIAS) -> List[Job]:
+    """Lease up to limit due jobs, queued ones and running ones whose lease expired.
+
+    Args:
+        worker (str): name of the worker, recorded in locked_by
+        limit (int): maximum number of jobs
+        using (str): database alias
+
+    Returns
+        List[Job]: claimed jobs, oldest first, attempts already incremented
+
+    """
+    now = timezone.now()
+    due = Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+    # a fresh token per claim tells the rows of this claim apart from the ones this worker claimed before
+    token: str = f"{worker}:{uuid.uuid4().hex[:8]}"
+    jobs = Job.objects.using(using)
+
+    with transaction.atomic(using=using):
+        candidates = jobs.filter(due).order_by("run_at", "id")
+        if connections[using].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids: List[int] = list(candidates.values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+        # re-checking the condition keeps the claim safe without row locks, a job another worker claimed since
+        # the SELECT no longer matches it
+        jobs.filter(due, id__in=ids).update(
+            status=Job.RUNNING,
+            locked_by=token,
+            locked_until=now + timedelta(seconds=settings.DWITTER_JOBS_LEASE),
+            attempts=F("attempts") + 1,
+        )
+    return list(jobs.filter(id__in=ids, locked_by=token).order_by("run_at", "id"))
+
+
+def run(job: Job, using: str = DEFAULT_DB_ALIAS) -> bool:
+    """Run a claimed job, then delete it or schedule its retry.
+
+    Args:
+        job (Job): job returned by claim
+        using (str): database alias
+
+    Returns
+        bool: whether the job succeeded, False when its lease was lost to another worker
+
+    """
+    jobs = Job.objects.using(using).filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        with transaction.atomic(using=using):
+            # deleted in the same transaction as the work, so a crash can never leave a done job to be run again,
+            # and only while the lease is still ours: a job claimed again after its lease expired is skipped
+            deleted, _ = jobs.delete()
+            if not deleted:
+                return False
+            JOBS[job.name](**job.payload)
+    except Exception:  # pylint: disable=broad-except
+        error: str = traceback.format_exc()
+        if job.attempts >= settings.DWITTER_JOBS_MAX_ATTEMPTS:
+            jobs.update(status=Job.DEAD, locked_until=None, last_error=error)
+        else:
+            delay: float = settings.DWITTER_JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            jobs.update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_until=None,
+                last_error=error,
+            )
+        return False
+
+    return True
+
+
+def run_by_id(lease: Tuple[int, str]) -> bool:
+    """Run a claimed job in a pool worker, which has its own database connection.
+
+    Args:
+        lease (Tuple[int, str]): primary key and locked_by of a job returned by claim
+
+    Returns
+        bool: whether the job succeeded, False when it was claimed by someone else meanwhile
+
+    """
+    job_id, locked_by = lease
+    try:
+        job: Optional[Job] = Job.objects.filter(pk=job_id, status=Job.RUNNING, locked_by=locked_by).first()
+        return run(job) if job is not None else False
+    finally:
+        # threads and processes of the pool are reused, do not leave connections open across jobs
+        connections.close_all()
+
+
+@register("dweet_created")
+def dweet_created(dweet_id: int, user_id: int) -> None:
+    """Count a new Dweet, push it onto its author's followers' timelines and index its hashtags and mentions.
+
+    Args:
+        dweet_id (int): primary key of the Dweet
+        user_id (int): primary key of its author
+
+    """
+    # counted even when the Dweet is gone, its deletion was uncounted right away
+    Profile.objects.adjust_dweet_count(user_id, 1)
+    dweet: Optional[Dweet] = Dweet.objects.using(shard_of(user_id)).filter(pk=dweet_id).first()
+    if dweet is None:
+        return
+
+    record_tags(extract_tags(dweet.body), dweet.created_at)
+    # the timelines and hashtag/mention tables of the primary cannot point at Dweets of another shard
+    if dweet._state.db != DEFAULT_DB_ALIAS:
+        return
+    if settings.DWITTER_TIMELINE_ENGINE == "push":
+        TimelineEntry.objects.fan_out(dweet)
+    index_entities([dweet])
@@ -0,0 +1,68 @@
+"""Index the hashtags and mentions of existing Dweets.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Run once after adding the DweetTag and Mention tables, and after bulk loads (bulk_create skips the view that indexes
+new Dweets).  Dweets are read in primary key order one batch per transaction, so an interrupted backfill can carry on
+from the last id it printed with --after-id.  Reindexing a Dweet replaces its rows, running it twice is harmless.
+
+Example
+    python manage.py backfill_entities --batch-size 5000
+After an interruption
+    python manage.py backfill_entities --after-id 120000
+"""
+from typing import List
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from dwitter.entities import index_entities
+from dwitter.models import Dweet
+
+
+class Command(BaseCommand):
+    """Parse the body of every Dweet and write its DweetTag and Mention rows in batches.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Index the #tags and @mentions of existing dweets in batches"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the batch size and where to start from.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--batch-size", type=int, default=1000, help="dweets indexed per transaction")
+        parser.add_argument("--after-id", type=int, default=0, help="only index dweets with a greater primary key")
+
+    def handle(self, *args, **options) -> None:
+        """Index one batch of Dweets at a time, walking the primary key.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        batch_size: int = options["batch_size"]
+        last_id: int = options["after_id"]
+        total: int = 0
+
+        while True:
+            with transaction.atomic():
+                batch: List[Dweet] = list(
+                    Dweet.objects.filter(id__gt=last_id).only("id", "body", "created_at").order_by("id")[:batch_size]
+                )
+                index_entities(batch)
+
+            if not batch:
+                break
+            total += len(batch)
+            last_id = batch[-1].pk
+            self.stdout.write(f"Indexed {total} dweets, up to id {last_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} dweets"))
@@ -0,0 +1,200 @@
+"""Compare the read/write throughput of the stock and tuned SQLite backends under concurrency.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Each backend gets a fresh database file with a Dweet-like table, then --threads threads, each with its own
+connection, run a mix of reads (the newest 20 rows of an author, on an index) and writes for --seconds.  A write is
+a transaction reading the author's newest row then inserting one, like posting a Dweet does, which is what fails
+with "database is locked" when two deferred transactions both try to upgrade their lock.  The configured databases
+are not touched.  See dwitter.backends.sqlite3 for the tuning.
+
+Example
+    python manage.py benchmark_sqlite --threads 16 --seconds 10 --write-ratio 0.2
+"""
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import OperationalError, connections, transaction
+
+from dwitter.management.commands.replay_load import PERCENTILES, percentile
+
+BACKENDS: Dict[str, str] = {"stock": "django.db.backends.sqlite3", "tuned": "dwitter.backends.sqlite3"}
+SCHEMA: List[str] = [
+    "CREATE TABLE benchmark_dweet (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+    "body VARCHAR(140) NOT NULL, created_at REAL NOT NULL)",
+    "CREATE INDEX benchmark_dweet_user_created ON benchmark_dweet (user_id, created_at DESC)",
+]
+
+
+class Command(BaseCommand):
+    """Run the same concurrent read/write mix against each backend and print a throughput table.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Measure concurrent SQLite read/write throughput with the stock and the tuned backend"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the size and shape of the load.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--threads", type=int, default=8, help="concurrent connections")
+        parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+        parser.add_argument("--write-ratio", type=float, default=0.2, help="share of operations that write, 0.0 - 1.0")
+        parser.add_argument("--rows", type=int, default=100000, help="rows in the table before the run")
+        parser.add_argument("--users", type=int, default=1000, help="distinct authors")
+        parser.add_argument("--backend", choices=sorted(BACKENDS), action="append", help="only these backends")
+        parser.add_argument("--seed", type=int, help="random seed, for reproducible operation sequences")
+
+    def handle(self, *args, **options) -> None:
+        """Benchmark every backend on its own temporary database.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        self.options: dict = options
+        directory: str = tempfile.mkdtemp(prefix="dwitter-benchmark-")
+        header: str = f"{'backend':<8}{'operation':<10}{'ops':>9}{'ops/s':>10}{'failed':>8}"
+        header += "".join(f"{f'p{p}':>10}" for p in PERCENTILES)
+        try:
+            self.stdout.write(header)
+            for name in options["backend"] or list(BACKENDS):
+                alias: str = f"benchmark_{name}"
+                connections.databases[alias] = {
+                    "ENGINE": BACKENDS[name],
+                    "NAME": os.path.join(directory, f"{name}.sqlite3"),
+                }
+                try:
+                    self.populate(alias)
+                    self.report(name, *self.run(alias))
+                finally:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.databases[alias]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def populate(self, alias: str) -> None:
+        """Create the table and fill it with --rows rows.
+
+        Args:
+            alias (str): database alias
+        """
+        rng = random.Random(self.options["seed"])
+        now: float = time.time()
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            for sql in SCHEMA:
+                cursor.execute(sql)
+            cursor.executemany(
+                "INSERT INTO benchmark_dweet (user_id, body, created_at) VALUES (%s, %s, %s)",
+                [
+                    (rng.randrange(self.options["users"]), f"dweet {i}", now - rng.random() * 86400)
+                    for i in range(self.options["rows"])
+                ],
+            )
+
+    def run(self, alias: str) -> tuple:
+        """Run the mix with --threads threads for --seconds.
+
+        Args:
+            alias (str): database alias
+
+        Returns
+            tuple: milliseconds taken by each successful operation and number of failures, keyed by operation
+        """
+        latencies: Dict[str, List[float]] = {"read": [], "write": []}
+        failures: Dict[str, int] = {"read": 0, "write": 0}
+        lock = threading.Lock()
+        deadline: float = time.monotonic() + self.options["seconds"]
+        seed = self.options["seed"]
+
+        def work(number: int) -> None:
+            rng = random.Random(None if seed is None else seed + number)
+            samples: Dict[str, List[float]] = {"read": [], "write": []}
+            failed: Dict[str, int] = {"read": 0, "write": 0}
+            try:
+                while time.monotonic() < deadline:
+                    operation: str = "write" if rng.random() < self.options["write_ratio"] else "read"
+                    user_id: int = rng.randrange(self.options["users"])
+                    started: float = time.perf_counter()
+                    try:
+                        getattr(self, operation)(alias, user_id)
+                    except OperationalError:
+                        failed[operation] += 1
+                        continue
+                    samples[operation].append((time.perf_counter() - started) * 1000)
+            finally:
+                # the connections are per thread
+                connections[alias].close()
+            with lock:
+                for operation, values in samples.items():
+                    latencies[operation] += values
+                    failures[operation] += failed[operation]
+
+        threads: List[threading.Thread] = [
+            threading.Thread(target=work, args=(number,)) for number in range(self.options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, failures
+
+    @staticmethod
+    def read(alias: str, user_id: int) -> None:
+        """Read the newest 20 rows of an author.
+
+        Args:
+            alias (str): database alias
+            user_id (int): author
+        """
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT id, body, created_at FROM benchmark_dweet WHERE user_id = %s ORDER BY created_at DESC LIMIT 20",
+                [user_id],
+            )
+            cursor.fetchall()
+
+    @staticmethod
+    def write(alias: str, user_id: int) -> None:
+        """Read the newest row of an author then insert one, in a transaction.
+
+        Args:
+            alias (str): database alias
+            user_id (int): author
+        """
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute("SELECT MAX(created_at) FROM benchmark_dweet WHERE user_id = %s", [user_id])
+            newest: float = cursor.fetchone()[0] or 0.0
+            cursor.execute(
+                "INSERT INTO benchmark_dweet (user_id, body, created_at) VALUES (%s, %s, %s)",
+                [user_id, "benchmark dweet", max(newest, time.time())],
+            )
+
+    def report(self, name: str, latencies: Dict[str, List[float]], failures: Dict[str, int]) -> None:
+        """Print the rows of one backend.
+
+        Args:
+            name (str): backend name
+            latencies (Dict[str, List[float]]): milliseconds taken by each successful operation
+            failures (Dict[str, int]): number of failed operations
+        """
+        for operation, samples in latencies.items():
+            samples.sort()
+            row: str = f"{name:<8}{operation:<10}{len(samples):>9}{len(samples) / self.options['seconds']:>10.0f}"
+            row += f"{failures[operation]:>8}"
+            row += "".join(f"{percentile(samples, p):>8.1f}ms" if samples else f"{'-':>10}" for p in PERCENTILES)
+            self.stdout.write(row)
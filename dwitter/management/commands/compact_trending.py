@@ -0,0 +1,36 @@
+"""Compact the time buckets the trending hashtags are counted in.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Minute buckets that no window reads at minute precision anymore are merged into hour buckets and buckets older than
+the longest window are deleted, which keeps the TagCount table (and summing a window) small.  Run it periodically,
+e.g. every 10 minutes from cron, see dwitter.trending.
+
+Example
+    python manage.py compact_trending
+"""
+from django.core.management.base import BaseCommand
+
+from dwitter.trending import compact_buckets
+
+
+class Command(BaseCommand):
+    """Merge old minute buckets into hours and drop expired buckets.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Merge old trending hashtag buckets into hours and delete the expired ones"
+
+    def handle(self, *args, **options) -> None:
+        """Compact the buckets in a single transaction.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        expired, merged = compact_buckets()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {expired} expired buckets, merged {merged} into hours"))
@@ -0,0 +1,124 @@
+"""Print the database query plan of the queries each dwitter view runs.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/ref/models/querysets/#explain
+
+Run after deploys/migrations to confirm the hot queries use indexes instead of table scans.
+
+Example
+Plans for the first Profile
+    python manage.py explain_queries
+Plans for a specific Profile, exit non-zero if any query scans a table
+    python manage.py explain_queries --username user_1 --strict
+"""
+import re
+from typing import List, Tuple, Type
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db.models import QuerySet
+from django.test import RequestFactory
+from django.views.generic import View
+
+from dwitter.models import Dweet, Profile
+from dwitter.pagination import CursorPaginator
+from dwitter.viewer import Viewer
+from dwitter.views import DashboardView, ProfileDetailView, ProfileListView
+
+# SQLite reports full scans as "SCAN <table>" (but "SCAN ... USING INDEX" walks an index), PostgreSQL as "Seq Scan"
+TABLE_SCAN = re.compile(r"\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)|\bSeq Scan\b")
+
+
+class Command(BaseCommand):
+    """EXPLAIN the queries behind dwitter:dashboard, dwitter:profile-detail and dwitter:profile-list.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Print the EXPLAIN plan of the queries each dwitter view runs"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the username to explain the authenticated queries for.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--username", help="user to run the authenticated queries as, defaults to the first")
+        parser.add_argument("--strict", action="store_true", help="exit with an error if any query scans a table")
+
+    def handle(self, *args, **options) -> None:
+        """Explain each query and flag the ones doing table scans.
+
+        Args:
+            options (dict): parsed command line options
+
+        Raises
+            CommandError: no Profile to explain the queries for, or --strict and a table scan was found
+
+        """
+        profiles: QuerySet = Profile.objects.select_related("user")
+        if options["username"]:
+            profiles = profiles.filter(user__username=options["username"])
+
+        profile: Profile = profiles.first()
+        if profile is None:
+            raise CommandError("No profile found to explain the queries for")
+
+        scans: List[str] = []
+        for name, queryset in self.get_querysets(profile):
+            plan: str = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if TABLE_SCAN.search(plan):
+                scans.append(name)
+                self.stdout.write(self.style.WARNING("^ table scan"))
+            self.stdout.write("")
+
+        if scans and options["strict"]:
+            raise CommandError(f"Table scans found in: {', '.join(scans)}")
+
+    @staticmethod
+    def get_first_page(view_class: Type[View], user) -> QuerySet:
+        """Build the first page QuerySet a paginated list view runs for a user.
+
+        Args:
+            view_class (Type[View]): ListView subclass
+            user (User): user making the request
+
+        Returns
+            QuerySet: sliced QuerySet the view evaluates for its first page
+
+        """
+        request = RequestFactory().get("/")
+        request.user = user
+        request.viewer = Viewer.load(user)
+        view = view_class()
+        view.setup(request)
+        if not hasattr(view, "get_cursor_keys"):
+            return view.get_queryset()[: view.paginate_by]
+        paginator = CursorPaginator(view.get_queryset(), view.paginate_by, keys=view.get_cursor_keys())
+        return paginator.get_ordered_queryset()[: paginator.per_page + 1]
+
+    def get_querysets(self, profile: Profile) -> List[Tuple[str, QuerySet]]:
+        """Queries run by the views, named after the URL they are run for.
+
+        Args:
+            profile (Profile): Profile to run the authenticated queries as and to look at
+
+        Returns
+            List[Tuple[str, QuerySet]]: name and QuerySet of each query
+
+        """
+        dweets = CursorPaginator(Dweet.objects.filter(user=profile.user), ProfileDetailView.paginate_by)
+        return [
+            ("dwitter:dashboard (anonymous)", self.get_first_page(DashboardView, AnonymousUser())),
+            ("dwitter:dashboard", self.get_first_page(DashboardView, profile.user)),
+            ("dwitter:profile-detail profile", Profile.objects.filter(user__username=profile.user.username)),
+            ("dwitter:profile-detail dweets", dweets.get_ordered_queryset()[: dweets.per_page + 1]),
+            ("dwitter:profile-detail follows", profile.follows.all()),
+            ("dwitter:profile-detail followed by", profile.followed_by.all()),
+            ("dwitter:profile-list", self.get_first_page(ProfileListView, profile.user)),
+        ]
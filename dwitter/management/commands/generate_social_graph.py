@@ -0,0 +1,251 @@
+"""Generate a synthetic social graph to reproduce production scale locally.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Everything is written with bulk_create, bypassing the per-row receivers in dwitter.models (see dwitter.bulk), so the
+command computes the counters itself and rebuilds the timelines of the new Profiles and the search index at the end.
+Follow counts and dweets per user are drawn from a Pareto distribution and followees are picked with Zipf weights,
+so a few users are followed by nearly everyone while most have a handful of followers.  Like import_dwitter it
+refuses to run while the Dweets are sharded.
+
+Example
+10,000 users, 1,000,000 Dweets
+    python manage.py generate_social_graph --users 10000 --follows 50 --dweets 100
+Log in as any generated user
+    python manage.py generate_social_graph --users 100 --password secret
+"""
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+from typing import Dict, List
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.utils import timezone
+
+from dwitter.bulk import create_follows, create_profiles
+from dwitter.models import Dweet, Profile, TimelineEntry
+from dwitter.sharding import get_shards
+
+User = get_user_model()
+
+WORDS: List[str] = (
+    "the a of to and in is it you that was for on are with as be at one have this from or had by hot word but what "
+    "some we can out other were all there when up use your how said an each she which do their time if will way about"
+).split()
+HASHTAGS: List[str] = ["#django", "#python", "#dwitter", "#weekend", "#coffee", "#music", "#news", "#til"]
+
+
+class Command(BaseCommand):
+    """Bulk insert Users, Profiles, follows and Dweets following heavy tailed distributions.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Generate users with a power-law follow graph and dweets, using bulk inserts"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the size and shape of the graph.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--users", type=int, default=1000, help="number of users to create")
+        parser.add_argument("--follows", type=float, default=20, help="average number of users each user follows")
+        parser.add_argument("--dweets", type=float, default=10, help="average number of dweets per user")
+        parser.add_argument("--alpha", type=float, default=2.0, help="Pareto shape, lower means heavier tails")
+        parser.add_argument("--zipf", type=float, default=1.0, help="Zipf exponent of how popular followees are")
+        parser.add_argument("--days", type=int, default=30, help="dweets are spread over this many past days")
+        parser.add_argument("--prefix", default="synthetic", help="usernames are <prefix>_<n>")
+        parser.add_argument("--password", help="password of every generated user, unusable by default")
+        parser.add_argument("--seed", type=int, help="random seed, for reproducible graphs")
+        parser.add_argument("--batch-size", type=int, default=2000, help="rows per INSERT")
+        parser.add_argument("--skip-timelines", action="store_true", help="leave the timelines to rebuild_timelines")
+
+    def handle(self, *args, **options) -> None:
+        """Generate the graph in memory, then insert it one table at a time.
+
+        Args:
+            options (dict): parsed command line options
+
+        Raises
+            CommandError: sharded Dweets, invalid sizes, or users with that prefix already exist
+
+        """
+        if get_shards():
+            raise CommandError("Bulk loads bypass the Dweet shards and their id sequence, unset DWITTER_DWEET_SHARDS")
+        count: int = options["users"]
+        prefix: str = options["prefix"]
+        if count < 1 or options["follows"] < 0 or options["dweets"] < 0 or options["alpha"] <= 1:
+            raise CommandError("--users must be positive, --follows/--dweets not negative and --alpha above 1")
+        if User.objects.filter(username__startswith=f"{prefix}_").exists():
+            raise CommandError(f"Users named {prefix}_<n> already exist, pick another --prefix")
+
+        self.rng = random.Random(options["seed"])
+        self.alpha: float = options["alpha"]
+        self.batch_size: int = options["batch_size"]
+
+        follows: List[List[int]] = self.generate_follows(count, options["follows"], options["zipf"])
+        dweet_counts: List[int] = [self.heavy_tailed(options["dweets"]) for _ in range(count)]
+        followers: Counter = Counter(followee for followees in follows for followee in followees)
+
+        with transaction.atomic():
+            started: float = time.monotonic()
+            password: str = make_password(options["password"])
+            User.objects.bulk_create(
+                [User(username=f"{prefix}_{i}", password=password) for i in range(count)], batch_size=self.batch_size
+            )
+            user_ids: Dict[str, int] = dict(
+                User.objects.filter(username__startswith=f"{prefix}_").values_list("username", "id")
+            )
+            ids: List[int] = [user_ids[f"{prefix}_{i}"] for i in range(count)]
+            self.report("users", count, started)
+
+            started = time.monotonic()
+            profile_ids: Dict[int, int] = create_profiles(
+                [
+                    Profile(
+                        user_id=ids[i],
+                        username_lower=f"{prefix}_{i}".lower(),
+                        following_count=len(follows[i]),
+                        followers_count=followers[i],
+                        dweet_count=dweet_counts[i],
+                    )
+                    for i in range(count)
+                ],
+                self.batch_size,
+            )
+            self.report("profiles", count, started)
+
+            started = time.monotonic()
+            edges: List[tuple] = [
+                (profile_ids[ids[i]], profile_ids[ids[followee]]) for i in range(count) for followee in follows[i]
+            ]
+            create_follows(edges, self.batch_size)
+            self.report("follows", len(edges), started)
+
+            started = time.monotonic()
+            total: int = self.create_dweets(ids, dweet_counts, options["days"], prefix)
+            self.report("dweets", total, started)
+
+        if not options["skip_timelines"]:
+            started = time.monotonic()
+            profile_id_list: List[int] = sorted(profile_ids.values())
+            for start in range(0, len(profile_id_list), self.batch_size):
+                with transaction.atomic():
+                    for profile in Profile.objects.filter(id__in=profile_id_list[start : start + self.batch_size]):
+                        TimelineEntry.objects.rebuild(profile)
+            self.report("timelines", count, started)
+
+        call_command("rebuild_search_index", stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"Generated {count} users, {len(edges)} follows and {total} dweets"))
+
+    def heavy_tailed(self, mean: float) -> int:
+        """Draw a non-negative integer from a Pareto distribution with the given mean.
+
+        Args:
+            mean (float): expected value
+
+        Returns
+            int: drawn value
+
+        """
+        return int(mean * (self.alpha - 1) / self.alpha * self.rng.paretovariate(self.alpha))
+
+    def generate_follows(self, count: int, mean: float, zipf: float) -> List[List[int]]:
+        """Pick the followees of every user, popular users are picked far more often.
+
+        Args:
+            count (int): number of users
+            mean (float): average number of followees
+            zipf (float): Zipf exponent of the popularity of followees
+
+        Returns
+            List[List[int]]: indexes of the users followed by each user, without self follows
+
+        """
+        popularity: List[int] = list(range(count))
+        self.rng.shuffle(popularity)
+        cum_weights: List[float] = list(accumulate(1 / (rank + 1) ** zipf for rank in range(count)))
+
+        follows: List[List[int]] = []
+        for i in range(count):
+            degree: int = min(self.heavy_tailed(mean), count - 1)
+            followees: set = set()
+            # popular users are drawn over and over, give up after a few rounds rather than looping forever
+            for _ in range(3):
+                if len(followees) >= degree:
+                    break
+                for rank in self.rng.choices(range(count), cum_weights=cum_weights, k=2 * (degree - len(followees))):
+                    if popularity[rank] != i and len(followees) < degree:
+                        followees.add(popularity[rank])
+            follows.append(sorted(followees))
+        return follows
+
+    def create_dweets(self, user_ids: List[int], dweet_counts: List[int], days: int, prefix: str) -> int:
+        """Insert the Dweets one batch at a time, so they are never all held in memory.
+
+        Args:
+            user_ids (List[int]): primary keys of the new Users
+            dweet_counts (List[int]): number of Dweets of each User
+            days (int): created_at is spread over this many past days
+            prefix (str): username prefix, for mentions
+
+        Returns
+            int: number of Dweets inserted
+
+        """
+        now = timezone.now()
+        batch: List[Dweet] = []
+        total: int = 0
+        for user_id, dweet_count in zip(user_ids, dweet_counts):
+            for _ in range(dweet_count):
+                created_at = now - timedelta(seconds=self.rng.uniform(0, days * 24 * 60 * 60))
+                batch.append(
+                    Dweet(user_id=user_id, body=self.generate_body(prefix, len(user_ids)), created_at=created_at)
+                )
+                if len(batch) >= self.batch_size:
+                    Dweet.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+        Dweet.objects.bulk_create(batch)
+        return total + len(batch)
+
+    def generate_body(self, prefix: str, count: int) -> str:
+        """Random words, sometimes with a hashtag or a mention.
+
+        Args:
+            prefix (str): username prefix, for mentions
+            count (int): number of generated users, for mentions
+
+        Returns
+            str: Dweet body of at most 140 characters
+
+        """
+        words: List[str] = self.rng.choices(WORDS, k=self.rng.randint(3, 20))
+        if self.rng.random() < 0.2:
+            words.insert(self.rng.randrange(len(words) + 1), self.rng.choice(HASHTAGS))
+        if self.rng.random() < 0.1:
+            words.insert(0, f"@{prefix}_{self.rng.randrange(count)}")
+        return " ".join(words)[:140]
+
+    def report(self, table: str, rows: int, started: float) -> None:
+        """Print the insert rate of a table.
+
+        Args:
+            table (str): what was inserted
+            rows (int): number of rows inserted
+            started (float): time.monotonic() when the inserts started
+
+        """
+        elapsed: float = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f"Inserted {rows} {table} in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
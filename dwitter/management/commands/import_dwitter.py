@@ -0,0 +1,324 @@
+"""Stream users, follows and Dweets from a JSONL or CSV export into the database.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+One record per line (JSONL) or row (CSV, with a header), told apart by "type":
+    {"type": "user", "username": "alice", "email": "alice@example.com"}
+    {"type": "follow", "username": "alice", "to": "bob"}
+    {"type": "dweet", "username": "bob", "body": "hello", "created_at": "2022-11-01T12:00:00+00:00"}
+
+Records are read lazily and written with bulk_create one batch (one transaction) at a time, so memory stays bounded
+by --batch-size.  Users, Profiles, self follows and follows are idempotent, so after each committed batch the
+position is written to a checkpoint file and an interrupted import picks up from there with --resume, the Dweets of
+the one batch that may be replayed are deduplicated on (user, created_at, body).  bulk_create bypasses the receivers
+in dwitter.models, so the counters, timelines, hashtags/mentions and search index are recomputed once the whole file
+is in, see dwitter.bulk.  The Dweets are numbered by the primary's table rather than the DweetId sequence and
+never placed on a shard, so the import refuses to run while sharded.
+
+Example
+    python manage.py import_dwitter export.jsonl
+After an interruption
+    python manage.py import_dwitter export.jsonl --resume
+"""
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Set, Tuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from dwitter.bulk import create_follows, create_profiles
+from dwitter.models import Dweet, Profile
+from dwitter.sharding import get_shards
+
+User = get_user_model()
+
+TYPES: Tuple[str, ...] = ("user", "follow", "dweet")
+
+
+class Command(BaseCommand):
+    """Import a JSONL or CSV export in batches, resumable from a checkpoint.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Stream users, follows and dweets from JSONL or CSV with bulk inserts, resumable with --resume"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the input file and the batching/checkpoint options.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("path", help="file to import, - for stdin")
+        parser.add_argument("--format", choices=["jsonl", "csv"], help="input format, guessed from the extension")
+        parser.add_argument("--batch-size", type=int, default=5000, help="records per transaction")
+        parser.add_argument("--checkpoint", help="checkpoint file, defaults to <path>.checkpoint")
+        parser.add_argument("--resume", action="store_true", help="skip the records imported before the checkpoint")
+        parser.add_argument(
+            "--skip-finalize",
+            action="store_true",
+            help="do not recompute counters, timelines, hashtags/mentions and the search index, run "
+            "repair_profile_counters, rebuild_timelines, backfill_entities and rebuild_search_index later",
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Import the records batch by batch, then make the counters and timelines consistent.
+
+        Args:
+            options (dict): parsed command line options
+
+        Raises
+            CommandError: sharded Dweets, unknown format, missing checkpoint or malformed record
+
+        """
+        if get_shards():
+            raise CommandError("Bulk loads bypass the Dweet shards and their id sequence, unset DWITTER_DWEET_SHARDS")
+        path: str = options["path"]
+        file_format: Optional[str] = options["format"] or os.path.splitext(path)[1].lstrip(".").lower() or None
+        if file_format not in ("jsonl", "csv"):
+            raise CommandError("Cannot guess the format of the input, pass --format")
+        if path == "-" and not options["checkpoint"]:
+            raise CommandError("Importing from stdin needs an explicit --checkpoint")
+
+        self.checkpoint: str = options["checkpoint"] or f"{path}.checkpoint"
+        position: int = self.read_checkpoint() if options["resume"] else 0
+        batch_size: int = options["batch_size"]
+        self.password: str = make_password(None)
+        self.skipped: int = 0
+
+        started: float = time.monotonic()
+        imported: int = 0
+        with nullcontext(sys.stdin) if path == "-" else open(path, newline="", encoding="utf-8") as stream:
+            records: Iterator[Tuple[int, dict]] = self.read(stream, file_format)
+            batch: List[Tuple[int, dict]] = []
+            replayed: bool = position > 0
+            for line, record in records:
+                if line <= position:
+                    continue
+                batch.append((line, record))
+                if len(batch) >= batch_size:
+                    position = self.import_batch(batch, deduplicate=replayed)
+                    imported, replayed, batch = imported + len(batch), False, []
+                    self.report(imported, position, started)
+            if batch:
+                position = self.import_batch(batch, deduplicate=replayed)
+                imported += len(batch)
+                self.report(imported, position, started)
+
+        if not options["skip_finalize"]:
+            self.stdout.write("Recomputing profile counters, timelines, hashtags/mentions and the search index")
+            call_command("repair_profile_counters", stdout=self.stdout)
+            call_command("rebuild_timelines", stdout=self.stdout)
+            call_command("backfill_entities", stdout=self.stdout)
+            call_command("rebuild_search_index", stdout=self.stdout)
+
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} records, skipped {self.skipped}"))
+
+    def read(self, stream: IO, file_format: str) -> Iterator[Tuple[int, dict]]:
+        """Lazily parse the records.
+
+        Args:
+            stream (IO): input file
+            file_format (str): jsonl or csv
+
+        Raises
+            CommandError: a record is malformed or of an unknown type
+
+        Yields
+            Iterator[Tuple[int, dict]]: 1-based record number and the record
+        """
+        rows: Iterator[dict]
+        if file_format == "csv":
+            rows = csv.DictReader(stream)
+        else:
+            rows = (json.loads(line) for line in stream if line.strip())
+
+        line: int = 0
+        try:
+            for line, record in enumerate(rows, start=1):
+                if not isinstance(record, dict) or record.get("type") not in TYPES or not record.get("username"):
+                    raise CommandError(f"Record {line} needs a type of {', '.join(TYPES)} and a username")
+                yield line, record
+        except json.JSONDecodeError as err:
+            raise CommandError(f"Record {line + 1} is not valid JSON: {err}") from err
+
+    def import_batch(self, batch: List[Tuple[int, dict]], deduplicate: bool) -> int:
+        """Write a batch of records in a single transaction and move the checkpoint past it.
+
+        Args:
+            batch (List[Tuple[int, dict]]): record numbers and records
+            deduplicate (bool): the batch may have been imported before the checkpoint was written
+
+        Returns
+            int: number of the last record of the batch
+        """
+        records: Dict[str, List[dict]] = {record_type: [] for record_type in TYPES}
+        for _, record in batch:
+            records[record["type"]].append(record)
+
+        with transaction.atomic():
+            self.import_users(records["user"])
+            usernames: Set[str] = {record["username"] for _, record in batch if record["type"] != "user"}
+            usernames.update(record.get("to") or "" for record in records["follow"])
+            profiles: Dict[str, Tuple[int, int]] = {
+                username: (user_id, profile_id)
+                for username, user_id, profile_id in Profile.objects.filter(user__username__in=usernames).values_list(
+                    "user__username", "user_id", "id"
+                )
+            }
+            self.import_follows(records["follow"], profiles)
+            self.import_dweets(records["dweet"], profiles, deduplicate)
+
+        position: int = batch[-1][0]
+        self.write_checkpoint(position)
+        return position
+
+    def import_users(self, records: List[dict]) -> None:
+        """Insert the Users that do not exist yet along with their Profile and self follow.
+
+        Args:
+            records (List[dict]): user records
+        """
+        if not records:
+            return
+
+        users: List = []
+        for record in records:
+            date_joined = self.parse_datetime(record.get("date_joined"))
+            users.append(
+                User(
+                    username=record["username"],
+                    email=record.get("email") or "",
+                    password=self.password,
+                    **({"date_joined": date_joined} if date_joined else {}),
+                )
+            )
+        User.objects.bulk_create(users, ignore_conflicts=True)
+
+        missing: List[Tuple[int, str]] = list(
+            User.objects.filter(
+                username__in=[record["username"] for record in records], profile__isnull=True
+            ).values_list("id", "username")
+        )
+        create_profiles(
+            [Profile(user_id=user_id, username_lower=username.lower()) for user_id, username in missing],
+            len(missing) or 1,
+        )
+
+    def import_follows(self, records: List[dict], profiles: Dict[str, Tuple[int, int]]) -> None:
+        """Insert the follow edges between known users.
+
+        Args:
+            records (List[dict]): follow records
+            profiles (Dict[str, Tuple[int, int]]): User and Profile primary keys of the usernames in the batch
+        """
+        follows: List[tuple] = []
+        for record in records:
+            if record["username"] in profiles and record.get("to") in profiles:
+                follows.append((profiles[record["username"]][1], profiles[record["to"]][1]))
+            else:
+                self.skipped += 1
+        create_follows(follows, len(follows) or 1)
+
+    def import_dweets(self, records: List[dict], profiles: Dict[str, Tuple[int, int]], deduplicate: bool) -> None:
+        """Insert the Dweets of known users, keeping their created_at.
+
+        Args:
+            records (List[dict]): dweet records
+            profiles (Dict[str, Tuple[int, int]]): User and Profile primary keys of the usernames in the batch
+            deduplicate (bool): skip Dweets that already exist with the same user, created_at and body
+        """
+        now = timezone.now()
+        dweets: List[Dweet] = []
+        for record in records:
+            body: str = record.get("body") or ""
+            if record["username"] not in profiles or not body or len(body) > 140:
+                self.skipped += 1
+                continue
+            created_at = self.parse_datetime(record.get("created_at")) or now
+            dweets.append(Dweet(user_id=profiles[record["username"]][0], body=body, created_at=created_at))
+
+        if deduplicate and dweets:
+            existing: Set[tuple] = set(
+                Dweet.objects.filter(
+                    user_id__in={dweet.user_id for dweet in dweets},
+                    created_at__in={dweet.created_at for dweet in dweets},
+                ).values_list("user_id", "created_at", "body")
+            )
+            dweets = [dweet for dweet in dweets if (dweet.user_id, dweet.created_at, dweet.body) not in existing]
+
+        Dweet.objects.bulk_create(dweets)
+
+    @staticmethod
+    def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+        """Parse an ISO 8601 timestamp, naive timestamps are in the current time zone.
+
+        Args:
+            value (Optional[str]): timestamp from the record
+
+        Raises
+            CommandError: the timestamp is malformed
+
+        Returns
+            Optional[datetime]: aware datetime, None when not given
+        """
+        if not value:
+            return None
+
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"{value} is not an ISO 8601 timestamp")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    def read_checkpoint(self) -> int:
+        """Number of the last record committed by a previous run.
+
+        Raises
+            CommandError: there is no checkpoint to resume from
+
+        Returns
+            int: record number
+        """
+        try:
+            with open(self.checkpoint, encoding="utf-8") as checkpoint:
+                return int(json.load(checkpoint)["position"])
+        except (OSError, ValueError, KeyError) as err:
+            raise CommandError(f"Cannot resume from {self.checkpoint}: {err}") from err
+
+    def write_checkpoint(self, position: int) -> None:
+        """Atomically record the number of the last committed record.
+
+        Args:
+            position (int): record number
+        """
+        with open(f"{self.checkpoint}.tmp", "w", encoding="utf-8") as checkpoint:
+            json.dump({"position": position}, checkpoint)
+        os.replace(f"{self.checkpoint}.tmp", self.checkpoint)
+
+    def report(self, imported: int, position: int, started: float) -> None:
+        """Print the progress and import rate.
+
+        Args:
+            imported (int): records imported by this run
+            position (int): number of the last committed record
+            started (float): time.monotonic() when this run started
+        """
+        elapsed: float = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f"Committed up to record {position} ({imported / elapsed:.0f} rows/s)")
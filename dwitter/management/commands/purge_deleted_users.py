@@ -0,0 +1,139 @@
+"""Purge the rows of soft deleted accounts in small batches.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Profile.objects.soft_delete hides an account and its Dweets at once, this command then removes what it left behind:
+timeline entries of its Dweets, its Dweets along with their hashtags, mentions and search terms, its follows in both
+directions (keeping the counters of the other side right), the mentions of it, and finally the User and Profile.
+Each batch is its own short transaction followed by a pause, so the purge never holds locks for long nor competes
+with user traffic for the database.  It can be interrupted at any time and run again.
+
+Example
+    python manage.py purge_deleted_users --batch-size 500 --sleep 0.1
+Only accounts deleted more than a week ago
+    python manage.py purge_deleted_users --older-than 168
+"""
+import time
+from datetime import timedelta
+from typing import List
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from dwitter.models import Dweet, DweetTag, Mention, Profile, SearchTerm, Suggestion, TimelineEntry
+from dwitter.sharding import dweet_databases
+
+
+class Command(BaseCommand):
+    """Delete the rows of every soft deleted Profile one batch per transaction, pausing between batches.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Purge the dweets, follows and timelines of deleted accounts in throttled batches"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the batch size, throttling and grace period.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--batch-size", type=int, default=1000, help="rows deleted per transaction")
+        parser.add_argument("--sleep", type=float, default=0.05, help="seconds to pause after every batch")
+        parser.add_argument("--older-than", type=float, default=0, help="only accounts deleted this many hours ago")
+
+    def handle(self, *args, **options) -> None:
+        """Purge the deleted Profiles one after the other.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        self.batch_size: int = options["batch_size"]
+        self.sleep: float = options["sleep"]
+        deleted_before = timezone.now() - timedelta(hours=options["older_than"])
+
+        profiles: List[Profile] = list(
+            Profile.objects.filter(deleted_at__lte=deleted_before).select_related("user").order_by("deleted_at")
+        )
+        for profile in profiles:
+            rows: int = self.purge(profile)
+            self.stdout.write(f"Purged {profile.user.username}, {rows} rows")
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(profiles)} deleted accounts"))
+
+    def purge(self, profile: Profile) -> int:
+        """Delete everything of one Profile, dependent rows first.
+
+        Args:
+            profile (Profile): soft deleted Profile
+
+        Returns
+            int: number of rows deleted, besides the User and Profile
+
+        """
+        dweets: QuerySet = Dweet.objects.filter(user_id=profile.user_id)
+        rows: int = 0
+        rows += self.delete_in_batches(TimelineEntry.objects.filter(profile=profile))
+        rows += self.delete_in_batches(TimelineEntry.objects.filter(dweet__in=dweets))
+        for model in (DweetTag, Mention, SearchTerm):
+            rows += self.delete_in_batches(model.objects.filter(dweet__in=dweets))
+        rows += self.delete_in_batches(Mention.objects.filter(user_id=profile.user_id))
+        rows += self.delete_in_batches(Suggestion.objects.filter(Q(profile=profile) | Q(suggested=profile)))
+        # the Dweets of a sharded author are on its shard, or on several databases while being moved
+        for alias in dweet_databases():
+            rows += self.delete_in_batches(Dweet.objects.using(alias).filter(user_id=profile.user_id))
+        rows += self.delete_follows(profile)
+
+        with transaction.atomic():
+            profile.user.delete()
+        return rows
+
+    def delete_in_batches(self, queryset: QuerySet) -> int:
+        """Delete the rows of a QuerySet batch_size primary keys at a time.
+
+        Args:
+            queryset (QuerySet): rows to delete, on the database it reads
+
+        Returns
+            int: number of rows deleted, dependent rows deleted by Django included
+
+        """
+        deleted: int = 0
+        while True:
+            with transaction.atomic(using=queryset.db):
+                ids: list = list(queryset.order_by().values_list("pk", flat=True)[: self.batch_size])
+                if not ids:
+                    return deleted
+                count, _ = queryset.model.objects.using(queryset.db).filter(pk__in=ids).delete()
+            deleted += count
+            time.sleep(self.sleep)
+
+    def delete_follows(self, profile: Profile) -> int:
+        """Delete the follows from and to a Profile, taking them off the counters of the other side.
+
+        Args:
+            profile (Profile): soft deleted Profile
+
+        Returns
+            int: number of follows deleted
+
+        """
+        Follow = Profile.follows.through  # pylint: disable=invalid-name
+        follows: QuerySet = Follow.objects.filter(Q(from_profile=profile) | Q(to_profile=profile)).order_by()
+        deleted: int = 0
+        while True:
+            with transaction.atomic():
+                edges: list = list(follows.values_list("id", "from_profile_id", "to_profile_id")[: self.batch_size])
+                if not edges:
+                    return deleted
+                Profile.objects.adjust_follow_counts([(from_id, to_id) for _, from_id, to_id in edges], -1)
+                Follow.objects.filter(id__in=[pk for pk, _, _ in edges]).delete()
+            deleted += len(edges)
+            time.sleep(self.sleep)
@@ -0,0 +1,118 @@
+"""Move authors and their Dweets between the Dweet shards.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Without --author every author whose Dweets are not on their hashed shard is moved there, which places the accounts
+from before sharding (still on the primary) and spreads the authors over shards added to DWITTER_DWEET_SHARDS.
+With --author only those are moved, to --to or their hashed shard.  Each author is copied in batches, switched over
+and deleted from their old database, see dwitter.sharding.move_author.  Interrupted moves are resumed by running
+the command again.  Create the Dweet table on new shards first with migrate --database.
+
+Example
+    python manage.py migrate --database shard_2
+    python manage.py rebalance_shards
+Move a single busy author
+    python manage.py rebalance_shards --author alice --to shard_2
+"""
+from typing import List, Optional, Tuple
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from dwitter.models import Profile
+from dwitter.sharding import DweetIdClash, get_shards, hash_shard, move_author, seed_dweet_ids
+
+
+class Command(BaseCommand):
+    """Move the Dweets of misplaced or chosen authors to their shard.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Move authors' dweets to their hashed shard, or chosen authors to a given shard"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the author selection and batching options.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--author", action="append", default=[], help="username to move, may be repeated")
+        parser.add_argument("--to", help="shard to move the --author to, defaults to their hashed shard")
+        parser.add_argument("--batch-size", type=int, default=1000, help="dweets copied or deleted per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="only list the moves")
+
+    def handle(self, *args, **options) -> None:
+        """Move the authors one after the other.
+
+        Args:
+            options (dict): parsed command line options
+
+        Raises
+            CommandError: not sharded, unknown shard, --to without --author or clashing Dweet ids
+
+        """
+        shards: List[str] = get_shards()
+        target: Optional[str] = options["to"]
+        if not shards:
+            raise CommandError("DWITTER_DWEET_SHARDS is empty, there is nothing to rebalance")
+        if target is not None and target not in shards:
+            raise CommandError(f"{target} is not one of the shards: {', '.join(shards)}")
+        if target is not None and not options["author"]:
+            raise CommandError("--to moves the given --author only")
+
+        if not options["dry_run"]:
+            seed_dweet_ids()
+
+        moved: int = 0
+        authors: int = 0
+        for user_id, username, current in self.candidates(options["author"], options["batch_size"]):
+            destination: str = target or hash_shard(user_id)
+            if destination == current:
+                continue
+            authors += 1
+            if options["dry_run"]:
+                self.stdout.write(f"Would move {username} from {current} to {destination}")
+                continue
+            try:
+                count: int = move_author(user_id, destination, options["batch_size"])
+            except DweetIdClash as err:
+                raise CommandError(f"Cannot move {username} to {destination}: {err}") from err
+            moved += count
+            self.stdout.write(f"Moved {username} from {current} to {destination}, {count} dweets")
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} dweets of {authors} authors"))
+
+    @staticmethod
+    def candidates(usernames: List[str], batch_size: int):
+        """Authors to consider, read by primary key in batches.
+
+        Args:
+            usernames (List[str]): only these authors, every author when empty
+            batch_size (int): Profiles read per query
+
+        Raises
+            CommandError: an --author does not exist
+
+        Yields
+            Tuple[int, str, str]: user id, username and database currently holding the Dweets
+        """
+        profiles = Profile.objects.select_related("user").only("id", "user__id", "user__username", "dweet_shard")
+        if usernames:
+            profiles = profiles.filter(user__username__in=usernames)
+            missing = set(usernames) - set(profiles.values_list("user__username", flat=True))
+            if missing:
+                raise CommandError(f"Unknown authors: {', '.join(sorted(missing))}")
+
+        after: int = 0
+        while True:
+            batch: List[Profile] = list(profiles.filter(id__gt=after).order_by("id")[:batch_size])
+            if not batch:
+                return
+            for profile in batch:
+                row: Tuple[int, str, str] = (profile.user_id, profile.user.username, profile.dweet_database)
+                yield row
+            after = batch[-1].pk
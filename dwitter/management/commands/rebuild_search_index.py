@@ -0,0 +1,52 @@
+"""Rebuild the full-text search index of the Dweets.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Run after bulk loads with the "python" search backend (bulk_create skips the post_save receiver), when switching
+DWITTER_SEARCH_BACKEND, or after a migration rebuilt the Dweet table on SQLite (which drops the FTS5 triggers).
+
+Example
+    python manage.py rebuild_search_index
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from dwitter.search import SearchBackend, get_search_backend
+
+
+class Command(BaseCommand):
+    """Reindex every Dweet with the configured search backend.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Rebuild the full-text search index of the Dweets"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the database to reindex.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="database to reindex")
+
+    def handle(self, *args, **options) -> None:
+        """Reindex in a single transaction so searches never see a half built index.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        if settings.DWITTER_SEARCH_BACKEND is None:
+            self.stdout.write("Search is turned off, DWITTER_SEARCH_BACKEND is None")
+            return
+
+        backend: SearchBackend = get_search_backend(options["database"])
+        with transaction.atomic(using=options["database"]):
+            total: int = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {total} dweets with the {backend.name} search backend"))
@@ -0,0 +1,58 @@
+"""Rebuild the materialized home timelines from scratch.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Example
+All Profiles
+    python manage.py rebuild_timelines
+Specific Profiles
+    python manage.py rebuild_timelines user_1 user_2
+"""
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+from dwitter.models import Profile, TimelineEntry
+
+
+class Command(BaseCommand):
+    """Recreate TimelineEntry rows from the current follows and Dweets.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Rebuild the materialized home timeline of every (or the given) Profile"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add optional usernames and batch size.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("usernames", nargs="*", help="only rebuild the timelines of these users")
+        parser.add_argument("--batch-size", type=int, default=100, help="profiles rebuilt per transaction")
+
+    def handle(self, *args, **options) -> None:
+        """Rebuild the timelines one batch of Profiles at a time.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        profiles = Profile.objects.order_by("id")
+        if options["usernames"]:
+            profiles = profiles.filter(user__username__in=options["usernames"])
+
+        profile_ids: list = list(profiles.values_list("id", flat=True))
+        batch_size: int = options["batch_size"]
+
+        for start in range(0, len(profile_ids), batch_size):
+            with transaction.atomic():
+                for profile in Profile.objects.filter(id__in=profile_ids[start : start + batch_size]):
+                    TimelineEntry.objects.rebuild(profile)
+            self.stdout.write(f"Rebuilt {min(start + batch_size, len(profile_ids))}/{len(profile_ids)} timelines")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(profile_ids)} timelines"))
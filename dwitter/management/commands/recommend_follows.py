@@ -0,0 +1,138 @@
+"""Recompute the "who to follow" suggestions of every Profile.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+The follow graph is dumped into a memory-mapped snapshot (see dwitter.recommendations), the profiles are split into
+ranges scored by a pool of worker processes sharing the map, and the suggestions are written back by this process
+one range per transaction.  Workers are forked, they never open a database connection.
+
+Example
+    python manage.py recommend_follows --workers 8
+Score again from the previous snapshot
+    python manage.py recommend_follows --snapshot /var/tmp/follows.graph --reuse-snapshot
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Iterator, List, Tuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+
+from dwitter.models import Suggestion
+from dwitter.recommendations import (
+    GraphSnapshot,
+    close_worker_snapshot,
+    open_worker_snapshot,
+    recommend_batch,
+    write_snapshot,
+)
+
+
+class Command(BaseCommand):
+    """Snapshot the follow graph and score friends of friends in parallel.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Recompute the friends-of-friends follow suggestions of every profile with a pool of processes"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the snapshot, parallelism and size options.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument(
+            "--snapshot",
+            default=os.path.join(tempfile.gettempdir(), "dwitter-follows.graph"),
+            help="where to write the follow graph snapshot",
+        )
+        parser.add_argument("--reuse-snapshot", action="store_true", help="score the existing snapshot")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes, 1 for none")
+        parser.add_argument("--batch-size", type=int, default=1000, help="profiles scored per task and transaction")
+        parser.add_argument(
+            "--size", type=int, default=settings.DWITTER_SUGGESTIONS_SIZE, help="suggestions kept per profile"
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Write the snapshot, score it and store the suggestions.
+
+        Args:
+            options (dict): parsed command line options
+
+        Raises
+            CommandError: the snapshot to reuse cannot be read
+
+        """
+        path: str = options["snapshot"]
+        if not options["reuse_snapshot"]:
+            started: float = time.monotonic()
+            profiles, follows = write_snapshot(path)
+            self.stdout.write(f"Wrote {profiles} profiles and {follows} follows to {path} in {self.since(started)}")
+
+        try:
+            snapshot = GraphSnapshot(path)
+        except (OSError, ValueError) as err:
+            raise CommandError(f"Cannot read the snapshot: {err}") from err
+        size: int = snapshot.size
+        snapshot.close()
+
+        started = time.monotonic()
+        batch_size: int = options["batch_size"]
+        tasks: List[Tuple[int, int, int]] = [
+            (start, min(start + batch_size, size), options["size"]) for start in range(0, size, batch_size)
+        ]
+        scored: int = 0
+        written: int = 0
+        for profile_ids, rows in self.score(path, tasks, options["workers"]):
+            with transaction.atomic():
+                Suggestion.objects.replace(profile_ids, rows)
+            scored, written = scored + len(profile_ids), written + len(rows)
+            self.stdout.write(f"Scored {scored}/{size} profiles")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {written} suggestions for {scored} profiles in {self.since(started)}")
+        )
+
+    @staticmethod
+    def score(path: str, tasks: List[Tuple[int, int, int]], workers: int) -> Iterator[tuple]:
+        """Run the tasks in a pool of forked processes, or in this process with a single worker.
+
+        Args:
+            path (str): snapshot file
+            tasks (List[Tuple[int, int, int]]): ranges of profiles to score, see recommend_batch
+            workers (int): number of processes
+
+        Yields
+            Iterator[tuple]: result of every task, in completion order
+        """
+        if workers <= 1:
+            open_worker_snapshot(path)
+            try:
+                yield from map(recommend_batch, tasks)
+            finally:
+                close_worker_snapshot()
+            return
+
+        # forked so the workers inherit the configured Django apps without setting them up again
+        with multiprocessing.get_context("fork").Pool(workers, open_worker_snapshot, (path,)) as pool:
+            yield from pool.imap_unordered(recommend_batch, tasks)
+
+    @staticmethod
+    def since(started: float) -> str:
+        """Time elapsed since started.
+
+        Args:
+            started (float): time.monotonic() at the start
+
+        Returns
+            str: seconds, formatted
+        """
+        return f"{time.monotonic() - started:.1f}s"
@@ -0,0 +1,125 @@
+"""Recompute the denormalized follows/followers/dweets counters on Profile.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+Run after adding the counters to an existing database, or whenever they drift (raw SQL, bulk loads, ...).
+
+Example
+    python manage.py repair_profile_counters --batch-size 1000
+"""
+from collections import Counter
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+from django.db.models import Count, F
+
+from dwitter.models import Dweet, Profile
+from dwitter.sharding import dweet_databases
+
+COUNTERS: List[str] = ["following_count", "followers_count", "dweet_count"]
+
+
+class Command(BaseCommand):
+    """Recount follows, followers and Dweets for every Profile in batches.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Recompute Profile.following_count, followers_count and dweet_count in batches"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the batch size.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--batch-size", type=int, default=500, help="profiles recounted per transaction")
+
+    def handle(self, *args, **options) -> None:
+        """Recount one batch of Profiles at a time, only writing the ones that drifted.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        batch_size: int = options["batch_size"]
+        last_id: int = 0
+        checked: int = 0
+        repaired: int = 0
+
+        while True:
+            # lock the batch so follows/dweets made while recounting are not overwritten
+            with transaction.atomic():
+                batch: List[Profile] = list(
+                    Profile.objects.select_for_update().filter(id__gt=last_id).order_by("id")[:batch_size]
+                )
+                repaired += self.repair(batch)
+
+            if not batch:
+                break
+            checked += len(batch)
+            last_id = batch[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} profiles, repaired {repaired}"))
+
+    @staticmethod
+    def repair(batch: List[Profile]) -> int:
+        """Recount the counters of a batch of Profiles with grouped queries and write back the drifted ones.
+
+        Dweets are counted with one grouped query per database holding Dweets, see dwitter.sharding
+
+        Args:
+            batch (List[Profile]): Profiles to recount
+
+        Returns
+            int: number of Profiles that were repaired
+
+        """
+        profile_ids: List[int] = [profile.id for profile in batch]
+        follows = Profile.follows.through.objects.exclude(from_profile=F("to_profile"))
+
+        following: Dict[int, int] = dict(
+            follows.filter(from_profile__in=profile_ids)
+            .values("from_profile")
+            .annotate(count=Count("*"))
+            .values_list("from_profile", "count")
+        )
+        followers: Dict[int, int] = dict(
+            follows.filter(to_profile__in=profile_ids)
+            .values("to_profile")
+            .annotate(count=Count("*"))
+            .values_list("to_profile", "count")
+        )
+        # summed over every database that may hold Dweets, the shards and the primary
+        dweets: Counter = Counter()
+        for alias in dweet_databases():
+            dweets.update(
+                dict(
+                    Dweet.objects.using(alias)
+                    .filter(user_id__in=[profile.user_id for profile in batch])
+                    .order_by()  # Meta.ordering would otherwise end up in the GROUP BY
+                    .values("user")
+                    .annotate(count=Count("*"))
+                    .values_list("user", "count")
+                )
+            )
+
+        drifted: List[Profile] = []
+        for profile in batch:
+            counts: Dict[str, int] = {
+                "following_count": following.get(profile.id, 0),
+                "followers_count": followers.get(profile.id, 0),
+                "dweet_count": dweets.get(profile.user_id, 0),
+            }
+            if any(getattr(profile, field) != count for field, count in counts.items()):
+                for field, count in counts.items():
+                    setattr(profile, field, count)
+                drifted.append(profile)
+
+        Profile.objects.bulk_update(drifted, COUNTERS)
+        return len(drifted)
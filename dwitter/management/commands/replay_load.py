@@ -0,0 +1,156 @@
+"""Replay a read/write request mix against the views in-process and report latency percentiles per url name.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/testing/tools/#the-test-client
+
+Requests go through the full middleware stack with the test client, against the configured database, so writes are
+real: run it against a throwaway database populated with generate_social_graph.  Network, web server and static
+files are not part of the measurement.
+
+Example
+    python manage.py generate_social_graph --users 10000 --follows 50 --dweets 100
+    python manage.py replay_load --requests 5000 --clients 50 --write-ratio 0.05
+"""
+import math
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.http import HttpResponse
+from django.test import Client, override_settings
+from django.urls import reverse
+
+User = get_user_model()
+
+# (url name, weight) of the requests made by logged in clients, anonymous clients only read
+READS: List[Tuple[str, int]] = [
+    ("dwitter:dashboard", 40),
+    ("dwitter:profile-detail", 25),
+    ("dwitter:profile-list", 10),
+    ("dwitter:api-timeline", 15),
+    ("dwitter:dashboard (anonymous)", 10),
+]
+WRITES: List[Tuple[str, int]] = [("dwitter:dweet-create", 70), ("dwitter:profile-follow", 30)]
+PERCENTILES: List[int] = [50, 95, 99]
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    """Nearest-rank percentile.
+
+    Args:
+        samples (List[float]): sorted samples
+        percent (float): percentile to compute, 0 - 100
+
+    Returns
+        float: sample at that percentile
+
+    """
+    return samples[max(0, math.ceil(percent / 100 * len(samples)) - 1)]
+
+
+class Command(BaseCommand):
+    """Drive the views with the test client and print p50/p95/p99 latencies.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Replay a read/write request mix in-process and report p50/p95/p99 latency per url name"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the size and shape of the load.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--requests", type=int, default=1000, help="number of requests to make")
+        parser.add_argument("--clients", type=int, default=20, help="number of logged in users to act as")
+        parser.add_argument("--write-ratio", type=float, default=0.1, help="share of requests that write, 0.0 - 1.0")
+        parser.add_argument("--seed", type=int, help="random seed, for reproducible request sequences")
+
+    def handle(self, *args, **options) -> None:
+        """Log the clients in, replay the mix and print the report.
+
+        Args:
+            options (dict): parsed command line options
+
+        Raises
+            CommandError: there are no users to act as
+
+        """
+        self.rng = random.Random(options["seed"])
+        user_ids: List[int] = list(User.objects.values_list("id", flat=True))
+        if not user_ids:
+            raise CommandError("No users to act as, run generate_social_graph first")
+
+        clients: List[Client] = []
+        for user in User.objects.filter(id__in=self.rng.sample(user_ids, min(options["clients"], len(user_ids)))):
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        self.anonymous: Client = Client()
+        self.usernames: List[str] = list(
+            User.objects.filter(id__in=self.rng.sample(user_ids, min(1000, len(user_ids)))).values_list(
+                "username", flat=True
+            )
+        )
+
+        latencies: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        # the test client always claims to be "testserver"
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for _ in range(options["requests"]):
+                mix: List[Tuple[str, int]] = WRITES if self.rng.random() < options["write_ratio"] else READS
+                name: str = self.rng.choices([name for name, _ in mix], weights=[weight for _, weight in mix])[0]
+                request: Callable[[], HttpResponse] = self.build_request(name, self.rng.choice(clients))
+
+                started: float = time.perf_counter()
+                response: HttpResponse = request()
+                latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    errors[name] = errors.get(name, 0) + 1
+
+        self.report(latencies, errors)
+
+    def build_request(self, name: str, client: Client) -> Callable[[], HttpResponse]:
+        """Prepare a request to a url name with random arguments.
+
+        Args:
+            name (str): url name from READS or WRITES
+            client (Client): logged in client, unused for anonymous requests
+
+        Returns
+            Callable[[], HttpResponse]: makes the request
+        """
+        username: str = self.rng.choice(self.usernames)
+        if name == "dwitter:dashboard (anonymous)":
+            return lambda: self.anonymous.get(reverse("dwitter:dashboard"), secure=True)
+        if name == "dwitter:profile-detail":
+            return lambda: client.get(reverse(name, args=[username]), secure=True)
+        if name == "dwitter:dweet-create":
+            body: str = f"load test dweet {self.rng.random()}"
+            return lambda: client.post(reverse(name), data={"body": body}, secure=True)
+        if name == "dwitter:profile-follow":
+            action: str = self.rng.choice(["follow", "unfollow"])
+            return lambda: client.post(reverse(name, args=[username]), data={"follow": action}, secure=True)
+        return lambda: client.get(reverse(name), secure=True)
+
+    def report(self, latencies: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+        """Print a table of request counts, errors and latency percentiles.
+
+        Args:
+            latencies (Dict[str, List[float]]): milliseconds taken by each request, keyed by url name
+            errors (Dict[str, int]): number of 4xx/5xx responses, keyed by url name
+
+        """
+        header: str = f"{'url name':<32}{'requests':>10}{'errors':>8}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES)
+        self.stdout.write(header + f"{'max':>10}")
+        for name in sorted(latencies):
+            samples: List[float] = sorted(latencies[name])
+            row: str = f"{name:<32}{len(samples):>10}{errors.get(name, 0):>8}"
+            row += "".join(f"{percentile(samples, p):>8.1f}ms" for p in PERCENTILES)
+            self.stdout.write(row + f"{samples[-1]:>8.1f}ms")
@@ -0,0 +1,95 @@
+"""Run the background jobs queued in the database.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-management-commands/
+
+This process claims due jobs in batches (see dwitter.jobs.claim) and runs them in a pool of threads or forked
+processes, each with its own database connection, then polls again.  Several run_jobs may run at once, on one or
+many hosts, a job is only leased to one of them at a time.  Only needed when DWITTER_JOBS_EAGER is off.
+
+Example
+    python manage.py run_jobs --workers 4
+Run the due jobs once and exit, e.g. from cron
+    python manage.py run_jobs --once
+"""
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Iterable, List, Optional
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connections
+
+from dwitter.jobs import claim, run, run_by_id
+from dwitter.models import Job
+
+
+class Command(BaseCommand):
+    """Claim and run queued jobs until interrupted.
+
+    Args:
+        BaseCommand (BaseCommand): base class for Django management commands
+
+    """
+
+    help: str = "Run the queued background jobs with a pool of threads or processes"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add the parallelism and polling options.
+
+        Args:
+            parser (CommandParser): argument parser for the command
+
+        """
+        parser.add_argument("--workers", type=int, default=4, help="jobs run at once, 1 runs them in this thread")
+        parser.add_argument("--mode", choices=["thread", "process"], default="thread", help="kind of pool")
+        parser.add_argument("--batch-size", type=int, default=50, help="jobs claimed at a time")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds to wait when no job is due")
+        parser.add_argument("--once", action="store_true", help="exit once no job is due")
+
+    def handle(self, *args, **options) -> None:
+        """Poll for due jobs and run them.
+
+        Args:
+            options (dict): parsed command line options
+
+        """
+        worker: str = f"{socket.gethostname()}:{os.getpid()}"
+        workers: int = options["workers"]
+        pool: Optional[Executor] = None
+        if workers > 1 and options["mode"] == "thread":
+            pool = ThreadPoolExecutor(workers)
+        elif workers > 1:
+            # forked children would share this process's connection otherwise
+            connections.close_all()
+            pool = multiprocessing.get_context("fork").Pool(workers)
+
+        succeeded: int = 0
+        failed: int = 0
+        with pool if pool is not None else nullcontext():
+            try:
+                while True:
+                    jobs: List[Job] = claim(worker, options["batch_size"])
+                    if not jobs:
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll_interval"])
+                        continue
+
+                    results: Iterable[bool]
+                    if pool is None:
+                        results = map(run, jobs)
+                    else:
+                        # the pool has its own connections, the claiming one is not needed while it runs
+                        connections.close_all()
+                        results = pool.map(run_by_id, [(job.pk, job.locked_by) for job in jobs])
+                    for result in results:
+                        succeeded, failed = succeeded + result, failed + (not result)
+                    self.stdout.write(f"Ran {len(jobs)} jobs ({succeeded} succeeded, {failed} failed so far)")
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(f"{succeeded} jobs succeeded, {failed} failed"))
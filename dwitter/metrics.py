@@ -0,0 +1,125 @@
+"""In-process request metrics for the "dwitter" application.
+
+Histograms are aggregated per resolved view name (dwitter:dashboard, dwitter:profile-detail, ...) for the lifetime
+of the worker process and are filled by dwitter.middleware.RequestMetricsMiddleware.
+"""
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Sequence, Tuple
+
+# upper bounds of each bucket, anything larger lands in the +Inf bucket
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_COUNT_BUCKETS: Tuple[float, ...] = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Fixed bucket histogram, not thread-safe on its own, see MetricsRegistry."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """Create an empty histogram.
+
+        Args:
+            buckets (Sequence[float]): sorted upper bounds of the buckets
+
+        """
+        self.buckets: Sequence[float] = buckets
+        self.counts: list = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single value.
+
+        Args:
+            value (float): value to record
+
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Serializable copy of the histogram.
+
+        Returns
+            Dict[str, Any]: count, sum and the number of values in each bucket keyed by upper bound
+
+        """
+        bounds: list = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {"count": self.count, "sum": round(self.sum, 3), "buckets": dict(zip(bounds, self.counts))}
+
+
+class MetricsRegistry:
+    """Thread-safe collection of histograms keyed by view name and metric, plus plain named counters."""
+
+    metrics: Dict[str, Sequence[float]] = {
+        "wall_ms": LATENCY_BUCKETS_MS,
+        "sql_ms": LATENCY_BUCKETS_MS,
+        "template_ms": LATENCY_BUCKETS_MS,
+        "queries": QUERY_COUNT_BUCKETS,
+    }
+
+    def __init__(self) -> None:
+        """Create an empty registry."""
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Histogram]] = {}
+        self._counters: Dict[str, int] = {}
+
+    def observe(self, view_name: str, **values: float) -> None:
+        """Record one request.
+
+        Args:
+            view_name (str): resolved view name of the request
+            values (float): value for each of the metrics, e.g. wall_ms=12.5
+
+        """
+        with self._lock:
+            histograms: Dict[str, Histogram] = self._histograms.get(view_name, {})
+            if not histograms:
+                histograms = {name: Histogram(buckets) for name, buckets in self.metrics.items()}
+                self._histograms[view_name] = histograms
+            for name, value in values.items():
+                histograms[name].observe(value)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add to a named counter, e.g. cache hits.
+
+        Args:
+            name (str): name of the counter
+            amount (int): amount to add
+
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def counters(self) -> Dict[str, int]:
+        """Copy of every counter.
+
+        Returns
+            Dict[str, int]: counter values keyed by name
+
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Copy of every histogram.
+
+        Returns
+            Dict[str, Dict[str, Dict[str, Any]]]: histograms keyed by view name, then by metric
+
+        """
+        with self._lock:
+            return {
+                view_name: {name: histogram.as_dict() for name, histogram in histograms.items()}
+                for view_name, histograms in self._histograms.items()
+            }
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+registry = MetricsRegistry()
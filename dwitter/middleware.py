@@ -0,0 +1,250 @@
+"""Middleware for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/http/middleware/
+"""
+import random
+import time
+from contextlib import ExitStack
+from time import perf_counter
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils.functional import SimpleLazyObject
+
+from .metrics import registry
+from .routers import replica_reads
+from .viewer import get_viewer
+
+
+class RequestMetrics:
+    """Timings collected while handling a single sampled request."""
+
+    def __init__(self) -> None:
+        """Start the wall clock."""
+        self.started: float = perf_counter()
+        self.queries: int = 0
+        self.sql: float = 0.0
+        self.template: float = 0.0
+
+    def execute_wrapper(self, execute: Callable, sql: str, params, many: bool, context: dict):
+        """Database execute wrapper counting and timing every query.
+
+        Args:
+            execute (Callable): next wrapper or the real execute
+            sql (str): SQL about to be run
+            params (Any): query parameters
+            many (bool): whether this is an executemany
+            context (dict): connection and cursor
+
+        Returns
+            Any: whatever the wrapped execute returns
+
+        """
+        started: float = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += perf_counter() - started
+            self.queries += 1
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, query count, SQL time and template render time of sampled requests.
+
+    Timings are sent back in a Server-Timing header and aggregated per resolved view name in dwitter.metrics.
+    Should be the first entry in MIDDLEWARE so it wraps everything else and its process_template_response runs
+    last, right before the template is rendered.  The share of requests sampled is set by
+    DWITTER_METRICS_SAMPLE_RATE, requests that are not sampled pay for a single random() call.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        """One-time configuration and initialization.
+
+        Args:
+            get_response (Callable): next middleware or the view
+
+        """
+        self.get_response: Callable = get_response
+        self.sample_rate: float = settings.DWITTER_METRICS_SAMPLE_RATE
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Time the request if it is sampled.
+
+        Args:
+            request (HttpRequest): incoming request
+
+        Returns
+            HttpResponse: response with a Server-Timing header when sampled
+
+        """
+        if random.random() >= self.sample_rate:  # nosec - sampling, not security
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        request.dwitter_metrics = metrics  # type: ignore
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics.execute_wrapper))
+            response: HttpResponse = self.get_response(request)
+
+        wall: float = perf_counter() - metrics.started
+        response["Server-Timing"] = ", ".join(
+            [
+                f"total;dur={wall * 1000:.1f}",
+                f'sql;dur={metrics.sql * 1000:.1f};desc="{metrics.queries} queries"',
+                f"template;dur={metrics.template * 1000:.1f}",
+            ]
+        )
+
+        resolver_match = getattr(request, "resolver_match", None)
+        registry.observe(
+            resolver_match.view_name if resolver_match else "unresolved",
+            wall_ms=wall * 1000,
+            sql_ms=metrics.sql * 1000,
+            template_ms=metrics.template * 1000,
+            queries=metrics.queries,
+        )
+        return response
+
+    def process_template_response(  # pylint: disable=no-self-use
+        self, request: HttpRequest, response: SimpleTemplateResponse
+    ) -> SimpleTemplateResponse:
+        """Time the rendering of TemplateResponses, which happens right after this hook.
+
+        Args:
+            request (HttpRequest): incoming request
+            response (SimpleTemplateResponse): response about to be rendered
+
+        Returns
+            SimpleTemplateResponse: the same response, with a post render callback to stop the clock
+
+        """
+        metrics = getattr(request, "dwitter_metrics", None)
+        if metrics is not None:
+            started: float = perf_counter()
+
+            def stop_template_clock(_response: SimpleTemplateResponse) -> None:
+                metrics.template += perf_counter() - started
+
+            response.add_post_render_callback(stop_template_clock)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Serve the safe requests of the dwitter views from the read replica, unless the client recently wrote.
+
+    A successful unsafe request (posting a Dweet, following, logging in...) sets a cookie pinning the client to
+    the primary for DWITTER_REPLICA_PIN seconds, longer than the replica is expected to lag, so users always see
+    their own changes.  A cookie rather than the session, as the session itself is read from the routed database.
+    Does nothing without DWITTER_REPLICA_DATABASE.
+    """
+
+    PIN_COOKIE: str = "dwitter_primary"
+    SAFE_METHODS: tuple = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response: Callable) -> None:
+        """One-time configuration and initialization.
+
+        Args:
+            get_response (Callable): next middleware or the view
+
+        """
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Handle the request, then pin the client to the primary if it wrote.
+
+        Args:
+            request (HttpRequest): incoming request
+
+        Returns
+            HttpResponse: response, with the pin cookie after a successful unsafe request
+
+        """
+        with ExitStack() as stack:
+            request.dwitter_replica_reads = stack  # type: ignore
+            response: HttpResponse = self.get_response(request)
+
+        if settings.DWITTER_REPLICA_DATABASE and request.method not in self.SAFE_METHODS and response.status_code < 400:
+            pin: int = settings.DWITTER_REPLICA_PIN
+            response.set_cookie(
+                self.PIN_COOKIE,
+                str(int(time.time()) + pin),
+                max_age=pin,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request: HttpRequest, *args, **kwargs) -> Optional[HttpResponse]:
+        """Route the reads of the view to the replica once it is known to be a safe request to a dwitter view.
+
+        Args:
+            request (HttpRequest): incoming request, resolved
+
+        Returns
+            Optional[HttpResponse]: None, to carry on with the view
+
+        """
+        stack: Optional[ExitStack] = getattr(request, "dwitter_replica_reads", None)
+        if (
+            stack is not None
+            and settings.DWITTER_REPLICA_DATABASE
+            and request.method in self.SAFE_METHODS
+            and request.resolver_match.namespace == "dwitter"
+            and not self.pinned(request)
+        ):
+            stack.enter_context(replica_reads())
+        return None
+
+    def pinned(self, request: HttpRequest) -> bool:
+        """Whether the client wrote recently enough for the replica to miss its change.
+
+        Args:
+            request (HttpRequest): incoming request
+
+        Returns
+            bool: True while the pin cookie has not expired
+
+        """
+        try:
+            return int(request.COOKIES.get(self.PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class ViewerMiddleware:
+    """Set request.viewer, the logged in user with its Profile id and follows, and serve request.user from it.
+
+    Must come after AuthenticationMiddleware, whose lazy request.user it replaces.  Both are lazy, a request that
+    never looks at the user reads neither the session nor the cache.  See dwitter.viewer.
+    """
+
+    def __init__(self, get_response: Callable) -> None:
+        """One-time configuration and initialization.
+
+        Args:
+            get_response (Callable): next middleware or the view
+
+        """
+        self.get_response: Callable = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Attach the lazy viewer and user to the request.
+
+        Args:
+            request (HttpRequest): incoming request, with its session
+
+        Returns
+            HttpResponse: response
+
+        """
+        viewer = SimpleLazyObject(lambda: get_viewer(request))
+        request.viewer = viewer  # type: ignore
+        request.user = SimpleLazyObject(lambda: viewer.user)
+        return self.get_response(request)
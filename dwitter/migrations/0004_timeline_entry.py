@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0003_profile_dweet_ordering"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField()),
+                (
+                    "dweet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="timeline_entries", to="dwitter.dweet"
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="dwitter.profile",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(fields=["profile", "-created_at", "-id"], name="timeline_profile_created"),
+        ),
+        migrations.AddConstraint(
+            model_name="timelineentry",
+            constraint=models.UniqueConstraint(fields=("profile", "dweet"), name="unique_timeline_entry"),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0004_timeline_entry"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="dweet",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="dweet_user_created"),
+        ),
+        migrations.AddIndex(
+            model_name="dweet",
+            index=models.Index(fields=["-created_at", "-id"], name="dweet_created"),
+        ),
+        # the auto-created follows table only indexes each column on its own, add a covering index for
+        # "who follows this profile" lookups (fan-out, followed_by) which filter on to_profile_id
+        migrations.RunSQL(
+            sql="CREATE INDEX dwitter_profile_follows_reverse ON dwitter_profile_follows (to_profile_id, from_profile_id)",
+            reverse_sql="DROP INDEX dwitter_profile_follows_reverse",
+        ),
+    ]
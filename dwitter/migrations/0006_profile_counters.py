@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0005_dweet_profile_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="dweet_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="followers_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="following_count",
+            field=models.IntegerField(default=0),
+        ),
+    ]
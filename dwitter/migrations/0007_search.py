@@ -0,0 +1,86 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+# frozen copies of the SQL of dwitter.search at the time of this migration, so later changes to it do not alter it
+FTS5_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS dwitter_dweet_fts "
+    "USING fts5(body, content='dwitter_dweet', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS dwitter_dweet_fts_insert AFTER INSERT ON dwitter_dweet BEGIN
+        INSERT INTO dwitter_dweet_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dwitter_dweet_fts_delete AFTER DELETE ON dwitter_dweet BEGIN
+        INSERT INTO dwitter_dweet_fts(dwitter_dweet_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dwitter_dweet_fts_update AFTER UPDATE OF body ON dwitter_dweet BEGIN
+        INSERT INTO dwitter_dweet_fts(dwitter_dweet_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO dwitter_dweet_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+FTS5_REBUILD_SQL = "INSERT INTO dwitter_dweet_fts(dwitter_dweet_fts) VALUES ('rebuild')"
+FTS5_REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS dwitter_dweet_fts_insert",
+    "DROP TRIGGER IF EXISTS dwitter_dweet_fts_delete",
+    "DROP TRIGGER IF EXISTS dwitter_dweet_fts_update",
+    "DROP TABLE IF EXISTS dwitter_dweet_fts",
+]
+POSTGRES_SQL = [
+    "CREATE INDEX IF NOT EXISTS dweet_body_search ON dwitter_dweet "
+    """USING GIN (to_tsvector('english', "dwitter_dweet"."body"))"""
+]
+POSTGRES_REVERSE_SQL = ["DROP INDEX IF EXISTS dweet_body_search"]
+
+
+def create_full_text_index(apps, schema_editor):
+    """Create the full-text index of the database, others fall back to the SearchTerm table."""
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for sql in POSTGRES_SQL:
+            schema_editor.execute(sql)
+    elif vendor == "sqlite":
+        try:
+            schema_editor.execute(FTS5_SQL[0])
+        except OperationalError:
+            # SQLite compiled without FTS5
+            return
+        for sql in FTS5_SQL[1:]:
+            schema_editor.execute(sql)
+        schema_editor.execute(FTS5_REBUILD_SQL)
+
+
+def drop_full_text_index(apps, schema_editor):
+    """Drop whatever create_full_text_index created."""
+    vendor = schema_editor.connection.vendor
+    for sql in {"postgresql": POSTGRES_REVERSE_SQL, "sqlite": FTS5_REVERSE_SQL}.get(vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0006_profile_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchTerm",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("term", models.CharField(max_length=64)),
+                ("count", models.PositiveIntegerField(default=1)),
+                (
+                    "dweet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="search_terms", to="dwitter.dweet"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="searchterm",
+            constraint=models.UniqueConstraint(fields=("term", "dweet"), name="unique_search_term"),
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("dwitter", "0007_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Mention",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField()),
+                (
+                    "dweet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="mentions", to="dwitter.dweet"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="mentions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-id"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DweetTag",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("tag", models.CharField(max_length=64)),
+                ("created_at", models.DateTimeField()),
+                (
+                    "dweet",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="tags", to="dwitter.dweet"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="mention",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="mention_user_created"),
+        ),
+        migrations.AddConstraint(
+            model_name="mention",
+            constraint=models.UniqueConstraint(fields=("dweet", "user"), name="unique_mention"),
+        ),
+        migrations.AddIndex(
+            model_name="dweettag",
+            index=models.Index(fields=["tag", "-created_at", "-id"], name="dweet_tag_created"),
+        ),
+        migrations.AddConstraint(
+            model_name="dweettag",
+            constraint=models.UniqueConstraint(fields=("dweet", "tag"), name="unique_dweet_tag"),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0008_entities"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagCount",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("tag", models.CharField(max_length=64)),
+                ("bucket", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="tagcount",
+            constraint=models.UniqueConstraint(fields=("bucket", "tag"), name="unique_tag_count"),
+        ),
+    ]
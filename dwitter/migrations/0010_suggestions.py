@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0009_tag_counts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Suggestion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("score", models.PositiveIntegerField()),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="suggestions", to="dwitter.profile"
+                    ),
+                ),
+                (
+                    "suggested",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="suggested_to", to="dwitter.profile"
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-score", "id"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="suggestion",
+            index=models.Index(fields=["profile", "-score", "id"], name="suggestion_profile_score"),
+        ),
+        migrations.AddConstraint(
+            model_name="suggestion",
+            constraint=models.UniqueConstraint(fields=("profile", "suggested"), name="unique_suggestion"),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:40
+
+from django.db import migrations
+
+# frozen copies of the SQL of dwitter.usernames at the time of this migration, so later changes to it do not alter it
+USERNAME_INDEX_SQL = {
+    "postgresql": "CREATE INDEX IF NOT EXISTS auth_user_username_lower ON auth_user (lower(username) text_pattern_ops)",
+    "sqlite": "CREATE INDEX IF NOT EXISTS auth_user_username_lower ON auth_user (lower(username))",
+}
+USERNAME_INDEX_REVERSE_SQL = "DROP INDEX IF EXISTS auth_user_username_lower"
+
+
+def create_username_index(apps, schema_editor):
+    """Index lower(username) on the databases that support expression indexes."""
+    sql = USERNAME_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_username_index(apps, schema_editor):
+    """Drop whatever create_username_index created."""
+    if schema_editor.connection.vendor in USERNAME_INDEX_SQL:
+        schema_editor.execute(USERNAME_INDEX_REVERSE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("dwitter", "0010_suggestions"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
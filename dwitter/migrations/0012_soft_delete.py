@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-17 21:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0011_username_lower_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)), fields=["deleted_at"], name="profile_deleted"
+            ),
+        ),
+    ]
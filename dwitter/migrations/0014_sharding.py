@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# frozen copies of the triggers of dwitter.search at the time of this migration, so later changes to it do not alter it
+FTS5_TABLE = "dwitter_dweet_fts"
+FTS5_TRIGGERS_SQL = [
+    """CREATE TRIGGER IF NOT EXISTS dwitter_dweet_fts_insert AFTER INSERT ON dwitter_dweet BEGIN
+        INSERT INTO dwitter_dweet_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dwitter_dweet_fts_delete AFTER DELETE ON dwitter_dweet BEGIN
+        INSERT INTO dwitter_dweet_fts(dwitter_dweet_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS dwitter_dweet_fts_update AFTER UPDATE OF body ON dwitter_dweet BEGIN
+        INSERT INTO dwitter_dweet_fts(dwitter_dweet_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO dwitter_dweet_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+
+
+def restore_search_triggers(apps, schema_editor):
+    """SQLite drops the FTS5 triggers when it rebuilds dwitter_dweet to alter the user column, see dwitter.search."""
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite" or FTS5_TABLE not in connection.introspection.table_names():
+        return
+    for sql in FTS5_TRIGGERS_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("dwitter", "0013_jobs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DweetId",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+            ],
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="dweet_shard",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="dweet",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="dweets",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0014_sharding"),
+    ]
+
+    operations = [
+        # neither auto_now_add nor the default exist in the database, only the state changes.  Altering the column
+        # would make SQLite rebuild the dweet table and drop the full-text triggers of 0007_search with it
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="dweet",
+                    name="created_at",
+                    field=models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-17 22:50
+
+from django.db import migrations, models
+
+# frozen copies of the lower(username) index of 0011_username_lower_index, replaced by Profile.username_lower
+USERNAME_INDEX_SQL = {
+    "postgresql": "CREATE INDEX IF NOT EXISTS auth_user_username_lower ON auth_user (lower(username) text_pattern_ops)",
+    "sqlite": "CREATE INDEX IF NOT EXISTS auth_user_username_lower ON auth_user (lower(username))",
+}
+USERNAME_INDEX_REVERSE_SQL = "DROP INDEX IF EXISTS auth_user_username_lower"
+
+
+def fill_username_lower(apps, schema_editor):
+    """Lowercase the usernames of the existing Profiles with Python, a thousand at a time."""
+    Profile = apps.get_model("dwitter", "Profile")
+    profiles = []
+    for profile in Profile.objects.select_related("user").only("id", "user__username").iterator(chunk_size=1000):
+        profile.username_lower = profile.user.username.lower()
+        profiles.append(profile)
+        if len(profiles) >= 1000:
+            Profile.objects.bulk_update(profiles, ["username_lower"])
+            profiles = []
+    Profile.objects.bulk_update(profiles, ["username_lower"])
+
+
+def drop_username_index(apps, schema_editor):
+    """Drop the lower(username) index, on the databases 0011 created it on."""
+    if schema_editor.connection.vendor in USERNAME_INDEX_SQL:
+        schema_editor.execute(USERNAME_INDEX_REVERSE_SQL)
+
+
+def create_username_index(apps, schema_editor):
+    """Recreate the lower(username) index of 0011."""
+    sql = USERNAME_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dwitter", "0015_dweet_created_at_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="username_lower",
+            field=models.CharField(blank=True, editable=False, max_length=150),
+        ),
+        migrations.RunPython(fill_username_lower, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                fields=["username_lower"], name="profile_username_lower", opclasses=["varchar_pattern_ops"]
+            ),
+        ),
+        migrations.RunPython(drop_username_index, create_username_index),
+    ]
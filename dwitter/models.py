@@ -3,27 +3,67 @@
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/topics/db/models/
 """
+from collections import Counter
+from typing import Any, Dict, Iterable, Tuple
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models.signals import post_save
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.db.models import F, ProtectedError
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import bump_timeline_versions, invalidate_dweet_card, invalidate_viewers
 
 User = get_user_model()
 
 
-# TODO when deleting a User we get a Foreign Key constraint if they have any Dweets
-# figure out a work around, whether it is a soft delete of the user or simply setting the on_delete to CASCADE
+class DweetQuerySet(models.QuerySet):
+    """Dweets of deleted accounts stay in the table until purge_deleted_users gets to them."""
+
+    def visible(self) -> "DweetQuerySet":
+        """Leave out the Dweets of deleted (deactivated) users.
+
+        Returns
+            DweetQuerySet: Dweets of active users
+
+        """
+        return self.filter(user__is_active=True)
+
+
 class Dweet(models.Model):
-    """Dweet model to track what the user wrote and when."""
+    """Dweet model to track what the user wrote and when.
+
+    Deleting a User with Dweets fails on purpose, cascading could delete millions of rows in one transaction: accounts
+    are soft deleted with Profile.objects.soft_delete and purged in small batches by purge_deleted_users.
 
-    user = models.ForeignKey("auth.user", related_name="dweets", on_delete=models.DO_NOTHING)  # type: ignore
+    With DWITTER_DWEET_SHARDS the Dweets live on their author's shard, which has no User table, hence no foreign key
+    constraint on user on any database: the protect_authors receiver refuses to delete a User with Dweets instead.
+    New Dweets then take their id from DweetId so ids stay unique across shards, see dwitter.sharding.
+    """
+
+    user = models.ForeignKey(  # type: ignore
+        "auth.user", related_name="dweets", on_delete=models.DO_NOTHING, db_constraint=False
+    )
     body = models.CharField(max_length=140)  # type: ignore
-    created_at = models.DateTimeField(auto_now_add=True)  # type: ignore
+    # a default rather than auto_now_add, so bulk loaders and shard moves keep the created_at they set
+    created_at = models.DateTimeField(default=timezone.now)  # type: ignore
+
+    objects = DweetQuerySet.as_manager()
 
     class Meta:
-        """Order the Dweets by reverse created at, aka newest at the top."""
+        """Order the Dweets by reverse created at, aka newest at the top.
+
+        Indexes match the keyset pagination of a single user's Dweets and of the anonymous firehose
+        """
 
         ordering: list = ["-created_at"]
+        indexes: list = [
+            models.Index(fields=["user", "-created_at", "-id"], name="dweet_user_created"),
+            models.Index(fields=["-created_at", "-id"], name="dweet_created"),
+        ]
 
     def __str__(self) -> str:
         """String magic method to provide a string representation of the model.
@@ -34,17 +74,141 @@ class Dweet(models.Model):
         """
         return f"{self.user} {self.created_at:%Y-%m-%d %H:%M}: {self.body[:30]}..."
 
+    def save(self, *args, **kwargs) -> None:
+        """Save the Dweet, new Dweets go to their author's shard with an id unique across the shards when sharded.
+
+        Args:
+            args (Any): positional arguments of Model.save
+            kwargs (Any): keyword arguments of Model.save
+
+        """
+        if self.pk is None and settings.DWITTER_DWEET_SHARDS:
+            # imported here as dwitter.sharding imports the models
+            from .sharding import allocate_dweet_id, shard_of  # pylint: disable=import-outside-toplevel
+
+            self.pk = allocate_dweet_id()
+            kwargs.update(force_insert=True, using=shard_of(self.user_id))
+        super().save(*args, **kwargs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON friendly representation shared by the JSON API and the live timeline.
+
+        Returns
+            Dict[str, Any]: id, body, author username, ISO 8601 created_at and url of the author's profile
+
+        """
+        return {
+            "id": self.pk,
+            "body": self.body,
+            "username": self.user.username,
+            "created_at": self.created_at.isoformat(),
+            "url": reverse("dwitter:profile-detail", args=[self.user.username]),
+        }
+
+
+class ProfileManager(models.Manager):
+    """Helpers to keep the denormalized counters on Profile up to date with atomic F() updates."""
+
+    def adjust_follow_counts(self, follows: Iterable[Tuple[int, int]], delta: int) -> None:
+        """Add delta to following_count/followers_count for each (from_profile_id, to_profile_id) follow.
+
+        Self follows are not counted.
+
+        Args:
+            follows (Iterable[Tuple[int, int]]): follow edges that were added or removed
+            delta (int): 1 for added follows, -1 for removed follows
+
+        """
+        following: Counter = Counter()
+        followers: Counter = Counter()
+        for from_profile_id, to_profile_id in follows:
+            if from_profile_id != to_profile_id:
+                following[from_profile_id] += delta
+                followers[to_profile_id] += delta
+
+        for field, counter in (("following_count", following), ("followers_count", followers)):
+            # one UPDATE per distinct amount rather than one per profile
+            by_amount: dict = {}
+            for profile_id, amount in counter.items():
+                by_amount.setdefault(amount, []).append(profile_id)
+            for amount, profile_ids in by_amount.items():
+                self.filter(pk__in=profile_ids).update(**{field: F(field) + amount})
+
+    def is_following(self, user_id: int, profile_id: int) -> bool:
+        """Whether a user follows a Profile, answered with a single EXISTS on the follows table's unique index.
+
+        Args:
+            user_id (int): primary key of the User doing the following, usually request.user.pk
+            profile_id (int): primary key of the Profile that may be followed
+
+        Returns
+            bool: True if the user follows the Profile
+
+        """
+        return self.model.follows.through.objects.filter(
+            from_profile__user_id=user_id, to_profile_id=profile_id
+        ).exists()
+
+    def adjust_dweet_count(self, user_id: int, delta: int) -> None:
+        """Add delta to dweet_count of a user's Profile.
+
+        Args:
+            user_id (int): primary key of the User who dweeted
+            delta (int): 1 for created Dweets, -1 for deleted Dweets
+
+        """
+        self.filter(user_id=user_id).update(dweet_count=F("dweet_count") + delta)
+
+    def soft_delete(self, profile: "Profile") -> None:
+        """Delete an account right away for everyone, leaving its rows to purge_deleted_users.
+
+        The User is deactivated, which logs it out and hides its Profile and Dweets, see DweetQuerySet.visible.
+
+        Args:
+            profile (Profile): Profile of the account to delete
+
+        """
+        deleted_at = timezone.now()
+        with transaction.atomic():
+            User.objects.filter(pk=profile.user_id).update(is_active=False)
+            self.filter(pk=profile.pk).update(deleted_at=deleted_at)
+        # the updates send no post_save, see invalidate_user_viewers
+        invalidate_viewers([profile.user_id])
+        profile.user.is_active = False
+        profile.deleted_at = deleted_at
+
 
 class Profile(models.Model):
-    """Profile data to be combined/appended to the User model."""
+    """Profile data to be combined/appended to the User model.
+
+    following_count, followers_count and dweet_count are denormalized counters so profile pages don't have to
+    touch the follows table or count Dweets, self follows are not counted.  username_lower is the username lowercased
+    by Python, which unlike the lower() of SQLite also lowercases non-ASCII letters, for dwitter.usernames.
+    """
 
     user = models.OneToOneField("auth.user", on_delete=models.CASCADE)  # type: ignore
     follows = models.ManyToManyField("self", related_name="followed_by", symmetrical=False, blank=True)  # type: ignore
+    following_count = models.IntegerField(default=0)  # type: ignore
+    followers_count = models.IntegerField(default=0)  # type: ignore
+    dweet_count = models.IntegerField(default=0)  # type: ignore
+    deleted_at = models.DateTimeField(null=True, blank=True)  # type: ignore
+    dweet_shard = models.CharField(max_length=100, blank=True)  # type: ignore
+    username_lower = models.CharField(max_length=150, blank=True, editable=False)  # type: ignore
+
+    objects = ProfileManager()
 
     class Meta:
-        """Order by alphabetical username."""
+        """Order by alphabetical username.
+
+        The partial index lets purge_deleted_users find the few deleted Profiles without a scan, username prefixes
+        are read from the username_lower index, with the operator class LIKE 'prefix%' needs on PostgreSQL
+        """
 
         ordering: list = ["user__username"]
+        indexes: list = [
+            models.Index(fields=["deleted_at"], name="profile_deleted", condition=models.Q(deleted_at__isnull=False)),
+            models.Index(fields=["username_lower"], name="profile_username_lower", opclasses=["varchar_pattern_ops"]),
+        ]
 
     def __str__(self) -> str:
         """String magic method to provide a string representation of the model.
@@ -55,6 +219,373 @@ class Profile(models.Model):
         """
         return self.user.username
 
+    @property
+    def dweet_database(self) -> str:
+        """Database alias holding the user's Dweets, the primary until they are placed on a shard.
+
+        Returns
+            str: database alias
+
+        """
+        return self.dweet_shard or DEFAULT_DB_ALIAS
+
+
+# entries of some timelines ranked beyond the maximum, newest first, see TimelineEntryManager.trim
+TRIM_TIMELINES_SQL: str = """
+DELETE FROM {table} WHERE id IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (PARTITION BY profile_id ORDER BY created_at DESC, id DESC) AS position
+        FROM {table} WHERE profile_id IN ({profile_ids})
+    ) ranked WHERE position > %s
+)
+"""
+
+
+class TimelineEntryManager(models.Manager):
+    """Helpers to keep the materialized home timelines in sync with Dweets and follows.
+
+    Every change to a timeline also bumps its version in the timeline cache, see dwitter.cache
+    """
+
+    # timelines trimmed per DELETE, below the 999 bound parameters of older SQLite versions
+    TRIM_BATCH_SIZE: int = 500
+
+    def fan_out(self, dweet: Dweet) -> None:
+        """Push a newly created Dweet onto the timeline of every Profile following its author.
+
+        Args:
+            dweet (Dweet): freshly saved Dweet
+
+        """
+        follower_ids: list = list(
+            Profile.follows.through.objects.filter(to_profile__user_id=dweet.user_id).values_list(
+                "from_profile_id", flat=True
+            )
+        )
+        self.bulk_create(
+            [self.model(profile_id=pk, dweet=dweet, created_at=dweet.created_at) for pk in follower_ids],
+            ignore_conflicts=True,
+        )
+        self.trim(follower_ids)
+        # after the commit, or a read in between would cache the old entries under the fresh version
+        transaction.on_commit(lambda: bump_timeline_versions(follower_ids))
+
+    def backfill(self, profile_id: int, followee_ids: Iterable[int]) -> None:
+        """Copy the newest Dweets of newly followed Profiles into a timeline.
+
+        Args:
+            profile_id (int): primary key of the Profile that followed someone
+            followee_ids (Iterable[int]): primary keys of the Profiles that were followed
+
+        """
+        dweets = Dweet.objects.filter(user__profile__in=followee_ids).values_list("id", "created_at")
+        self.bulk_create(
+            [
+                self.model(profile_id=profile_id, dweet_id=dweet_id, created_at=created_at)
+                for dweet_id, created_at in dweets[: settings.DWITTER_TIMELINE_MAX_ENTRIES]
+            ],
+            ignore_conflicts=True,
+        )
+        self.trim([profile_id])
+        # follows change inside the atomic block of the m2m add(), bump once it commits
+        transaction.on_commit(lambda: bump_timeline_versions([profile_id]))
+
+    def prune(self, profile_id: int, followee_ids: Iterable[int]) -> None:
+        """Remove the Dweets of unfollowed Profiles from a timeline.
+
+        Args:
+            profile_id (int): primary key of the Profile that unfollowed someone
+            followee_ids (Iterable[int]): primary keys of the Profiles that were unfollowed
+
+        """
+        self.filter(profile_id=profile_id, dweet__user__profile__in=followee_ids).delete()
+        transaction.on_commit(lambda: bump_timeline_versions([profile_id]))
+
+    def trim(self, profile_ids: Iterable[int]) -> None:
+        """Drop the oldest entries of each timeline beyond DWITTER_TIMELINE_MAX_ENTRIES.
+
+        A single DELETE per TRIM_BATCH_SIZE timelines ranks their entries with a window function on the
+        (profile, created_at, id) index, rather than a query per timeline, so a Dweet fanned out to thousands of
+        followers trims them in a few statements.
+
+        Args:
+            profile_ids (Iterable[int]): primary keys of the Profiles whose timelines may have grown
+
+        """
+        profile_ids = list(profile_ids)
+        using: str = router.db_for_write(self.model)
+        connection = connections[using]
+        table: str = connection.ops.quote_name(self.model._meta.db_table)
+        for start in range(0, len(profile_ids), self.TRIM_BATCH_SIZE):
+            batch: list = profile_ids[start : start + self.TRIM_BATCH_SIZE]
+            # only the table name and the placeholders are interpolated
+            sql: str = TRIM_TIMELINES_SQL.format(table=table, profile_ids=", ".join(["%s"] * len(batch)))
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [*batch, settings.DWITTER_TIMELINE_MAX_ENTRIES])  # nosec
+
+    def rebuild(self, profile: Profile) -> None:
+        """Throw away a timeline and recreate it from the Profiles it currently follows.
+
+        Args:
+            profile (Profile): Profile whose timeline should be rebuilt
+
+        """
+        self.filter(profile=profile).delete()
+        self.backfill(profile.pk, profile.follows.values_list("id", flat=True))
+
+
+class TimelineEntry(models.Model):
+    """Materialized home timeline, one row per Dweet per Profile following its author.
+
+    Written when a Dweet is created or a Profile is followed so the dashboard can read a single indexed range
+    instead of filtering every Dweet by the list of followed users.
+    """
+
+    profile = models.ForeignKey(Profile, related_name="timeline_entries", on_delete=models.CASCADE)  # type: ignore
+    dweet = models.ForeignKey(Dweet, related_name="timeline_entries", on_delete=models.CASCADE)  # type: ignore
+    created_at = models.DateTimeField()  # type: ignore
+
+    objects = TimelineEntryManager()
+
+    class Meta:
+        """Newest entries first, at most one entry per Dweet per timeline."""
+
+        ordering: list = ["-created_at", "-id"]
+        constraints: list = [models.UniqueConstraint(fields=["profile", "dweet"], name="unique_timeline_entry")]
+        indexes: list = [models.Index(fields=["profile", "-created_at", "-id"], name="timeline_profile_created")]
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return f"{self.profile_id} <- {self.dweet_id}"
+
+
+class SearchTermManager(models.Manager):
+    """Helpers to keep the pure Python inverted index of Dweets in sync, see dwitter.search."""
+
+    def index(self, dweet: Dweet, tokens: Dict[str, int]) -> None:
+        """Replace the terms of a Dweet.
+
+        Args:
+            dweet (Dweet): saved Dweet
+            tokens (Dict[str, int]): number of occurrences of each term in the body
+
+        """
+        self.filter(dweet=dweet).delete()
+        self.bulk_create([self.model(term=term, dweet=dweet, count=count) for term, count in tokens.items()])
+
+
+class SearchTerm(models.Model):
+    """Inverted index of Dweet bodies, one row per term per Dweet.
+
+    Only used by the "python" search backend, databases with a full-text index of their own (FTS5, tsvector) do not
+    fill it.  The unique constraint doubles as the (term, dweet) index searches read.
+    """
+
+    term = models.CharField(max_length=64)  # type: ignore
+    dweet = models.ForeignKey(Dweet, related_name="search_terms", on_delete=models.CASCADE)  # type: ignore
+    count = models.PositiveIntegerField(default=1)  # type: ignore
+
+    objects = SearchTermManager()
+
+    class Meta:
+        """At most one row per term per Dweet."""
+
+        constraints: list = [models.UniqueConstraint(fields=["term", "dweet"], name="unique_search_term")]
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return f"{self.term} x{self.count} in {self.dweet_id}"
+
+
+class DweetTag(models.Model):
+    """Hashtag used in a Dweet, one row per tag per Dweet, see dwitter.entities.
+
+    created_at is copied from the Dweet so a tag page is a single indexed range read.
+    """
+
+    tag = models.CharField(max_length=64)  # type: ignore
+    dweet = models.ForeignKey(Dweet, related_name="tags", on_delete=models.CASCADE)  # type: ignore
+    created_at = models.DateTimeField()  # type: ignore
+
+    class Meta:
+        """Newest first, at most one row per tag per Dweet."""
+
+        ordering: list = ["-created_at", "-id"]
+        constraints: list = [models.UniqueConstraint(fields=["dweet", "tag"], name="unique_dweet_tag")]
+        indexes: list = [models.Index(fields=["tag", "-created_at", "-id"], name="dweet_tag_created")]
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return f"#{self.tag} in {self.dweet_id}"
+
+
+class Mention(models.Model):
+    """User mentioned in a Dweet, one row per user per Dweet, see dwitter.entities.
+
+    created_at is copied from the Dweet so the mentions of a user are a single indexed range read.
+    """
+
+    user = models.ForeignKey("auth.user", related_name="mentions", on_delete=models.CASCADE)  # type: ignore
+    dweet = models.ForeignKey(Dweet, related_name="mentions", on_delete=models.CASCADE)  # type: ignore
+    created_at = models.DateTimeField()  # type: ignore
+
+    class Meta:
+        """Newest first, at most one row per user per Dweet."""
+
+        ordering: list = ["-created_at", "-id"]
+        constraints: list = [models.UniqueConstraint(fields=["dweet", "user"], name="unique_mention")]
+        indexes: list = [models.Index(fields=["user", "-created_at", "-id"], name="mention_user_created")]
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return f"@{self.user_id} in {self.dweet_id}"
+
+
+class TagCount(models.Model):
+    """Number of Dweets using a hashtag within a time bucket, see dwitter.trending.
+
+    Buckets are a minute long when written and merged into hour long buckets by compact_trending once they fall out
+    of the shortest trending window.
+    """
+
+    tag = models.CharField(max_length=64)  # type: ignore
+    bucket = models.DateTimeField()  # type: ignore
+    count = models.PositiveIntegerField(default=0)  # type: ignore
+
+    class Meta:
+        """At most one row per tag per bucket, the unique constraint doubles as the bucket range index."""
+
+        constraints: list = [models.UniqueConstraint(fields=["bucket", "tag"], name="unique_tag_count")]
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return f"#{self.tag} x{self.count} at {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class SuggestionManager(models.Manager):
+    """Helpers to write the "who to follow" suggestions computed by recommend_follows, see dwitter.recommendations."""
+
+    def replace(self, profile_ids: Iterable[int], suggestions: Iterable[Tuple[int, int, int]]) -> None:
+        """Replace the suggestions of some Profiles.
+
+        Args:
+            profile_ids (Iterable[int]): primary keys of the Profiles whose suggestions were recomputed
+            suggestions (Iterable[Tuple[int, int, int]]): (profile id, suggested profile id, score) rows
+
+        """
+        self.filter(profile_id__in=list(profile_ids)).delete()
+        self.bulk_create(
+            [
+                self.model(profile_id=profile_id, suggested_id=suggested_id, score=score)
+                for profile_id, suggested_id, score in suggestions
+            ]
+        )
+
+
+class Suggestion(models.Model):
+    """Profile suggested to follow, scored by the number of followed Profiles that follow it.
+
+    Precomputed in batch from a snapshot of the follow graph, so rows go stale until the next recompute.
+    """
+
+    profile = models.ForeignKey(Profile, related_name="suggestions", on_delete=models.CASCADE)  # type: ignore
+    suggested = models.ForeignKey(Profile, related_name="suggested_to", on_delete=models.CASCADE)  # type: ignore
+    score = models.PositiveIntegerField()  # type: ignore
+
+    objects = SuggestionManager()
+
+    class Meta:
+        """Best suggestions first, at most one row per suggested Profile per Profile."""
+
+        ordering: list = ["-score", "id"]
+        constraints: list = [models.UniqueConstraint(fields=["profile", "suggested"], name="unique_suggestion")]
+        indexes: list = [models.Index(fields=["profile", "-score", "id"], name="suggestion_profile_score")]
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return f"{self.profile_id} -> {self.suggested_id} ({self.score})"
+
+
+class DweetId(models.Model):
+    """Ticket handing out the ids of sharded Dweets, only its sequence matters, see dwitter.sharding."""
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return str(self.pk)
+
+
+class Job(models.Model):
+    """Background job stored in the database, see dwitter.jobs.
+
+    Queued jobs are claimed by run_jobs workers, which take a lease on them until locked_until.  Jobs that succeed
+    are deleted, jobs that keep failing are kept as dead letters for inspection.
+    """
+
+    QUEUED: str = "queued"
+    RUNNING: str = "running"
+    DEAD: str = "dead"
+    STATUSES: list = [(QUEUED, "Queued"), (RUNNING, "Running"), (DEAD, "Dead")]
+
+    name = models.CharField(max_length=100)  # type: ignore
+    payload = models.JSONField(default=dict)  # type: ignore
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)  # type: ignore
+    attempts = models.PositiveIntegerField(default=0)  # type: ignore
+    run_at = models.DateTimeField(default=timezone.now)  # type: ignore
+    locked_by = models.CharField(max_length=64, blank=True)  # type: ignore
+    locked_until = models.DateTimeField(null=True, blank=True)  # type: ignore
+    last_error = models.TextField(blank=True)  # type: ignore
+    created_at = models.DateTimeField(auto_now_add=True)  # type: ignore
+
+    class Meta:
+        """Oldest due jobs first, on an index matching the claim query."""
+
+        ordering: list = ["run_at", "id"]
+        indexes: list = [models.Index(fields=["status", "run_at", "id"], name="job_status_run_at")]
+
+    def __str__(self) -> str:
+        """String magic method to provide a string representation of the model.
+
+        Returns
+            str: string representation of the model
+
+        """
+        return f"{self.name} #{self.pk} ({self.status}, {self.attempts} attempts)"
+
 
 @receiver(post_save, sender=User)
 def create_profile(instance, created, **kwargs):
@@ -67,6 +598,221 @@ def create_profile(instance, created, **kwargs):
 
     """
     if created:
-        user_profile = Profile(user=instance)
+        user_profile = Profile(user=instance, username_lower=instance.username.lower())
+        if settings.DWITTER_DWEET_SHARDS:
+            # imported here as dwitter.sharding imports the models
+            from .sharding import hash_shard  # pylint: disable=import-outside-toplevel
+
+            user_profile.dweet_shard = hash_shard(instance.pk)
         user_profile.save()
         user_profile.follows.add(user_profile)
+
+
+@receiver(post_save, sender=User)
+def rename_profile(instance, created, update_fields=None, **kwargs):
+    """Post save method to keep Profile.username_lower in step with renames.
+
+    Args:
+        sender (User Model): Set to receive post_save signal from the User model
+        instance (User Obj): Instance of the User model that was saved
+        created (Boolean): Whether or not the model was just created
+        update_fields (Optional[frozenset]): fields saved, None for all of them
+
+    """
+    # logins only save last_login
+    if not created and (update_fields is None or "username" in update_fields):
+        username_lower: str = instance.username.lower()
+        Profile.objects.filter(user=instance).exclude(username_lower=username_lower).update(
+            username_lower=username_lower
+        )
+
+
+@receiver(pre_delete, sender=User)
+def protect_authors(instance, **kwargs):
+    """Pre delete method to refuse deleting a User that still has Dweets, on any database.
+
+    Stands in for the foreign key constraint Dweet.user cannot have, see Dweet.
+
+    Args:
+        sender (User Model): Set to receive pre_delete signal from the User model
+        instance (User Obj): Instance of the User model about to be deleted
+
+    Raises
+        ProtectedError: the User has Dweets, purge them with purge_deleted_users first
+
+    """
+    # imported here as dwitter.sharding imports the models
+    from .sharding import dweet_databases  # pylint: disable=import-outside-toplevel
+
+    for alias in dweet_databases():
+        dweets = Dweet.objects.using(alias).filter(user_id=instance.pk)
+        if dweets.exists():
+            raise ProtectedError(
+                f"Cannot delete {instance}, it still has Dweets on {alias}, see purge_deleted_users", dweets
+            )
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_viewers(instance, **kwargs):
+    """Post save method to drop the cached viewers of a changed User, see dwitter.viewer.
+
+    Covers renames, password changes (which log the other sessions out) and deactivations.
+
+    Args:
+        sender (User Model): Set to receive post_save signal from the User model
+        instance (User Obj): Instance of the User model that was saved
+
+    """
+    invalidate_viewers([instance.pk])
+
+
+@receiver(post_save, sender=Dweet)
+def fan_out_dweet(instance, created, **kwargs):
+    """Post save method to queue the work a new Dweet causes, see dwitter.jobs.dweet_created.
+
+    Args:
+        sender (Dweet Model): Set to receive post_save signal from the Dweet model
+        instance (Dweet Obj): Instance of the Dweet model that was saved
+        created (Boolean): Whether or not the model was just created
+
+    """
+    if created:
+        # imported here as dwitter.jobs imports the models
+        from .jobs import enqueue  # pylint: disable=import-outside-toplevel
+
+        enqueue("dweet_created", dweet_id=instance.pk, user_id=instance.user_id)
+
+
+@receiver(post_save, sender=Dweet)
+def invalidate_dweet_card_cache(instance, created, **kwargs):
+    """Post save method to drop the cached card of an edited Dweet.
+
+    Cards of renamed users are invalidated by the username being part of the cache key.
+
+    Args:
+        sender (Dweet Model): Set to receive post_save signal from the Dweet model
+        instance (Dweet Obj): Instance of the Dweet model that was saved
+        created (Boolean): Whether or not the model was just created
+
+    """
+    if not created:
+        invalidate_dweet_card(instance)
+
+
+@receiver(post_save, sender=Dweet)
+def index_dweet(instance, **kwargs):
+    """Post save method to keep the search index in sync, only the "python" search backend needs it.
+
+    The index lives on the primary, which is why search must be turned off while the Dweets are sharded.
+
+    Args:
+        sender (Dweet Model): Set to receive post_save signal from the Dweet model
+        instance (Dweet Obj): Instance of the Dweet model that was saved
+
+    """
+    if instance._state.db != DEFAULT_DB_ALIAS or settings.DWITTER_SEARCH_BACKEND is None:
+        return
+
+    # imported here as dwitter.search imports the models
+    from .search import get_search_backend  # pylint: disable=import-outside-toplevel
+
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Dweet)
+def uncount_dweet(instance, **kwargs):
+    """Post delete method to keep Profile.dweet_count in sync.
+
+    Args:
+        sender (Dweet Model): Set to receive post_delete signal from the Dweet model
+        instance (Dweet Obj): Instance of the Dweet model that was deleted
+
+    """
+    Profile.objects.adjust_dweet_count(instance.user_id, -1)
+
+
+@receiver(m2m_changed, sender=Profile.follows.through)
+def sync_timeline_follows(instance, action, reverse, pk_set, **kwargs):
+    """M2M changed method to backfill or prune timelines when Profiles are followed or unfollowed, unless pulled.
+
+    Args:
+        sender (Through Model): Set to receive m2m_changed signal from the Profile.follows relation
+        instance (Profile Obj): Profile on the side of the relation the change was made from
+        action (str): Type of change, only post_add/post_remove/post_clear are handled
+        reverse (Boolean): True when the change was made through Profile.followed_by
+        pk_set (set): primary keys of the Profiles added or removed
+
+    """
+    if settings.DWITTER_TIMELINE_ENGINE != "push":
+        return
+
+    if action == "post_clear":
+        if reverse:
+            entries = TimelineEntry.objects.filter(dweet__user=instance.user)
+            # listed before the delete, the bump itself waits for the commit like in backfill and prune
+            profile_ids: list = list(entries.values_list("profile_id", flat=True).distinct())
+            entries.delete()
+            transaction.on_commit(lambda: bump_timeline_versions(profile_ids))
+        else:
+            TimelineEntry.objects.filter(profile=instance).delete()
+            transaction.on_commit(lambda: bump_timeline_versions([instance.pk]))
+        return
+
+    if action not in ("post_add", "post_remove"):
+        return
+
+    sync = TimelineEntry.objects.backfill if action == "post_add" else TimelineEntry.objects.prune
+    if reverse:
+        for follower_id in pk_set:
+            sync(follower_id, [instance.pk])
+    else:
+        sync(instance.pk, pk_set)
+
+
+@receiver(m2m_changed, sender=Profile.follows.through)
+def sync_follow_counters(instance, action, reverse, pk_set, **kwargs):
+    """M2M changed method to keep Profile.following_count and Profile.followers_count in sync.
+
+    post_add only receives the follows that were actually created, but remove/clear receive whatever was asked for,
+    so those are counted from the table in pre_remove/pre_clear, inside the same transaction as the delete.
+
+    Args:
+        sender (Through Model): Set to receive m2m_changed signal from the Profile.follows relation
+        instance (Profile Obj): Profile on the side of the relation the change was made from
+        action (str): Type of change, only post_add/pre_remove/pre_clear are handled
+        reverse (Boolean): True when the change was made through Profile.followed_by
+        pk_set (set): primary keys of the Profiles added or removed
+
+    """
+    if action == "post_add":
+        follows: list = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+        Profile.objects.adjust_follow_counts(follows, 1)
+
+    elif action in ("pre_remove", "pre_clear"):
+        rows = Profile.follows.through.objects.filter(**{"to_profile" if reverse else "from_profile": instance})
+        if action == "pre_remove":
+            rows = rows.filter(**{"from_profile__in" if reverse else "to_profile__in": pk_set})
+        Profile.objects.adjust_follow_counts(rows.values_list("from_profile_id", "to_profile_id"), -1)
+
+
+@receiver(m2m_changed, sender=Profile.follows.through)
+def invalidate_follower_viewers(instance, action, reverse, pk_set, **kwargs):
+    """M2M changed method to drop the cached viewers of the Profiles whose follows changed, see dwitter.viewer.
+
+    This is how following/unfollowing in ProfileFollowView reaches the follow buttons, the suggestions and the pulled
+    timelines.  The followers cleared from the reverse side are only known before the clear.
+
+    Args:
+        sender (Through Model): Set to receive m2m_changed signal from the Profile.follows relation
+        instance (Profile Obj): Profile on the side of the relation the change was made from
+        action (str): Type of change, only post_add/post_remove/post_clear and reverse pre_clear are handled
+        reverse (Boolean): True when the change was made through Profile.followed_by
+        pk_set (set): primary keys of the Profiles added or removed
+
+    """
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        invalidate_viewers([instance.user_id])
+    elif reverse and action in ("post_add", "post_remove"):
+        invalidate_viewers(Profile.objects.filter(pk__in=pk_set).values_list("user_id", flat=True))
+    elif reverse and action == "pre_clear":
+        invalidate_viewers(Profile.objects.filter(follows=instance).values_list("user_id", flat=True))
@@ -0,0 +1,441 @@
+"""Keyset (cursor) pagination for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/pagination/
+
+Django's Paginator issues a COUNT(*) and an OFFSET for every page, so deep pages get slower as the Dweet table
+grows.  CursorPaginator instead filters on the (created_at, id) of the last row shown and never counts, so the cost
+of a page does not depend on how deep it is.  Cursors are opaque, url-safe tokens passed around as ?cursor=.
+"""
+import base64
+import binascii
+import heapq
+import json
+from collections.abc import Sequence
+from itertools import islice
+from typing import Any, Iterable, List, Optional, Tuple
+
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+NEXT: str = "n"
+PREVIOUS: str = "p"
+
+
+class InvalidCursor(InvalidPage):
+    """The ?cursor= token could not be decoded."""
+
+
+class CursorPage(Sequence):
+    """A single page of results, quacks enough like django.core.paginator.Page for the templates.
+
+    Args:
+        Sequence (Sequence): list-like access to the objects on the page
+
+    """
+
+    is_cursor: bool = True
+
+    def __init__(
+        self,
+        object_list: list,
+        paginator: "CursorPaginator",
+        next_cursor: Optional[str],
+        previous_cursor: Optional[str],
+    ) -> None:
+        """Store the objects on the page and the cursors of its neighbours.
+
+        Args:
+            object_list (list): objects on this page
+            paginator (CursorPaginator): paginator that built the page
+            next_cursor (Optional[str]): token for the next (older) page, None on the last page
+            previous_cursor (Optional[str]): token for the previous (newer) page, None on the first page
+
+        """
+        self.object_list: list = object_list
+        self.paginator: CursorPaginator = paginator
+        self.next_cursor: Optional[str] = next_cursor
+        self.previous_cursor: Optional[str] = previous_cursor
+
+    def __repr__(self) -> str:
+        """Representation magic method for debugging.
+
+        Returns
+            str: representation of the page
+
+        """
+        return f"<CursorPage next={self.next_cursor} previous={self.previous_cursor}>"
+
+    def __len__(self) -> int:
+        """Number of objects on the page.
+
+        Returns
+            int: number of objects on the page
+
+        """
+        return len(self.object_list)
+
+    def __getitem__(self, index: Any) -> Any:
+        """Index into the objects on the page.
+
+        Args:
+            index (Any): integer or slice
+
+        Returns
+            Any: object(s) on the page
+
+        """
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        """Whether there is an older page.
+
+        Returns
+            bool: True if there is a next page
+
+        """
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        """Whether there is a newer page.
+
+        Returns
+            bool: True if there is a previous page
+
+        """
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        """Whether there is any other page.
+
+        Returns
+            bool: True if there is a next or previous page
+
+        """
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginate a QuerySet newest first on a (datetime, unique id) pair of keys without COUNT or OFFSET."""
+
+    def __init__(self, object_list: QuerySet, per_page: int, keys: Tuple[str, str] = ("created_at", "id")) -> None:
+        """Store the QuerySet to paginate.
+
+        Args:
+            object_list (QuerySet): QuerySet to paginate, its ordering is replaced by the keys
+            per_page (int): maximum number of objects per page
+            keys (Tuple[str, str]): datetime field and unique tie-breaker field to order and filter on
+
+        """
+        self.object_list: QuerySet = object_list
+        self.per_page: int = int(per_page)
+        self.keys: Tuple[str, str] = keys
+
+    def get_ordered_queryset(self, newest_first: bool = True) -> QuerySet:
+        """Order the QuerySet on the keys.
+
+        Args:
+            newest_first (bool): descending order when True, ascending otherwise
+
+        Returns
+            QuerySet: ordered QuerySet, the first page is its first per_page + 1 rows
+
+        """
+        prefix: str = "-" if newest_first else ""
+        return self.object_list.order_by(*(f"{prefix}{key}" for key in self.keys))
+
+    def encode_cursor(self, obj: Any, direction: str) -> str:
+        """Build the opaque token pointing just past obj.
+
+        Args:
+            obj (Any): first or last object of a page
+            direction (str): NEXT for older objects, PREVIOUS for newer objects
+
+        Returns
+            str: url-safe cursor token
+
+        """
+        timestamp, pk = (getattr(obj, key) for key in self.keys)
+        payload: bytes = json.dumps([direction, timestamp.isoformat(), pk]).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(token: str) -> Tuple[str, Any, int]:
+        """Unpack a token built by encode_cursor.
+
+        Args:
+            token (str): cursor token from the query string
+
+        Raises
+            InvalidCursor: token is malformed
+
+        Returns
+            Tuple[str, Any, int]: direction, datetime and id of the row the token points past
+
+        """
+        try:
+            payload: bytes = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            direction, timestamp, pk = json.loads(payload)
+            created_at = parse_datetime(timestamp)
+        except (binascii.Error, TypeError, ValueError) as err:
+            raise InvalidCursor("That cursor is not valid") from err
+
+        if direction not in (NEXT, PREVIOUS) or created_at is None or not isinstance(pk, int):
+            raise InvalidCursor("That cursor is not valid")
+        return direction, created_at, pk
+
+    def page(self, cursor: Optional[str] = None, number: Optional[str] = None) -> CursorPage:
+        """Return the page a cursor points to.
+
+        Args:
+            cursor (Optional[str]): token from the query string, None for the first page
+            number (Optional[str]): deprecated ?page= number, only used when there is no cursor
+
+        Raises
+            InvalidPage: cursor or page number is invalid
+
+        Returns
+            CursorPage: page of objects along with the cursors of its neighbours
+
+        """
+        if not cursor and number:
+            return self._page_from_number(number)
+
+        if not cursor:
+            object_list: list = self.get_objects(self.per_page + 1)
+            return self.build_page(object_list, has_newer=False, has_older=len(object_list) > self.per_page)
+
+        direction, created_at, pk = self.decode_cursor(cursor)
+        if direction == NEXT:
+            object_list = self.get_objects(self.per_page + 1, after=(created_at, pk))
+            return self.build_page(object_list, has_newer=True, has_older=len(object_list) > self.per_page)
+
+        object_list = self.get_objects(self.per_page + 1, newest_first=False, after=(created_at, pk))
+        has_newer: bool = len(object_list) > self.per_page
+        return self.build_page(object_list[: self.per_page][::-1], has_newer=has_newer, has_older=True)
+
+    def get_objects(
+        self, limit: int, newest_first: bool = True, after: Optional[Tuple[Any, int]] = None, offset: int = 0
+    ) -> list:
+        """Fetch a slice of the ordered objects.
+
+        Args:
+            limit (int): maximum number of objects
+            newest_first (bool): walk towards older objects when True, towards newer objects otherwise
+            after (Optional[Tuple[Any, int]]): only objects past this (datetime, id) in the walking direction
+            offset (int): number of objects to skip
+
+        Returns
+            list: objects in walking order
+
+        """
+        return list(self.seek(self.get_ordered_queryset(newest_first), newest_first, after)[offset : offset + limit])
+
+    def seek(self, queryset: QuerySet, newest_first: bool, after: Optional[Tuple[Any, int]]) -> QuerySet:
+        """Filter a QuerySet down to the objects past a (datetime, id) pair, an index range on the keys.
+
+        Args:
+            queryset (QuerySet): QuerySet to filter
+            newest_first (bool): keep older objects when True, newer objects otherwise
+            after (Optional[Tuple[Any, int]]): (datetime, id) of the object to seek past, None to keep everything
+
+        Returns
+            QuerySet: filtered QuerySet
+
+        """
+        if after is None:
+            return queryset
+
+        time_key, id_key = self.keys
+        created_at, pk = after
+        lookup: str = "lt" if newest_first else "gt"
+        return queryset.filter(
+            Q(**{f"{time_key}__{lookup}": created_at}) | Q(**{time_key: created_at, f"{id_key}__{lookup}": pk})
+        )
+
+    def _page_from_number(self, number: str) -> CursorPage:
+        """Support old ?page=N links during the deprecation period, the neighbours are linked with cursors.
+
+        Args:
+            number (str): 1-based page number
+
+        Raises
+            InvalidPage: number is not a positive integer
+
+        Returns
+            CursorPage: requested page
+
+        """
+        try:
+            page_number: int = int(number)
+        except (TypeError, ValueError) as err:
+            raise InvalidPage("That page number is not an integer") from err
+        if page_number < 1:
+            raise InvalidPage("That page number is less than 1")
+
+        object_list: list = self.get_objects(self.per_page + 1, offset=(page_number - 1) * self.per_page)
+        if not object_list and page_number > 1:
+            raise InvalidPage("That page contains no results")
+        return self.build_page(object_list, has_newer=page_number > 1, has_older=len(object_list) > self.per_page)
+
+    def build_page(self, object_list: list, has_newer: bool, has_older: bool) -> CursorPage:
+        """Trim the look-ahead row and compute the neighbouring cursors.
+
+        Args:
+            object_list (list): objects newest first, possibly with one extra look-ahead row
+            has_newer (bool): whether there are newer objects than the first one
+            has_older (bool): whether there are older objects than the last one on the page
+
+        Returns
+            CursorPage: page of objects
+
+        """
+        object_list = object_list[: self.per_page]
+        next_cursor: Optional[str] = None
+        previous_cursor: Optional[str] = None
+        if object_list and has_older:
+            next_cursor = self.encode_cursor(object_list[-1], NEXT)
+        if object_list and has_newer:
+            previous_cursor = self.encode_cursor(object_list[0], PREVIOUS)
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Paginate the union of many partitions of a QuerySet with a k-way merge of their heads.
+
+    Rather than one query filtering on partition__in=<list>, every partition (e.g. the Dweets of a single author) is
+    read as its own short range of the (partition, datetime, id) index, only the keys are fetched and merged with a
+    heap, and the winning objects are loaded by primary key.  The rows read for a page are bounded by page size times
+    the number of partitions, however many objects each partition holds.  Databases that allow LIMIT inside UNION
+    (PostgreSQL) read the ranges PARTITIONS_PER_QUERY at a time, others (SQLite) one query per partition.
+    """
+
+    PARTITIONS_PER_QUERY: int = 100
+
+    def __init__(
+        self,
+        object_list: QuerySet,
+        per_page: int,
+        partition_field: str,
+        partitions: Iterable[Any],
+        keys: Tuple[str, str] = ("created_at", "id"),
+    ) -> None:
+        """Store the QuerySet to paginate and its partitions.
+
+        Args:
+            object_list (QuerySet): QuerySet to paginate, its ordering is replaced by the keys
+            per_page (int): maximum number of objects per page
+            partition_field (str): field the QuerySet is partitioned on, first column of the index
+            partitions (Iterable[Any]): values of partition_field to merge
+            keys (Tuple[str, str]): datetime field and unique tie-breaker field to order and filter on
+
+        """
+        super().__init__(object_list, per_page, keys=keys)
+        self.partition_field: str = partition_field
+        self.partitions: List[Any] = list(partitions)
+
+    def get_objects(
+        self, limit: int, newest_first: bool = True, after: Optional[Tuple[Any, int]] = None, offset: int = 0
+    ) -> list:
+        """Merge the heads of every partition and load the winners.
+
+        Args:
+            limit (int): maximum number of objects
+            newest_first (bool): walk towards older objects when True, towards newer objects otherwise
+            after (Optional[Tuple[Any, int]]): only objects past this (datetime, id) in the walking direction
+            offset (int): number of objects to skip
+
+        Returns
+            list: objects in walking order
+
+        """
+        heads: List[list] = self.get_heads(offset + limit, newest_first, after)
+        merged: List[tuple] = list(islice(heapq.merge(*heads, reverse=newest_first), offset, offset + limit))
+        objects: dict = self.object_list.in_bulk([pk for _, pk in merged]) if merged else {}
+        return [objects[pk] for _, pk in merged if pk in objects]
+
+    def get_heads(self, limit: int, newest_first: bool, after: Optional[Tuple[Any, int]]) -> List[list]:
+        """Read the first keys of every partition.
+
+        Args:
+            limit (int): maximum number of keys per partition
+            newest_first (bool): walk towards older objects when True, towards newer objects otherwise
+            after (Optional[Tuple[Any, int]]): only objects past this (datetime, id) in the walking direction
+
+        Returns
+            List[list]: sorted (datetime, id) keys of each partition
+
+        """
+        queryset: QuerySet = self.seek(self.get_ordered_queryset(newest_first), newest_first, after).values_list(
+            *self.keys
+        )
+        ranges: List[QuerySet] = [
+            queryset.filter(**{self.partition_field: partition})[:limit] for partition in self.partitions
+        ]
+
+        if not connections[queryset.db].features.supports_slicing_ordering_in_compound:
+            return [list(keys) for keys in ranges]
+
+        # the ranges of a chunk come back mixed, heapq.merge only needs each list sorted
+        heads: List[list] = []
+        for start in range(0, len(ranges), self.PARTITIONS_PER_QUERY):
+            chunk: List[QuerySet] = ranges[start : start + self.PARTITIONS_PER_QUERY]
+            keys: list = list(chunk[0].union(*chunk[1:], all=True)) if len(chunk) > 1 else list(chunk[0])
+            heads.append(sorted(keys, reverse=newest_first))
+        return heads
+
+
+class CursorPaginationMixin:
+    """Swap the OFFSET based pagination of MultipleObjectMixin for CursorPaginator.
+
+    Reads ?cursor= from the query string, falling back to the deprecated ?page= when no cursor is given
+    """
+
+    cursor_keys: Tuple[str, str] = ("created_at", "id")
+
+    def get_cursor_keys(self) -> Tuple[str, str]:
+        """Datetime and tie-breaker fields the paginated QuerySet is ordered on.
+
+        Returns
+            Tuple[str, str]: keys passed to CursorPaginator
+
+        """
+        return self.cursor_keys
+
+    def get_cursor_paginator(self, queryset: QuerySet, page_size: int) -> "CursorPaginator":
+        """Paginator used by paginate_queryset.
+
+        Args:
+            queryset (QuerySet): QuerySet to paginate
+            page_size (int): maximum number of objects per page
+
+        Returns
+            CursorPaginator: paginator ordered on get_cursor_keys()
+
+        """
+        return CursorPaginator(queryset, page_size, keys=self.get_cursor_keys())
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int) -> Tuple[CursorPaginator, CursorPage, list, bool]:
+        """Paginate the queryset with a CursorPaginator.
+
+        Args:
+            queryset (QuerySet): QuerySet to paginate
+            page_size (int): maximum number of objects per page
+
+        Raises
+            Http404: cursor or page number is invalid
+
+        Returns
+            Tuple[CursorPaginator, CursorPage, list, bool]: same shape as MultipleObjectMixin.paginate_queryset
+        """
+        paginator: CursorPaginator = self.get_cursor_paginator(queryset, page_size)
+        try:
+            page: CursorPage = paginator.page(
+                cursor=self.request.GET.get("cursor"), number=self.request.GET.get("page")  # type: ignore
+            )
+        except InvalidPage as err:
+            raise Http404(str(err)) from err
+        return (paginator, page, page.object_list, page.has_other_pages())
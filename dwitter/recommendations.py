@@ -0,0 +1,207 @@
+"""Friends-of-friends "who to follow" recommendations of the "dwitter" application.
+
+For more information on this file, see
+https://docs.python.org/3/library/mmap.html
+
+The follow graph is dumped once into a compressed sparse row (CSR) snapshot file:
+    header      magic, number of profiles n, number of follows m
+    ids         n int64, sorted Profile primary keys, a profile is known by its index in here
+    offsets     n + 1 int64, the follows of profile i are targets[offsets[i]:offsets[i + 1]]
+    targets     m int64, indexes of the followed profiles
+Integers are in native byte order, the file is meant to be read on the machine that wrote it.  Opening a snapshot
+memory-maps it, so any number of worker processes share the same pages and nothing is parsed or copied.
+
+A candidate is scored by how many of the profiles someone follows also follow the candidate, the best
+DWITTER_SUGGESTIONS_SIZE candidates not already followed are written to the Suggestion table by recommend_follows.
+"""
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import nlargest
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+from django.db.models import F
+
+from .models import Profile
+
+MAGIC: bytes = b"DWGRAPH1"
+HEADER = struct.Struct("=8sqq")
+ITEM_SIZE: int = 8
+
+
+def write_snapshot(path: str, chunk_size: int = 10000) -> Tuple[int, int]:
+    """Dump the follows of every Profile, self follows excluded, into a CSR snapshot file.
+
+    Follows are streamed ordered by follower, so besides the file only the ids and the offsets are held in memory.
+
+    Args:
+        path (str): file to write
+        chunk_size (int): rows fetched from the database at a time
+
+    Returns
+        Tuple[int, int]: number of profiles, number of follows
+
+    """
+    ids: array = array("q", Profile.objects.order_by("id").values_list("id", flat=True).iterator(chunk_size))
+    index: dict = {profile_id: i for i, profile_id in enumerate(ids)}
+    offsets: array = array("q", [0] * (len(ids) + 1))
+
+    follows = (
+        Profile.follows.through.objects.exclude(from_profile=F("to_profile"))
+        .order_by("from_profile_id", "to_profile_id")
+        .values_list("from_profile_id", "to_profile_id")
+    )
+    with open(path, "wb") as snapshot:
+        snapshot.write(HEADER.pack(MAGIC, len(ids), 0))
+        ids.tofile(snapshot)
+        targets_start: int = snapshot.tell() + len(offsets) * ITEM_SIZE
+        snapshot.seek(targets_start)
+
+        count: int = 0
+        batch: array = array("q")
+        for from_profile_id, to_profile_id in follows.iterator(chunk_size):
+            if from_profile_id not in index or to_profile_id not in index:
+                continue  # profile created while dumping
+            offsets[index[from_profile_id] + 1] += 1
+            batch.append(index[to_profile_id])
+            if len(batch) >= chunk_size:
+                batch.tofile(snapshot)
+                count, batch = count + len(batch), array("q")
+        batch.tofile(snapshot)
+        count += len(batch)
+
+        for i in range(len(ids)):
+            offsets[i + 1] += offsets[i]
+        snapshot.seek(0)
+        snapshot.write(HEADER.pack(MAGIC, len(ids), count))
+        snapshot.seek(HEADER.size + len(ids) * ITEM_SIZE)
+        offsets.tofile(snapshot)
+    return len(ids), count
+
+
+class GraphSnapshot:
+    """Read-only, memory-mapped view of a snapshot written by write_snapshot.
+
+    Args:
+        path (str): snapshot file
+
+    Raises
+        ValueError: the file is not a snapshot
+
+    """
+
+    def __init__(self, path: str) -> None:
+        """Map the file and slice it into the ids, offsets and targets arrays without copying."""
+        self.file: BinaryIO = open(path, "rb")  # pylint: disable=consider-using-with
+        self.map: mmap.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, self.edges = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a follow graph snapshot")
+
+        items: memoryview = memoryview(self.map)[HEADER.size :].cast("q")
+        self.ids: memoryview = items[: self.size]
+        self.offsets: memoryview = items[self.size : 2 * self.size + 1]
+        self.targets: memoryview = items[2 * self.size + 1 : 2 * self.size + 1 + self.edges]
+
+    def close(self) -> None:
+        """Unmap and close the file, the arrays must not be used anymore."""
+        for view in ("targets", "offsets", "ids"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        self.map.close()
+        self.file.close()
+
+    def index_of(self, profile_id: int) -> Optional[int]:
+        """Index of a Profile in the snapshot.
+
+        Args:
+            profile_id (int): primary key of the Profile
+
+        Returns
+            Optional[int]: index, None for Profiles created after the snapshot
+
+        """
+        i: int = bisect_left(self.ids, profile_id)
+        return i if i < self.size and self.ids[i] == profile_id else None
+
+    def followees(self, i: int) -> memoryview:
+        """Indexes of the profiles followed by profile i.
+
+        Args:
+            i (int): index of the profile
+
+        Returns
+            memoryview: sorted indexes, a view into the map
+
+        """
+        return self.targets[self.offsets[i] : self.offsets[i + 1]]
+
+    def recommend(self, i: int, size: int) -> List[Tuple[int, int]]:
+        """Best friends of friends of profile i it does not follow yet.
+
+        Args:
+            i (int): index of the profile
+            size (int): number of suggestions
+
+        Returns
+            List[Tuple[int, int]]: (suggested Profile primary key, number of mutual connections), best first
+
+        """
+        followees: memoryview = self.followees(i)
+        followed: set = set(followees)
+        scores: Counter = Counter()
+        for followee in followees:
+            scores.update(self.followees(followee))
+
+        candidates: Iterable[Tuple[int, int]] = (
+            (candidate, score) for candidate, score in scores.items() if candidate != i and candidate not in followed
+        )
+        # ties go to the lower index, i.e. the older Profile
+        best: List[Tuple[int, int]] = nlargest(size, candidates, key=lambda item: (item[1], -item[0]))
+        return [(self.ids[candidate], score) for candidate, score in best]
+
+
+# snapshot opened once by each worker process of recommend_follows
+_snapshot: Optional[GraphSnapshot] = None
+
+
+def open_worker_snapshot(path: str) -> None:
+    """Pool initializer, map the snapshot in the worker process.
+
+    Args:
+        path (str): snapshot file
+
+    """
+    global _snapshot  # pylint: disable=global-statement
+    _snapshot = GraphSnapshot(path)
+
+
+def close_worker_snapshot() -> None:
+    """Unmap the snapshot opened by open_worker_snapshot."""
+    global _snapshot  # pylint: disable=global-statement
+    if _snapshot is not None:
+        _snapshot.close()
+        _snapshot = None
+
+
+def recommend_batch(task: Tuple[int, int, int]) -> Tuple[List[int], List[Tuple[int, int, int]]]:
+    """Recommend for a range of profiles, runs in a worker process without touching the database.
+
+    Args:
+        task (Tuple[int, int, int]): first index, index after the last one, number of suggestions per profile
+
+    Returns
+        Tuple[List[int], List[Tuple[int, int, int]]]: Profile primary keys of the range, their
+        (profile id, suggested profile id, score) rows
+
+    """
+    assert _snapshot is not None, "open_worker_snapshot was not called"  # nosec - programming error
+    start, stop, size = task
+    rows: List[Tuple[int, int, int]] = []
+    for i in range(start, stop):
+        profile_id: int = _snapshot.ids[i]
+        rows.extend((profile_id, suggested_id, score) for suggested_id, score in _snapshot.recommend(i, size))
+    return list(_snapshot.ids[start:stop]), rows
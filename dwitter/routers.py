@@ -0,0 +1,172 @@
+"""Database routers of the "dwitter" application, for read replicas and Dweet shards.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/db/multi-db/#automatic-database-routing
+
+ShardRouter comes first and only decides for objects stored on a Dweet shard, see dwitter.sharding.  Every other
+write and, by default, every read goes to the primary ("default") database, including the writes of objects read
+from the replica.  Reads only go to the replica named by DWITTER_REPLICA_DATABASE inside replica_reads(), which
+dwitter.middleware.ReplicaRoutingMiddleware enters for the safe requests of the dwitter views.  Management commands,
+jobs and the admin keep reading the primary.  The state lives in a context variable so it follows a request across
+threads and coroutines.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_reading_replica: ContextVar[bool] = ContextVar("dwitter_reading_replica", default=False)
+
+
+@contextmanager
+def replica_reads() -> Iterator[None]:
+    """Send the reads made inside the block to the replica, when one is configured.
+
+    Yields
+        None: reads are routed to the replica inside the block
+
+    """
+    token = _reading_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Route reads to the replica inside replica_reads() and everything else to the primary."""
+
+    def db_for_read(self, model, **hints) -> Optional[str]:  # pylint: disable=unused-argument
+        """Database to read a model from.
+
+        Args:
+            model (Model): model being read
+
+        Returns
+            Optional[str]: the replica alias inside replica_reads(), otherwise None for Django's default, the
+            database of the instance the read is related to or the primary
+
+        """
+        if settings.DWITTER_REPLICA_DATABASE and _reading_replica.get():
+            return settings.DWITTER_REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints) -> Optional[str]:  # pylint: disable=unused-argument
+        """Database to write a model to, never the replica.
+
+        Args:
+            model (Model): model being written
+            hints (dict): may hold the instance the write is related to
+
+        Returns
+            Optional[str]: the primary for instances read from the replica, otherwise None for Django's default, the
+            database of the related instance or the primary
+
+        """
+        instance = hints.get("instance")
+        if instance is not None and settings.DWITTER_REPLICA_DATABASE == instance._state.db:
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:  # pylint: disable=unused-argument
+        """Objects read from the replica and the primary may be related, they hold the same rows.
+
+        Args:
+            obj1 (Model): first object
+            obj2 (Model): second object
+
+        Returns
+            Optional[bool]: True when both come from the primary or the replica, None to let Django decide
+
+        """
+        aliases = {DEFAULT_DB_ALIAS, settings.DWITTER_REPLICA_DATABASE}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ShardRouter:
+    """Keep sharded Dweets on the database they were read from and everything related to them on the primary.
+
+    New Dweets are sent to their author's shard by Dweet.save(), see dwitter.sharding.  Does nothing without
+    DWITTER_DWEET_SHARDS, the shards then only get the Dweet table.
+    """
+
+    @staticmethod
+    def on_shard(obj) -> bool:
+        """Whether a model instance was read from, or saved to, a shard other than the primary.
+
+        Args:
+            obj (Model): model instance
+
+        Returns
+            bool: True for objects of a shard
+
+        """
+        return obj is not None and obj._state.db != DEFAULT_DB_ALIAS and obj._state.db in settings.DWITTER_DWEET_SHARDS
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        """Database to read a model related to a sharded object from.
+
+        Args:
+            model (Model): model being read
+            hints (dict): may hold the instance the read is related to
+
+        Returns
+            Optional[str]: the shard for Dweets related to a sharded Dweet, the primary for other models, otherwise
+            None to let the next router decide
+
+        """
+        instance = hints.get("instance")
+        if not self.on_shard(instance):
+            return None
+        return instance._state.db if model._meta.label == "dwitter.Dweet" else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        """Database to write a model related to a sharded object to.
+
+        Args:
+            model (Model): model being written
+            hints (dict): may hold the instance the write is related to
+
+        Returns
+            Optional[str]: the shard of a sharded Dweet, the primary for other models, otherwise None to let the
+            next router decide
+
+        """
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:  # pylint: disable=unused-argument
+        """Sharded Dweets relate to their author on the primary.
+
+        Args:
+            obj1 (Model): first object
+            obj2 (Model): second object
+
+        Returns
+            Optional[bool]: True when either object comes from a shard, None to let the next router decide
+
+        """
+        if self.on_shard(obj1) or self.on_shard(obj2):
+            return True
+        return None
+
+    def allow_migrate(
+        self, db, app_label, model_name=None, **hints
+    ) -> Optional[bool]:  # pylint: disable=unused-argument
+        """Only create the Dweet table on the shards.
+
+        Args:
+            db (str): database alias
+            app_label (str): application of the migration
+            model_name (Optional[str]): model the operation applies to, None for RunSQL/RunPython
+
+        Returns
+            Optional[bool]: whether the operation runs on a shard, None for the primary
+
+        """
+        if db == DEFAULT_DB_ALIAS or db not in settings.DWITTER_DWEET_SHARDS:
+            return None
+        return app_label == "dwitter" and model_name == "dweet"
@@ -0,0 +1,372 @@
+"""Full-text search of Dweets for the "dwitter" application.
+
+For more information on this file, see
+https://www.sqlite.org/fts5.html
+https://www.postgresql.org/docs/current/textsearch-tables.html
+
+body__icontains would scan every Dweet, so searches go through a real inverted index picked by DWITTER_SEARCH_BACKEND:
+    fts5        SQLite FTS5 external content table, kept in sync by triggers (migration 0007)
+    postgres    GIN index on to_tsvector('english', body) (migration 0007)
+    python      SearchTerm table, kept in sync on Dweet save, for databases with neither
+    auto        the first of the above the database supports
+
+Every backend ranks the matches, best first with ties broken by newest, and pages through them with a
+(score, id) keyset so deep pages never use OFFSET.
+"""
+import base64
+import binascii
+import json
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BooleanField, Count, FloatField, Q, Sum
+from django.db.models.expressions import RawSQL
+
+from .models import Dweet, SearchTerm
+from .pagination import CursorPage, InvalidCursor
+
+FTS5_TABLE: str = "dwitter_dweet_fts"
+# external content table over dwitter_dweet, the triggers keep it in sync with every write including bulk_create.
+# SQLite drops the triggers when a migration rebuilds dwitter_dweet, rebuild_search_index puts them back
+FTS5_SQL: List[str] = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS5_TABLE} USING fts5(body, content='dwitter_dweet', content_rowid='id')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS5_TABLE}_insert AFTER INSERT ON dwitter_dweet BEGIN
+        INSERT INTO {FTS5_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS5_TABLE}_delete AFTER DELETE ON dwitter_dweet BEGIN
+        INSERT INTO {FTS5_TABLE}({FTS5_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS5_TABLE}_update AFTER UPDATE OF body ON dwitter_dweet BEGIN
+        INSERT INTO {FTS5_TABLE}({FTS5_TABLE}, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO {FTS5_TABLE}(rowid, body) VALUES (new.id, new.body);
+    END""",
+]
+FTS5_REBUILD_SQL: str = f"INSERT INTO {FTS5_TABLE}({FTS5_TABLE}) VALUES ('rebuild')"
+FTS5_REVERSE_SQL: List[str] = [
+    f"DROP TRIGGER IF EXISTS {FTS5_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS5_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS5_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS5_TABLE}",
+]
+
+# the planner only uses the GIN index for queries on the very same expression
+TSVECTOR: str = """to_tsvector('english', "dwitter_dweet"."body")"""
+POSTGRES_SQL: List[str] = [f"CREATE INDEX IF NOT EXISTS dweet_body_search ON dwitter_dweet USING GIN ({TSVECTOR})"]
+POSTGRES_REVERSE_SQL: List[str] = ["DROP INDEX IF EXISTS dweet_body_search"]
+TOKEN = re.compile(r"\w+")
+MAX_TERMS: int = 8
+
+_available: Dict[Tuple[str, str], str] = {}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower case terms the way the python backend indexes it.
+
+    Args:
+        text (str): Dweet body or search query
+
+    Returns
+        List[str]: terms, in order, with repetitions
+
+    """
+    return [token[:64] for token in TOKEN.findall(text.lower())]
+
+
+class SearchBackend:
+    """Base class of the search backends, ranked (score, id) rows where lower scores rank first."""
+
+    name: str = ""
+
+    def __init__(self, using: str = DEFAULT_DB_ALIAS) -> None:
+        """Bind the backend to a database.
+
+        Args:
+            using (str): database alias
+
+        """
+        self.using: str = using
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[Tuple[float, int]]:
+        """Rank the Dweets matching every term of the query.
+
+        Args:
+            query (str): search query
+            limit (int): maximum number of rows
+            after (Optional[Tuple[float, int]]): (score, id) of the last row of the previous page
+
+        Raises
+            NotImplementedError: subclasses must implement the search
+
+        """
+        raise NotImplementedError
+
+    def index(self, dweet: Dweet) -> None:
+        """Index a saved Dweet, only needed by backends the database does not keep in sync itself.
+
+        Args:
+            dweet (Dweet): saved Dweet
+
+        """
+
+    def rebuild(self) -> int:
+        """Reindex every Dweet, e.g. after bulk loads that skipped the post_save receivers.
+
+        Returns
+            int: number of Dweets reindexed
+
+        """
+        return Dweet.objects.using(self.using).count()
+
+
+class FTS5SearchBackend(SearchBackend):
+    """SQLite FTS5, ranked with bm25."""
+
+    name: str = "fts5"
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[Tuple[float, int]]:
+        """Rank the Dweets matching every term of the query.
+
+        Args:
+            query (str): search query
+            limit (int): maximum number of rows
+            after (Optional[Tuple[float, int]]): (score, id) of the last row of the previous page
+
+        Returns
+            List[Tuple[float, int]]: (bm25, Dweet id) rows
+        """
+        terms: List[str] = tokenize(query)[:MAX_TERMS]
+        if not terms:
+            return []
+
+        # every term quoted, so the query syntax of FTS5 (AND/OR/NEAR/column filters) cannot be injected
+        sql: str = f"SELECT bm25({FTS5_TABLE}), rowid FROM {FTS5_TABLE} WHERE {FTS5_TABLE} MATCH %s"
+        params: list = [" ".join(f'"{term}"' for term in terms)]
+        if after is not None:
+            sql += f" AND (bm25({FTS5_TABLE}) > %s OR (bm25({FTS5_TABLE}) = %s AND rowid < %s))"
+            params += [after[0], after[0], after[1]]
+        sql += " ORDER BY 1, rowid DESC LIMIT %s"
+
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [(score, pk) for score, pk in cursor.fetchall()]
+
+    def rebuild(self) -> int:
+        """Recreate missing triggers and rebuild the FTS5 table from the Dweet table.
+
+        Returns
+            int: number of Dweets reindexed
+        """
+        with connections[self.using].cursor() as cursor:
+            for sql in FTS5_SQL:
+                cursor.execute(sql)
+            cursor.execute(FTS5_REBUILD_SQL)
+        return super().rebuild()
+
+
+class PostgresSearchBackend(SearchBackend):
+    """PostgreSQL full-text search on the GIN expression index, ranked with ts_rank."""
+
+    name: str = "postgres"
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[Tuple[float, int]]:
+        """Rank the Dweets matching every term of the query.
+
+        Args:
+            query (str): search query
+            limit (int): maximum number of rows
+            after (Optional[Tuple[float, int]]): (score, id) of the last row of the previous page
+
+        Returns
+            List[Tuple[float, int]]: (-ts_rank, Dweet id) rows
+        """
+        if not tokenize(query):
+            return []
+
+        dweets = (
+            Dweet.objects.using(self.using)
+            .filter(RawSQL(f"{TSVECTOR} @@ plainto_tsquery('english', %s)", (query,), output_field=BooleanField()))
+            .annotate(
+                score=RawSQL(
+                    f"-ts_rank({TSVECTOR}, plainto_tsquery('english', %s))", (query,), output_field=FloatField()
+                )
+            )
+        )
+        if after is not None:
+            dweets = dweets.filter(Q(score__gt=after[0]) | Q(score=after[0], id__lt=after[1]))
+        return list(dweets.order_by("score", "-id").values_list("score", "id")[:limit])
+
+
+class PythonSearchBackend(SearchBackend):
+    """Inverted index in the SearchTerm table, ranked by the number of occurrences of the query terms."""
+
+    name: str = "python"
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, int]] = None) -> List[Tuple[float, int]]:
+        """Rank the Dweets matching every term of the query.
+
+        Args:
+            query (str): search query
+            limit (int): maximum number of rows
+            after (Optional[Tuple[float, int]]): (score, id) of the last row of the previous page
+
+        Returns
+            List[Tuple[float, int]]: (-occurrences, Dweet id) rows
+        """
+        terms: List[str] = list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+        if not terms:
+            return []
+
+        matches = (
+            SearchTerm.objects.using(self.using)
+            .filter(term__in=terms)
+            .values("dweet_id")
+            .annotate(matched=Count("id"), score=-Sum("count"))
+            .filter(matched=len(terms))
+        )
+        if after is not None:
+            matches = matches.filter(Q(score__gt=after[0]) | Q(score=after[0], dweet_id__lt=after[1]))
+        return [
+            (float(score), pk)
+            for score, pk in matches.order_by("score", "-dweet_id").values_list("score", "dweet_id")[:limit]
+        ]
+
+    def index(self, dweet: Dweet) -> None:
+        """Replace the terms of a saved Dweet.
+
+        Args:
+            dweet (Dweet): saved Dweet
+        """
+        SearchTerm.objects.db_manager(self.using).index(dweet, Counter(tokenize(dweet.body)))
+
+    def rebuild(self) -> int:
+        """Reindex every Dweet, a thousand at a time.
+
+        Returns
+            int: number of Dweets reindexed
+        """
+        SearchTerm.objects.using(self.using).all().delete()
+        terms: List[SearchTerm] = []
+        total: int = 0
+        for pk, body in Dweet.objects.using(self.using).values_list("id", "body").iterator(chunk_size=1000):
+            terms.extend(
+                SearchTerm(term=term, dweet_id=pk, count=count) for term, count in Counter(tokenize(body)).items()
+            )
+            total += 1
+            if len(terms) >= 1000:
+                SearchTerm.objects.using(self.using).bulk_create(terms)
+                terms = []
+        SearchTerm.objects.using(self.using).bulk_create(terms)
+        return total
+
+
+BACKENDS: Dict[str, type] = {
+    backend.name: backend for backend in (FTS5SearchBackend, PostgresSearchBackend, PythonSearchBackend)
+}
+
+
+def get_search_backend(using: str = DEFAULT_DB_ALIAS) -> SearchBackend:
+    """Backend configured by DWITTER_SEARCH_BACKEND, "auto" is resolved once per database.
+
+    Args:
+        using (str): database alias
+
+    Returns
+        SearchBackend: search backend bound to the database
+
+    """
+    name: str = settings.DWITTER_SEARCH_BACKEND
+    if name == "auto":
+        connection = connections[using]
+        if (using, connection.vendor) not in _available:
+            if connection.vendor == "postgresql":
+                _available[(using, connection.vendor)] = PostgresSearchBackend.name
+            elif connection.vendor == "sqlite" and FTS5_TABLE in connection.introspection.table_names():
+                _available[(using, connection.vendor)] = FTS5SearchBackend.name
+            else:
+                _available[(using, connection.vendor)] = PythonSearchBackend.name
+        name = _available[(using, connection.vendor)]
+    return BACKENDS[name](using)
+
+
+class SearchPaginator:
+    """Page through ranked search results with opaque (score, id) cursors."""
+
+    def __init__(self, query: str, per_page: int, using: str = DEFAULT_DB_ALIAS) -> None:
+        """Store the query to paginate.
+
+        Args:
+            query (str): search query
+            per_page (int): maximum number of Dweets per page
+            using (str): database alias
+
+        """
+        self.query: str = query
+        self.per_page: int = int(per_page)
+        self.backend: SearchBackend = get_search_backend(using)
+
+    @staticmethod
+    def encode_cursor(row: Tuple[float, int]) -> str:
+        """Build the opaque token pointing just past a result.
+
+        Args:
+            row (Tuple[float, int]): (score, id) of the last result of a page
+
+        Returns
+            str: url-safe cursor token
+
+        """
+        return base64.urlsafe_b64encode(json.dumps(list(row)).encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(token: str) -> Tuple[float, int]:
+        """Unpack a token built by encode_cursor.
+
+        Args:
+            token (str): cursor token from the query string
+
+        Raises
+            InvalidCursor: token is malformed
+
+        Returns
+            Tuple[float, int]: (score, id) of the result the token points past
+
+        """
+        try:
+            score, pk = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        except (binascii.Error, TypeError, ValueError) as err:
+            raise InvalidCursor("That cursor is not valid") from err
+
+        if not isinstance(score, (int, float)) or not isinstance(pk, int):
+            raise InvalidCursor("That cursor is not valid")
+        return float(score), pk
+
+    def page(self, cursor: Optional[str] = None) -> CursorPage:
+        """Return the page of results a cursor points to, only forward paging is supported.
+
+        Args:
+            cursor (Optional[str]): token from the query string, None for the best results
+
+        Raises
+            InvalidCursor: cursor is invalid
+
+        Returns
+            CursorPage: Dweets, with their user selected, and the cursor of the next page
+
+        """
+        after: Optional[Tuple[float, int]] = self.decode_cursor(cursor) if cursor else None
+        rows: List[Tuple[float, int]] = self.backend.search(self.query, self.per_page + 1, after)
+        page_rows: List[Tuple[float, int]] = rows[: self.per_page]
+
+        dweets: Dict[int, Dweet] = (
+            Dweet.objects.using(self.backend.using)
+            .visible()
+            .select_related("user")
+            .in_bulk([pk for _, pk in page_rows])
+            if page_rows
+            else {}
+        )
+        next_cursor: Optional[str] = self.encode_cursor(page_rows[-1]) if len(rows) > self.per_page else None
+        return CursorPage([dweets[pk] for _, pk in page_rows if pk in dweets], self, next_cursor, None)  # type: ignore
@@ -0,0 +1,344 @@
+"""Horizontal sharding of the Dweets by author for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/db/multi-db/
+
+With DWITTER_DWEET_SHARDS set, every author's Dweets live on a single database.  Profile.dweet_shard records which
+one: new accounts are placed by hashing their user id, accounts from before sharding stay on the primary ("default")
+until rebalance_shards moves them.  Everything else (users, follows, jobs...) stays on the primary and the shards
+only hold the Dweet table.
+
+    writes      Dweet.save() sends new Dweets to their author's shard, with an id taken from the DweetId sequence on
+                the primary so ids stay unique across shards (card cache keys, cursors and moves rely on it)
+    profiles    a single shard, Profile.dweet_database
+    timelines   ShardedCursorPaginator reads the (created_at, id) keys of every involved shard in parallel, merges
+                them by created_at and loads the winners from their shard
+
+Home timelines are pulled while sharded, as the materialized timelines, hashtags, mentions and search index of the
+primary cannot reference Dweets stored on another database.  Search and the hashtag and mention pages would only
+cover the Dweets left on it, so they must be turned off (DWITTER_SEARCH_BACKEND = None, DWITTER_ENTITY_VIEWS = False)
+and the system checks refuse to start otherwise, see dwitter.checks.
+"""
+import heapq
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import Max, QuerySet, prefetch_related_objects
+
+from .models import Dweet, DweetId, DweetTag, Mention, Profile, SearchTerm, TimelineEntry, User
+from .pagination import CursorPaginator, MergedCursorPaginator
+
+_executor: Optional[ThreadPoolExecutor] = None
+_seeded: bool = False
+
+
+def get_shards() -> List[str]:
+    """Aliases of the shard databases.
+
+    Returns
+        List[str]: DWITTER_DWEET_SHARDS, empty when not sharded
+
+    """
+    return list(settings.DWITTER_DWEET_SHARDS)
+
+
+def dweet_databases() -> List[str]:
+    """Every database that may hold Dweets, the primary first.
+
+    Returns
+        List[str]: database aliases
+
+    """
+    return [DEFAULT_DB_ALIAS] + [alias for alias in get_shards() if alias != DEFAULT_DB_ALIAS]
+
+
+def hash_shard(user_id: int) -> str:
+    """Shard a new author is placed on.
+
+    Args:
+        user_id (int): primary key of the User
+
+    Returns
+        str: database alias
+
+    """
+    shards: List[str] = get_shards()
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def shards_of(user_ids: Iterable[int]) -> Dict[int, str]:
+    """Databases holding the Dweets of some authors, in a single query.
+
+    Args:
+        user_ids (Iterable[int]): primary keys of the Users
+
+    Returns
+        Dict[int, str]: database alias by user id, the primary for unknown users
+
+    """
+    user_ids = list(user_ids)
+    shards: Dict[int, str] = dict.fromkeys(user_ids, DEFAULT_DB_ALIAS)
+    if not get_shards():
+        return shards
+    for user_id, shard in (
+        Profile.objects.filter(user_id__in=user_ids).exclude(dweet_shard="").values_list("user_id", "dweet_shard")
+    ):
+        shards[user_id] = shard
+    return shards
+
+
+def shard_of(user_id: int) -> str:
+    """Database holding the Dweets of an author.
+
+    Args:
+        user_id (int): primary key of the User
+
+    Returns
+        str: database alias
+
+    """
+    return shards_of([user_id])[user_id]
+
+
+def active_authors(user_ids: Iterable[int]) -> QuerySet:
+    """Those of some authors whose account is active, which the shards cannot tell without a User table.
+
+    Args:
+        user_ids (Iterable[int]): primary keys of the Users
+
+    Returns
+        QuerySet: primary keys of the active Users, to pass as ShardedCursorPaginator user_ids
+
+    """
+    return User.objects.filter(pk__in=list(user_ids), is_active=True).values_list("pk", flat=True)
+
+
+def seed_dweet_ids() -> None:
+    """Move the DweetId sequence past the highest Dweet id of every database, so allocated ids are never taken."""
+    highest: int = max(
+        Dweet.objects.using(alias).aggregate(highest=Max("id"))["highest"] or 0 for alias in dweet_databases()
+    )
+    with transaction.atomic():
+        ticket: DweetId = DweetId.objects.create()
+        DweetId.objects.filter(pk=ticket.pk).delete()
+        if ticket.pk > highest:
+            return
+
+        DweetId.objects.create(pk=highest)
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            for sql in connections[DEFAULT_DB_ALIAS].ops.sequence_reset_sql(no_style(), [DweetId]):
+                cursor.execute(sql)
+        DweetId.objects.filter(pk=highest).delete()
+
+
+def allocate_dweet_id() -> int:
+    """Take the id of a new Dweet from the DweetId sequence of the primary.
+
+    Returns
+        int: unused Dweet id
+
+    """
+    global _seeded  # pylint: disable=global-statement
+    if not _seeded:
+        seed_dweet_ids()
+        _seeded = True
+
+    ticket: DweetId = DweetId.objects.create()
+    DweetId.objects.filter(pk=ticket.pk).delete()
+    return ticket.pk
+
+
+def run_on_shards(function: Callable[..., Any], tasks: List[tuple]) -> List[Any]:
+    """Run a function once per task, in parallel threads when there are several tasks.
+
+    Args:
+        function (Callable[..., Any]): function taking the items of a task as arguments
+        tasks (List[tuple]): arguments of every call
+
+    Returns
+        List[Any]: results, in the order of the tasks
+
+    """
+    global _executor  # pylint: disable=global-statement
+    if len(tasks) <= 1 or settings.DWITTER_SHARD_READ_WORKERS <= 1:
+        return [function(*task) for task in tasks]
+
+    if _executor is None:
+        # every thread keeps its own connection to each shard, like the request threads do
+        _executor = ThreadPoolExecutor(settings.DWITTER_SHARD_READ_WORKERS, thread_name_prefix="dwitter-shard")
+    return list(_executor.map(lambda task: function(*task), tasks))
+
+
+class ShardedCursorPaginator(MergedCursorPaginator):
+    """Scatter-gather the Dweets of many authors, or of everyone, across the shards.
+
+    The (created_at, id) heads are read from every shard involved in parallel, one MergedCursorPaginator per shard
+    for a list of authors or a single index range per shard for everyone, then merged like the partitions of a
+    MergedCursorPaginator.  Authors are loaded from the primary.
+    """
+
+    def __init__(
+        self,
+        object_list: QuerySet,
+        per_page: int,
+        user_ids: Optional[Iterable[int]] = None,
+        keys: Tuple[str, str] = ("created_at", "id"),
+    ) -> None:
+        """Store the QuerySet to paginate and the authors.
+
+        Args:
+            object_list (QuerySet): Dweets to paginate, read from each shard with using()
+            per_page (int): maximum number of objects per page
+            user_ids (Optional[Iterable[int]]): authors to merge, None for every active author
+            keys (Tuple[str, str]): datetime field and unique tie-breaker field to order and filter on
+
+        """
+        super().__init__(object_list, per_page, partition_field="user", partitions=user_ids or [], keys=keys)
+        self.everyone: bool = user_ids is None
+        self.locations: Dict[int, str] = {}
+
+    def get_objects(
+        self, limit: int, newest_first: bool = True, after: Optional[Tuple[Any, int]] = None, offset: int = 0
+    ) -> list:
+        """Merge the heads of every shard and load the winners from their shard.
+
+        Args:
+            limit (int): maximum number of objects
+            newest_first (bool): walk towards older objects when True, towards newer objects otherwise
+            after (Optional[Tuple[Any, int]]): only objects past this (datetime, id) in the walking direction
+            offset (int): number of objects to skip
+
+        Returns
+            list: objects in walking order
+
+        """
+        heads: List[list] = self.get_heads(offset + limit, newest_first, after)
+        merged: List[tuple] = list(islice(heapq.merge(*heads, reverse=newest_first), offset, offset + limit))
+
+        by_shard: Dict[str, List[int]] = defaultdict(list)
+        for _, pk in merged:
+            by_shard[self.locations[pk]].append(pk)
+        objects: dict = {}
+        for loaded in run_on_shards(
+            lambda alias, pks: self.object_list.using(alias).in_bulk(pks), list(by_shard.items())
+        ):
+            objects.update(loaded)
+        ordered: list = [objects[pk] for _, pk in merged if pk in objects]
+        # the authors live on the primary, see dwitter.routers.ShardRouter
+        prefetch_related_objects(ordered, "user")
+        return ordered
+
+    def get_heads(self, limit: int, newest_first: bool, after: Optional[Tuple[Any, int]]) -> List[list]:
+        """Read the first keys of every shard involved, in parallel.
+
+        Args:
+            limit (int): maximum number of keys per shard and author
+            newest_first (bool): walk towards older objects when True, towards newer objects otherwise
+            after (Optional[Tuple[Any, int]]): only objects past this (datetime, id) in the walking direction
+
+        Returns
+            List[list]: sorted (datetime, id) keys of each shard, or of each author
+
+        """
+        tasks: List[tuple]
+        if self.everyone:
+            deleted: List[int] = list(
+                Profile.objects.filter(deleted_at__isnull=False).values_list("user_id", flat=True)
+            )
+            tasks = [(alias, None, deleted) for alias in dweet_databases()]
+        else:
+            authors: Dict[str, List[int]] = defaultdict(list)
+            for user_id, alias in shards_of(self.partitions).items():
+                authors[alias].append(user_id)
+            tasks = [(alias, user_ids, []) for alias, user_ids in authors.items()]
+
+        def read(alias: str, user_ids: Optional[List[int]], deleted: List[int]) -> List[Tuple[str, list]]:
+            queryset: QuerySet = self.object_list.using(alias)
+            if user_ids is not None:
+                paginator = MergedCursorPaginator(queryset, self.per_page, "user", user_ids, keys=self.keys)
+                return [(alias, head) for head in paginator.get_heads(limit, newest_first, after)]
+
+            paginator = CursorPaginator(queryset.exclude(user_id__in=deleted), self.per_page, keys=self.keys)
+            keys: QuerySet = paginator.seek(paginator.get_ordered_queryset(newest_first), newest_first, after)
+            return [(alias, list(keys.values_list(*self.keys)[:limit]))]
+
+        heads: List[list] = []
+        for shard_heads in run_on_shards(read, tasks):
+            for alias, head in shard_heads:
+                self.locations.update((pk, alias) for _, pk in head)
+                heads.append(head)
+        return heads
+
+
+class DweetIdClash(IntegrityError):
+    """A Dweet being moved has the id of another author's Dweet on the target database."""
+
+
+def move_author(user_id: int, target: str, batch_size: int = 1000) -> int:
+    """Copy an author's Dweets to another database, point their Profile at it and delete the originals.
+
+    Dweets posted while the copy runs still go to the old database and are copied after the switch, those posted
+    after it go to the new one.  Dweets already on the target under the same id and author were copied by an
+    interrupted move, which can simply be run again.  Every batch is checked against the target before its
+    originals are deleted.
+
+    Args:
+        user_id (int): primary key of the User
+        target (str): alias of the database to move to
+        batch_size (int): Dweets copied or deleted per transaction
+
+    Raises
+        DweetIdClash: an id is taken on the target by a Dweet of another author, nothing of that batch is deleted
+
+    Returns
+        int: number of Dweets moved
+
+    """
+    source: str = shard_of(user_id)
+    if source == target:
+        return 0
+
+    dweets: QuerySet = Dweet.objects.using(source).filter(user_id=user_id).order_by("id")
+
+    def copy(batch: List[Dweet]) -> None:
+        with transaction.atomic(using=target):
+            copied: Dict[int, int] = dict(
+                Dweet.objects.using(target).filter(id__in=[dweet.pk for dweet in batch]).values_list("id", "user_id")
+            )
+            clashes: List[int] = sorted(pk for pk, author_id in copied.items() if author_id != user_id)
+            if clashes:
+                raise DweetIdClash(f"Dweet ids {clashes} are taken on {target} by other authors")
+            Dweet.objects.using(target).bulk_create([dweet for dweet in batch if dweet.pk not in copied])
+
+    after: int = 0
+    while True:
+        batch: List[Dweet] = list(dweets.filter(id__gt=after)[:batch_size])
+        if not batch:
+            break
+        copy(batch)
+        after = batch[-1].pk
+    Profile.objects.filter(user_id=user_id).update(dweet_shard="" if target == DEFAULT_DB_ALIAS else target)
+
+    moved: int = 0
+    while True:
+        with transaction.atomic(using=source):
+            batch = list(dweets[:batch_size])
+            if not batch:
+                break
+            # copies the stragglers and checks the rest are on the target
+            copy(batch)
+            ids: List[int] = [dweet.pk for dweet in batch]
+            if source == DEFAULT_DB_ALIAS:
+                # the rows of the primary pointing at the Dweets, their Dweets are pulled from the shard from now on
+                for model in (TimelineEntry, DweetTag, Mention, SearchTerm):
+                    model.objects.filter(dweet_id__in=ids).delete()
+            # no post_delete signal, the Dweets are not gone and must not be uncounted
+            Dweet.objects.using(source).filter(id__in=ids)._raw_delete(source)  # pylint: disable=protected-access
+            moved += len(ids)
+    return moved
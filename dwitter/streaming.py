@@ -0,0 +1,278 @@
+"""Live timeline over server-sent events for the "dwitter" application.
+
+For more information on this file, see
+https://html.spec.whatwg.org/multipage/server-sent-events.html
+https://asgi.readthedocs.io/en/latest/specs/www.html
+
+Django 3.2 iterates streaming responses synchronously, which would pin a thread (or block the event loop) per open
+connection.  TimelineStreamApplication is instead a plain ASGI application sitting in front of Django in
+social/asgi.py: every connection is a coroutine waiting on an asyncio.Queue fed by the in-process TimelineHub that
+DweetCreateView publishes to.  Only connections to the same worker process are reached.
+"""
+import asyncio
+import json
+import threading
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.urls import reverse
+
+from .models import Dweet, Profile
+
+
+class Subscription:
+    """Bounded queue of events for a single connection, bound to the event loop of that connection."""
+
+    def __init__(self, user_ids: Iterable[int], loop: asyncio.AbstractEventLoop, max_size: int) -> None:
+        """Create an empty subscription.
+
+        Args:
+            user_ids (Iterable[int]): primary keys of the Users whose Dweets should be delivered
+            loop (asyncio.AbstractEventLoop): event loop the connection is served on
+            max_size (int): number of undelivered events after which new events are dropped
+
+        """
+        self.user_ids: Set[int] = set(user_ids)
+        self.loop: asyncio.AbstractEventLoop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self.lagged: bool = False
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        """Queue an event from any thread.
+
+        Args:
+            event (Dict[str, Any]): event to send
+
+        """
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        """Queue an event on the connection's loop, a slow client misses events and is told to resync instead.
+
+        Args:
+            event (Dict[str, Any]): event to send
+
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+class TimelineHub:
+    """In-process publish/subscribe of new Dweets, keyed by author so publishing only touches interested clients."""
+
+    def __init__(self) -> None:
+        """Create a hub without subscribers."""
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, user_ids: Iterable[int], loop: asyncio.AbstractEventLoop) -> Subscription:
+        """Start receiving the Dweets of some users.
+
+        Args:
+            user_ids (Iterable[int]): primary keys of the Users to follow
+            loop (asyncio.AbstractEventLoop): event loop the connection is served on
+
+        Returns
+            Subscription: subscription to read the events from, pass it to unsubscribe when done
+
+        """
+        subscription = Subscription(user_ids, loop, settings.DWITTER_STREAM_QUEUE_SIZE)
+        with self._lock:
+            for user_id in subscription.user_ids:
+                self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop receiving events.
+
+        Args:
+            subscription (Subscription): subscription returned by subscribe
+
+        """
+        with self._lock:
+            for user_id in subscription.user_ids:
+                subscriptions: Optional[Set[Subscription]] = self._subscriptions.get(user_id)
+                if subscriptions is not None:
+                    subscriptions.discard(subscription)
+                    if not subscriptions:
+                        del self._subscriptions[user_id]
+
+    def publish(self, dweet: Dweet) -> None:
+        """Send a new Dweet to everyone connected who follows its author, safe to call from sync views.
+
+        Args:
+            dweet (Dweet): freshly created Dweet, its user should already be loaded
+
+        """
+        with self._lock:
+            subscriptions: List[Subscription] = list(self._subscriptions.get(dweet.user_id, ()))
+        if not subscriptions:
+            return
+
+        event: Dict[str, Any] = dweet.to_dict()
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def subscriber_count(self) -> int:
+        """Number of open subscriptions.
+
+        Returns
+            int: number of distinct subscriptions
+
+        """
+        with self._lock:
+            return len(set().union(*self._subscriptions.values()))
+
+
+hub = TimelineHub()
+
+
+@sync_to_async
+def get_followed_user_ids(headers: Iterable[tuple]) -> Optional[List[int]]:
+    """Authenticate a connection from its session cookie and list the users it follows.
+
+    Args:
+        headers (Iterable[tuple]): raw ASGI headers of the request
+
+    Returns
+        Optional[List[int]]: primary keys of the followed Users, None for anonymous connections
+
+    """
+    cookie = SimpleCookie()
+    for name, value in headers:
+        if name == b"cookie":
+            cookie.load(value.decode("latin1"))
+
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    session = import_module(settings.SESSION_ENGINE).SessionStore(morsel.value if morsel else None)  # type: ignore
+    user = get_user(SimpleNamespace(session=session))  # type: ignore
+    if not user.is_authenticated:
+        return None
+
+    return list(Profile.objects.filter(followed_by__user=user).values_list("user_id", flat=True))
+
+
+class TimelineStreamApplication:
+    """ASGI application serving dwitter:timeline-stream as server-sent events and everything else with Django.
+
+    Every new Dweet by a followed user is sent as a "dweet" event.  A client that falls more than
+    DWITTER_STREAM_QUEUE_SIZE events behind gets a "resync" event instead of the events it missed, a comment is sent
+    every DWITTER_STREAM_HEARTBEAT seconds to keep proxies from closing the connection, and the stream is closed
+    with a "timeout" event when nothing was dweeted for DWITTER_STREAM_IDLE_TIMEOUT seconds.
+    """
+
+    def __init__(self, django_application: Callable[..., Awaitable]) -> None:
+        """Wrap the Django ASGI application.
+
+        Args:
+            django_application (Callable[..., Awaitable]): application returned by get_asgi_application()
+
+        """
+        self.django_application: Callable[..., Awaitable] = django_application
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """Route the request.
+
+        Args:
+            scope (dict): connection scope
+            receive (Callable): awaitable returning the next event from the client
+            send (Callable): awaitable sending an event to the client
+
+        """
+        if scope["type"] == "http" and scope["path"] == reverse("dwitter:timeline-stream"):
+            await self.stream(scope, receive, send)
+        else:
+            await self.django_application(scope, receive, send)
+
+    async def stream(self, scope: dict, receive: Callable, send: Callable) -> None:
+        """Serve a single event stream until the client goes away or the stream goes idle.
+
+        Args:
+            scope (dict): connection scope
+            receive (Callable): awaitable returning the next event from the client
+            send (Callable): awaitable sending an event to the client
+
+        """
+        user_ids: Optional[List[int]] = await get_followed_user_ids(scope["headers"])
+        if user_ids is None:
+            await send({"type": "http.response.start", "status": 403, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # subscribe before answering so nothing dweeted once the client sees the response is missed
+        loop = asyncio.get_running_loop()
+        subscription: Subscription = hub.subscribe(user_ids, loop)
+        disconnected: asyncio.Task = loop.create_task(self.wait_for_disconnect(receive))
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [
+                        (b"content-type", b"text/event-stream"),
+                        (b"cache-control", b"no-cache"),
+                        (b"x-accel-buffering", b"no"),
+                    ],
+                }
+            )
+            await self.pump(subscription, disconnected, send)
+        finally:
+            hub.unsubscribe(subscription)
+            disconnected.cancel()
+
+    @staticmethod
+    async def wait_for_disconnect(receive: Callable) -> None:
+        """Return once the client has gone away.
+
+        Args:
+            receive (Callable): awaitable returning the next event from the client
+
+        """
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    @staticmethod
+    async def pump(subscription: Subscription, disconnected: asyncio.Task, send: Callable) -> None:
+        """Forward queued events to the client.
+
+        Args:
+            subscription (Subscription): subscription to read the events from
+            disconnected (asyncio.Task): task that finishes when the client goes away
+            send (Callable): awaitable sending an event to the client
+
+        """
+        loop = asyncio.get_running_loop()
+        idle_deadline: float = loop.time() + settings.DWITTER_STREAM_IDLE_TIMEOUT
+
+        while not disconnected.done():
+            if subscription.lagged:
+                subscription.lagged = False
+                chunk: bytes = b"event: resync\ndata: {}\n\n"
+            else:
+                timeout: float = min(settings.DWITTER_STREAM_HEARTBEAT, idle_deadline - loop.time())
+                if timeout <= 0:
+                    await send({"type": "http.response.body", "body": b"event: timeout\ndata: {}\n\n"})
+                    return
+
+                getter: asyncio.Task = loop.create_task(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, disconnected}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter not in done:
+                    getter.cancel()
+                    if disconnected in done:
+                        return
+                    chunk = b": ping\n\n"
+                else:
+                    event: Dict[str, Any] = getter.result()
+                    idle_deadline = loop.time() + settings.DWITTER_STREAM_IDLE_TIMEOUT
+                    chunk = f"event: dweet\nid: {event['id']}\ndata: {json.dumps(event)}\n\n".encode()
+
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
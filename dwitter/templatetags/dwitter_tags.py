@@ -0,0 +1,128 @@
+"""Template tags for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/custom-template-tags/
+"""
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django import template
+from django.conf import settings
+from django.db.models import QuerySet
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import SafeString, mark_safe
+
+from ..cache import dweet_card_key, get_dweet_card_cache
+from ..entities import HASHTAG, MENTION
+from ..models import Suggestion
+from ..trending import WINDOWS, get_trending
+
+register = template.Library()
+
+# a #tag (group 1) or an @mention (group 2)
+ENTITY = re.compile(f"{HASHTAG.pattern}|{MENTION.pattern}")
+
+
+@register.simple_tag
+def dweet_cards(dweets: Iterable) -> SafeString:
+    """Render the card of every Dweet on a page, reusing cached cards.
+
+    All cards are fetched with a single get_many and the misses written back with a single set_many, so rendering
+    a page costs one cache round trip plus a template render per miss.
+
+    Args:
+        dweets (Iterable): Dweets to render, with their user already selected
+
+    Returns
+        SafeString: rendered cards
+
+    """
+    dweets = list(dweets)
+    cache = get_dweet_card_cache()
+    keys: Dict[int, str] = {dweet.pk: dweet_card_key(dweet) for dweet in dweets}
+    cards: Dict[str, str] = cache.get_many(keys.values())
+
+    misses: Dict[str, str] = {}
+    for dweet in dweets:
+        key: str = keys[dweet.pk]
+        if key not in cards:
+            cards[key] = misses[key] = render_to_string("dwitter/snippets/dweet_card.html", {"dweet": dweet})
+
+    if misses:
+        cache.set_many(misses, timeout=settings.DWITTER_DWEET_CARD_TIMEOUT)
+
+    return mark_safe("".join(cards[keys[dweet.pk]] for dweet in dweets))  # nosec - rendered by our own template
+
+
+@register.filter
+def link_entities(body: str) -> SafeString:
+    """Escape a Dweet body and link its #tags to the tag page and its @mentions to the profile.
+
+    Mentions of users that do not exist are linked too, rather than looking every username up while rendering.  The
+    #tags are left as text without DWITTER_ENTITY_VIEWS.
+
+    Args:
+        body (str): Dweet body
+
+    Returns
+        SafeString: escaped body with links
+
+    """
+
+    def link(match: re.Match) -> str:
+        tag, username = match.groups()
+        if tag and not settings.DWITTER_ENTITY_VIEWS:
+            return escape(match.group(0))
+        if tag:
+            url: str = reverse("dwitter:tag-detail", args=[tag.lower()])
+        else:
+            url = reverse("dwitter:profile-detail", args=[username])
+        return format_html('<a href="{}">{}</a>', url, match.group(0))
+
+    parts: list = []
+    position: int = 0
+    for match in ENTITY.finditer(body):
+        parts.append(escape(body[position : match.start()]))
+        parts.append(link(match))
+        position = match.end()
+    parts.append(escape(body[position:]))
+    return mark_safe("".join(parts))  # nosec - every part is escaped or built with format_html
+
+
+@register.simple_tag
+def trending_tags() -> Dict[str, List[Tuple[str, int]]]:
+    """Precomputed most used hashtags of every trending window, see dwitter.trending.
+
+    Returns
+        Dict[str, List[Tuple[str, int]]]: (tag, number of Dweets) keyed by window name, shortest window first
+
+    """
+    return {window: get_trending(window) for window in WINDOWS}
+
+
+@register.simple_tag
+def follow_suggestions(viewer: Any, count: int = 5) -> List[Suggestion]:
+    """Best "who to follow" suggestions of a user, read with a single query.
+
+    Suggestions are precomputed by recommend_follows, the Profiles followed since are left out.  With the Viewer of
+    the request the follows are already known and only the Suggestion table and the suggested users are read.
+
+    Args:
+        viewer (Any): Viewer of the request, see dwitter.viewer, or a logged in User
+        count (int): number of suggestions
+
+    Returns
+        List[Suggestion]: suggestions with the suggested Profile and its User selected, best first
+
+    """
+    if not viewer.is_authenticated:
+        return []
+
+    suggestions: QuerySet = Suggestion.objects.filter(suggested__user__is_active=True)
+    if hasattr(viewer, "following_ids"):
+        suggestions = suggestions.filter(profile_id=viewer.profile_id).exclude(suggested_id__in=viewer.following_ids)
+    else:
+        suggestions = suggestions.filter(profile__user=viewer).exclude(suggested__followed_by__user=viewer)
+    return list(suggestions.select_related("suggested__user")[:count])
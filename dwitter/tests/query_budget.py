@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin to fail a test when a block of code runs more queries than it is allowed to
+
+    Unlike assertNumQueries the budget is an upper bound, so views can get cheaper without breaking tests
+
+    Example:
+        with self.assertQueryBudget(4):
+            self.client.get(url)
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1))
+            self.fail(f"{executed} queries executed, budget is {budget}\n{queries}")
@@ -0,0 +1,241 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from dwitter.management.commands.import_dwitter import Command
+from dwitter.models import Dweet, Profile, TimelineEntry
+from dwitter.search import get_search_backend
+
+User = get_user_model()
+
+
+class RebuildTimelinesCommandTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_1.profile.follows.add(self.user_2.profile)
+        Dweet.objects.create(user=self.user_1, body="dweet by user_1")
+        Dweet.objects.create(user=self.user_2, body="dweet by user_2")
+
+    def test_rebuild_timelines(self):
+        """
+        Timelines wiped out from under the app should be recreated from follows
+        """
+        TimelineEntry.objects.all().delete()
+
+        out = StringIO()
+        call_command("rebuild_timelines", stdout=out)
+        self.assertIn("Rebuilt 2 timelines", out.getvalue())
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_1.profile).count(), 2)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_2.profile).count(), 1)
+
+        # limiting to a single user leaves the others alone
+        TimelineEntry.objects.all().delete()
+        call_command("rebuild_timelines", "user_2", stdout=out)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_1.profile).count(), 0)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_2.profile).count(), 1)
+
+
+class ExplainQueriesCommandTests(TestCase):
+    def test_explain_queries(self):
+        """
+        Every view query should be explained, and a missing user is an error
+        """
+        user_1 = User.objects.create(username="user_1")
+        Dweet.objects.create(user=user_1, body="dweet by user_1")
+
+        out = StringIO()
+        call_command("explain_queries", "--username", "user_1", stdout=out)
+        for name in ("dwitter:dashboard (anonymous)", "dwitter:profile-detail dweets", "dwitter:profile-list"):
+            self.assertIn(name, out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("explain_queries", "--username", "not_a_user", stdout=out)
+
+
+class RepairProfileCountersCommandTests(TestCase):
+    def test_repair_profile_counters(self):
+        """
+        Counters that drifted are recomputed, the others are left alone
+        """
+        user_1 = User.objects.create(username="user_1")
+        user_2 = User.objects.create(username="user_2")
+        User.objects.create(username="user_3")
+        user_1.profile.follows.add(user_2.profile)
+        Dweet.objects.create(user=user_2, body="dweet by user_2")
+        Profile.objects.filter(user=user_2).update(followers_count=10, dweet_count=0)
+
+        out = StringIO()
+        call_command("repair_profile_counters", "--batch-size", "2", stdout=out)
+        self.assertIn("Checked 3 profiles, repaired 1", out.getvalue())
+
+        profile = Profile.objects.get(user=user_2)
+        self.assertEqual((profile.following_count, profile.followers_count, profile.dweet_count), (0, 1, 1))
+
+    def test_repair_profile_counters_several_dweets(self):
+        """
+        Authors with several dweets are counted once per dweet, the dweet ordering must not split the groups
+        """
+        user_1 = User.objects.create(username="user_1")
+        user_2 = User.objects.create(username="user_2")
+        for i in range(3):
+            Dweet.objects.create(user=user_1, body=f"dweet {i} by user_1")
+        Dweet.objects.create(user=user_2, body="dweet by user_2")
+        Profile.objects.update(dweet_count=0)
+
+        out = StringIO()
+        call_command("repair_profile_counters", stdout=out)
+        self.assertIn("Checked 2 profiles, repaired 2", out.getvalue())
+        self.assertEqual(dict(Profile.objects.values_list("user__username", "dweet_count")), {"user_1": 3, "user_2": 1})
+
+        # counters that are right are left alone
+        call_command("repair_profile_counters", stdout=out)
+        self.assertIn("Checked 2 profiles, repaired 0", out.getvalue())
+
+
+class GenerateSocialGraphCommandTests(TestCase):
+    def test_generate_social_graph(self):
+        """
+        Bulk inserted users get profiles, self follows, correct counters, timelines and spread out dweets
+        """
+        out = StringIO()
+        call_command(
+            "generate_social_graph",
+            *("--users", "30", "--follows", "5", "--dweets", "4", "--seed", "1", "--batch-size", "7"),
+            stdout=out,
+        )
+        self.assertIn("Generated 30 users", out.getvalue())
+        self.assertEqual(Profile.objects.count(), 30)
+        self.assertEqual(Profile.follows.through.objects.filter(from_profile=F("to_profile")).count(), 30)
+        self.assertGreater(Profile.follows.through.objects.count(), 30)
+        self.assertGreater(Dweet.objects.count(), 0)
+        self.assertGreater(Dweet.objects.values("created_at").distinct().count(), 1)
+
+        # counters match the rows and every dweet is on its author's timeline
+        call_command("repair_profile_counters", stdout=out)
+        self.assertIn("Checked 30 profiles, repaired 0", out.getvalue())
+        self.assertEqual(TimelineEntry.objects.filter(profile__user=F("dweet__user")).count(), Dweet.objects.count())
+
+        with self.assertRaises(CommandError):
+            call_command("generate_social_graph", "--users", "1", stdout=out)
+
+
+class ReplayLoadCommandTests(TestCase):
+    def test_replay_load(self):
+        """
+        Every url name in the mix is reported with its percentiles
+        """
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("replay_load", stdout=out)
+
+        call_command("generate_social_graph", "--users", "10", "--seed", "1", stdout=out)
+        call_command("replay_load", "--requests", "60", "--write-ratio", "0.5", "--seed", "1", stdout=out)
+        report = out.getvalue()
+        for name in ("dwitter:dashboard", "dwitter:api-timeline", "dwitter:dweet-create", "p95", "p99"):
+            self.assertIn(name, report)
+
+
+class ImportDwitterCommandTests(TestCase):
+    records = [
+        {"type": "user", "username": "alice", "email": "alice@example.com"},
+        {"type": "user", "username": "bob"},
+        {"type": "follow", "username": "alice", "to": "bob"},
+        {"type": "follow", "username": "alice", "to": "nobody"},
+        {"type": "dweet", "username": "bob", "body": "first", "created_at": "2022-11-01T12:00:00+00:00"},
+        {"type": "dweet", "username": "bob", "body": "second", "created_at": "2022-11-02T12:00:00+00:00"},
+        {"type": "dweet", "username": "alice", "body": "third", "created_at": "2022-11-03T12:00:00"},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "export.jsonl")
+        with open(self.path, "w", encoding="utf-8") as export:
+            export.writelines(json.dumps(record) + "\n" for record in self.records)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertImported(self):
+        """
+        Everything is in once, with consistent counters and timelines
+        """
+        alice, bob = Profile.objects.get(user__username="alice"), Profile.objects.get(user__username="bob")
+        self.assertEqual((alice.following_count, alice.followers_count, alice.dweet_count), (1, 0, 1))
+        self.assertEqual((bob.following_count, bob.followers_count, bob.dweet_count), (0, 1, 2))
+        self.assertEqual(alice.user.email, "alice@example.com")
+        self.assertEqual(
+            list(Dweet.objects.filter(user=bob.user).order_by("created_at").values_list("created_at__day", flat=True)),
+            [1, 2],
+        )
+        self.assertEqual(TimelineEntry.objects.filter(profile=alice).count(), 3)
+        self.assertEqual(TimelineEntry.objects.filter(profile=bob).count(), 2)
+        self.assertFalse(os.path.exists(f"{self.path}.checkpoint"))
+
+    def test_import_dwitter(self):
+        """
+        JSONL and CSV exports are imported, unknown users are skipped
+        """
+        out = StringIO()
+        call_command("import_dwitter", self.path, "--batch-size", "3", stdout=out)
+        self.assertIn("Imported 7 records, skipped 1", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+        self.assertImported()
+
+        csv_path = os.path.join(self.directory.name, "export.csv")
+        with open(csv_path, "w", encoding="utf-8", newline="") as export:
+            writer = csv.DictWriter(export, fieldnames=["type", "username", "email", "to", "body", "created_at"])
+            writer.writeheader()
+            writer.writerow({"type": "user", "username": "carol"})
+            writer.writerow({"type": "follow", "username": "carol", "to": "alice"})
+        call_command("import_dwitter", csv_path, stdout=out)
+        self.assertEqual(Profile.objects.get(user__username="alice").followers_count, 1)
+
+        with open(self.path, "a", encoding="utf-8") as export:
+            export.write('{"type": "retweet", "username": "bob"}\n')
+        with self.assertRaisesMessage(CommandError, "Record 8"):
+            call_command("import_dwitter", self.path, stdout=out)
+
+    @override_settings(DWITTER_SEARCH_BACKEND="python")
+    def test_import_dwitter_search_index(self):
+        """
+        Imported Dweets are added to the search index of the python backend
+        """
+        call_command("import_dwitter", self.path, stdout=StringIO())
+        self.assertEqual(
+            [Dweet.objects.get(pk=pk).body for _, pk in get_search_backend().search("second", 10)], ["second"]
+        )
+
+    def test_import_dwitter_resume(self):
+        """
+        An interrupted import resumes after the last committed batch without duplicating anything
+        """
+        out = StringIO()
+        import_dweets = Command.import_dweets
+
+        def interrupt(command, records, *args):
+            if any(record["body"] == "third" for record in records):
+                raise KeyboardInterrupt
+            return import_dweets(command, records, *args)
+
+        with patch.object(Command, "import_dweets", interrupt), self.assertRaises(KeyboardInterrupt):
+            call_command("import_dwitter", self.path, "--batch-size", "5", stdout=out)
+        self.assertEqual(Dweet.objects.count(), 1)
+
+        # pretend the checkpoint of the first batch was never written, its dweets must not be imported twice
+        with open(f"{self.path}.checkpoint", "w", encoding="utf-8") as checkpoint:
+            json.dump({"position": 2}, checkpoint)
+        call_command("import_dwitter", self.path, "--resume", "--batch-size", "5", stdout=out)
+        self.assertEqual(Dweet.objects.count(), 3)
+        self.assertImported()
+
+        with self.assertRaises(CommandError):
+            call_command("import_dwitter", self.path, "--resume", stdout=out)
@@ -0,0 +1,115 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.test import TestCase
+from django.urls import reverse
+
+from dwitter.entities import index_entities
+from dwitter.models import Dweet, DweetTag, Mention, Profile, Suggestion, TimelineEntry
+from dwitter.search import SearchPaginator
+
+User = get_user_model()
+
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_3 = User.objects.create(username="user_3")
+        self.user_1.profile.follows.add(self.user_2.profile, self.user_3.profile)
+        self.user_2.profile.follows.add(self.user_1.profile)
+        self.dweets = [Dweet.objects.create(user=self.user_2, body=f"#gone dweet {i} by @user_1") for i in range(3)]
+        Dweet.objects.create(user=self.user_3, body="#gone but user_3 stays")
+        index_entities(Dweet.objects.all())
+        Suggestion.objects.create(profile=self.user_3.profile, suggested=self.user_2.profile, score=1)
+
+    def test_user_delete_protected(self):
+        """
+        Users with dweets cannot be deleted outright, which would leave their dweets without an author
+        """
+        with self.assertRaises(ProtectedError), transaction.atomic():
+            self.user_2.delete()
+        self.assertTrue(User.objects.filter(pk=self.user_2.pk).exists())
+        self.assertEqual(Dweet.objects.filter(user_id=self.user_2.pk).count(), 3)
+
+        with self.assertRaises(ProtectedError), transaction.atomic():
+            User.objects.filter(pk=self.user_3.pk).delete()
+
+        # users without dweets can go
+        self.user_1.delete()
+        self.assertFalse(User.objects.filter(pk=self.user_1.pk).exists())
+
+    def test_account_delete(self):
+        """
+        Deleting an account logs the user out and hides its profile and dweets everywhere at once
+        """
+        self.assertEqual(self.client.post(reverse("dwitter:account-delete")).status_code, 403)
+
+        self.client.force_login(self.user_2)
+        response = self.client.post(reverse("dwitter:account-delete"))
+        self.assertRedirects(response, reverse("dwitter:dashboard"))
+        self.assertFalse(User.objects.get(pk=self.user_2.pk).is_active)
+        self.assertIsNotNone(Profile.objects.get(pk=self.user_2.profile.pk).deleted_at)
+        self.assertNotIn("_auth_user_id", self.client.session)
+
+        # nothing was deleted yet
+        self.assertEqual(Dweet.objects.filter(user=self.user_2).count(), 3)
+        self.assertEqual(Dweet.objects.visible().filter(user=self.user_2).count(), 0)
+
+        self.client.force_login(self.user_1)
+        pages = [
+            reverse("dwitter:dashboard"),
+            reverse("dwitter:tag-detail", args=["gone"]),
+            reverse("dwitter:mention-list"),
+            reverse("dwitter:api-timeline"),
+            reverse("dwitter:profile-list"),
+            reverse("dwitter:profile-detail", args=["user_1"]),
+        ]
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, "user_2")
+
+        self.assertEqual(self.client.get(reverse("dwitter:profile-detail", args=["user_2"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("dwitter:api-profile-dweets", args=["user_2"])).status_code, 404)
+        self.assertEqual(len(SearchPaginator("gone", 10).page()), 1)
+
+    def test_purge_deleted_users(self):
+        """
+        Purging removes every row of the deleted account in batches and keeps the counters of the others right
+        """
+        Profile.objects.soft_delete(self.user_2.profile)
+        self.assertEqual(Profile.objects.get(pk=self.user_1.profile.pk).following_count, 2)
+
+        out = StringIO()
+        call_command("purge_deleted_users", "--batch-size", "2", "--sleep", "0", stdout=out)
+        self.assertIn("Purged 1 deleted accounts", out.getvalue())
+
+        self.assertFalse(User.objects.filter(pk=self.user_2.pk).exists())
+        self.assertFalse(Dweet.objects.filter(user_id=self.user_2.pk).exists())
+        self.assertFalse(TimelineEntry.objects.filter(dweet__user_id=self.user_2.pk).exists())
+        self.assertFalse(Suggestion.objects.exists())
+        self.assertEqual(DweetTag.objects.count(), 1)
+        self.assertFalse(Mention.objects.exists())
+
+        profile_1 = Profile.objects.get(pk=self.user_1.profile.pk)
+        self.assertEqual((profile_1.following_count, profile_1.followers_count), (1, 0))
+        self.assertEqual(list(profile_1.follows.values_list("user__username", flat=True)), ["user_1", "user_3"])
+
+        out = StringIO()
+        call_command("repair_profile_counters", stdout=out)
+        self.assertIn("repaired 0", out.getvalue())
+
+    def test_purge_older_than(self):
+        """
+        Accounts deleted within the grace period are left alone
+        """
+        Profile.objects.soft_delete(self.user_2.profile)
+        out = StringIO()
+        call_command("purge_deleted_users", "--older-than", "24", stdout=out)
+        self.assertIn("Purged 0 deleted accounts", out.getvalue())
+        self.assertTrue(User.objects.filter(pk=self.user_2.pk).exists())
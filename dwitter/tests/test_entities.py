@@ -0,0 +1,143 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dwitter.entities import extract_mentions, extract_tags, index_entities
+from dwitter.models import Dweet, DweetTag, Mention
+from dwitter.templatetags.dwitter_tags import link_entities
+
+User = get_user_model()
+
+
+class EntityExtractionTests(TestCase):
+    def test_extract_tags(self):
+        """
+        Tags are lowercased and deduplicated, neither C# nor ##double are tags
+        """
+        self.assertEqual(extract_tags("#Django and #python, #django again"), ["django", "python"])
+        self.assertEqual(extract_tags("I write C# and F#, ##double"), [])
+        self.assertEqual(extract_tags("#" + "a" * 80), ["a" * 64])
+
+    def test_extract_mentions(self):
+        """
+        Mentions stop at trailing punctuation and ignore email addresses
+        """
+        self.assertEqual(extract_mentions("hi @bob. and @alice.smith, @bob!"), ["bob", "alice.smith"])
+        self.assertEqual(extract_mentions("mail me@example.com"), [])
+
+    def test_link_entities(self):
+        """
+        The body is escaped and the entities linked
+        """
+        html = link_entities("<b>#Django</b> @user_1")
+        self.assertIn("&lt;b&gt;", html)
+        self.assertIn(f'<a href="{reverse("dwitter:tag-detail", args=["django"])}">#Django</a>', html)
+        self.assertIn(f'<a href="{reverse("dwitter:profile-detail", args=["user_1"])}">@user_1</a>', html)
+
+
+class EntityIndexTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+
+    def test_DweetCreateView_indexes_entities(self):
+        """
+        Posting a Dweet writes one row per tag and per mention of an existing user
+        """
+        self.client.force_login(self.user_1)
+        self.client.post(reverse("dwitter:dweet-create"), data={"body": "#Django #django with @user_2 and @nobody"})
+        dweet = Dweet.objects.get()
+
+        self.assertEqual(
+            list(DweetTag.objects.values_list("tag", "dweet", "created_at")), [("django", dweet.pk, dweet.created_at)]
+        )
+        self.assertEqual(list(Mention.objects.values_list("user", "dweet")), [(self.user_2.pk, dweet.pk)])
+
+    def test_index_entities_replaces(self):
+        """
+        Reindexing a Dweet replaces its rows
+        """
+        dweet = Dweet.objects.create(user=self.user_1, body="#one @user_2")
+        index_entities([dweet])
+        dweet.body = "#two"
+        index_entities([dweet])
+
+        self.assertEqual(list(DweetTag.objects.values_list("tag", flat=True)), ["two"])
+        self.assertFalse(Mention.objects.exists())
+
+    def test_backfill_entities(self):
+        """
+        Every Dweet is indexed in batches, resuming after an id skips the older Dweets
+        """
+        # bulk_create skips the receivers, like an import, so nothing is indexed yet
+        Dweet.objects.bulk_create([Dweet(user=self.user_1, body=f"#tag{i} @user_2") for i in range(5)])
+        dweets = list(Dweet.objects.order_by("id"))
+        self.assertEqual(DweetTag.objects.count(), 0)
+
+        out = StringIO()
+        call_command("backfill_entities", "--after-id", str(dweets[1].pk), "--batch-size", "2", stdout=out)
+        self.assertEqual(DweetTag.objects.count(), 3)
+        self.assertIn(f"Indexed 2 dweets, up to id {dweets[3].pk}", out.getvalue())
+
+        call_command("backfill_entities", stdout=out)
+        self.assertEqual(DweetTag.objects.count(), 5)
+        self.assertEqual(Mention.objects.filter(user=self.user_2).count(), 5)
+        self.assertIn("Indexed 5 dweets", out.getvalue())
+
+
+class EntityViewTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.dweets = [Dweet.objects.create(user=self.user_2, body=f"dweet {i} #Django @user_1") for i in range(7)]
+        Dweet.objects.create(user=self.user_2, body="#python only")
+        index_entities(Dweet.objects.all())
+
+    def test_TagView(self):
+        """
+        Tag pages list the tagged Dweets newest first, case insensitively, five at a time
+        """
+        response = self.client.get(reverse("dwitter:tag-detail", args=["DJANGO"]))
+        self.assertEqual(response.context["tag"], "django")
+        self.assertEqual([dweet.pk for dweet in response.context["object_list"]], [d.pk for d in self.dweets[:-6:-1]])
+
+        response = self.client.get(
+            reverse("dwitter:tag-detail", args=["django"]), {"cursor": response.context["page_obj"].next_cursor}
+        )
+        self.assertEqual(
+            [dweet.pk for dweet in response.context["object_list"]], [self.dweets[1].pk, self.dweets[0].pk]
+        )
+
+        self.assertContains(self.client.get(reverse("dwitter:tag-detail", args=["flask"])), "No dweets use #flask")
+
+    def test_MentionListView(self):
+        """
+        The mentions page needs a login and only lists Dweets mentioning the logged in user
+        """
+        url = reverse("dwitter:mention-list")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.user_1)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context["object_list"]), 5)
+        self.assertTrue(response.context["page_obj"].has_next())
+
+        self.client.force_login(self.user_2)
+        self.assertContains(self.client.get(url), "Nobody has mentioned @user_2 yet")
+
+    @override_settings(DWITTER_ENTITY_VIEWS=False)
+    def test_entity_views_turned_off(self):
+        """
+        Without DWITTER_ENTITY_VIEWS the tag and mention pages are gone and hashtags are no longer linked
+        """
+        self.client.force_login(self.user_1)
+        self.assertEqual(self.client.get(reverse("dwitter:tag-detail", args=["django"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("dwitter:mention-list")).status_code, 404)
+
+        html = link_entities("#Django @user_1")
+        self.assertTrue(html.startswith("#Django "))
+        self.assertIn(reverse("dwitter:profile-detail", args=["user_1"]), html)
+        self.assertNotContains(self.client.get(reverse("dwitter:dashboard")), reverse("dwitter:mention-list"))
@@ -0,0 +1,129 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from dwitter.jobs import JOBS, claim, enqueue, run, run_by_id
+from dwitter.models import Dweet, DweetTag, Job, Profile, TagCount, TimelineEntry
+
+User = get_user_model()
+
+
+def fail(**payload):
+    raise ValueError("boom")
+
+
+@override_settings(DWITTER_JOBS_EAGER=False, DWITTER_JOBS_MAX_ATTEMPTS=2, DWITTER_JOBS_RETRY_DELAY=10)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_2.profile.follows.add(self.user_1.profile)
+
+    def test_enqueue(self):
+        """
+        Posting a Dweet queues its work with a single insert instead of doing it in the request
+        """
+        self.client.force_login(self.user_1)
+        self.client.post(reverse("dwitter:dweet-create"), {"body": "#queued"})
+        dweet = Dweet.objects.get()
+
+        job = Job.objects.get()
+        self.assertEqual(
+            (job.name, job.payload, job.status),
+            ("dweet_created", {"dweet_id": dweet.pk, "user_id": self.user_1.pk}, Job.QUEUED),
+        )
+        self.assertEqual(Profile.objects.get(user=self.user_1).dweet_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(profile=self.user_2.profile).exists())
+        self.assertFalse(DweetTag.objects.exists())
+
+        with self.assertRaises(KeyError):
+            enqueue("unknown")
+
+    def test_claim(self):
+        """
+        Due jobs are leased once, a job is claimed again only when its lease expired
+        """
+        later = enqueue("dweet_created", dweet_id=0, user_id=self.user_1.pk)
+        Job.objects.filter(pk=later.pk).update(run_at=timezone.now() + timedelta(minutes=1))
+        job = enqueue("dweet_created", dweet_id=0, user_id=self.user_1.pk)
+
+        claimed = claim("worker_1", 10)
+        self.assertEqual([claimed_job.pk for claimed_job in claimed], [job.pk])
+        self.assertEqual((claimed[0].status, claimed[0].attempts), (Job.RUNNING, 1))
+        self.assertTrue(claimed[0].locked_by.startswith("worker_1:"))
+        self.assertEqual(claim("worker_2", 10), [])
+
+        # the first worker died
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = claim("worker_2", 10)
+        self.assertEqual((claimed[0].pk, claimed[0].attempts), (job.pk, 2))
+        self.assertTrue(claimed[0].locked_by.startswith("worker_2:"))
+
+    def test_retry(self):
+        """
+        Failing jobs are retried with exponential backoff, then kept as dead letters
+        """
+        with mock.patch.dict(JOBS, {"fail": fail}):
+            job = enqueue("fail")
+            self.assertFalse(run(claim("worker", 1)[0]))
+
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.locked_until), (Job.QUEUED, 1, None))
+            self.assertIn("ValueError: boom", job.last_error)
+            self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+            self.assertEqual(claim("worker", 1), [])
+
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            self.assertFalse(run(claim("worker", 1)[0]))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.DEAD, 2))
+            self.assertEqual(claim("worker", 1), [])
+
+    def test_run_once(self):
+        """
+        A job is deleted with its work, a job whose lease was taken over by another worker is not run again
+        """
+        handler = mock.Mock()
+        with mock.patch.dict(JOBS, {"count": handler}):
+            enqueue("count", value=1)
+            first = claim("worker_1", 1)[0]
+            Job.objects.filter(pk=first.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+            second = claim("worker_2", 1)[0]
+
+            self.assertFalse(run(first))
+            self.assertFalse(run_by_id((second.pk, first.locked_by)))
+            handler.assert_not_called()
+
+            self.assertTrue(run_by_id((second.pk, second.locked_by)))
+            self.assertFalse(run(second))
+            handler.assert_called_once_with(value=1)
+            self.assertFalse(Job.objects.exists())
+
+        # a failing job keeps its row, the deletion is rolled back with the work
+        with mock.patch.dict(JOBS, {"fail": fail}):
+            job = enqueue("fail")
+            self.assertFalse(run(claim("worker", 1)[0]))
+            self.assertTrue(Job.objects.filter(pk=job.pk, status=Job.QUEUED).exists())
+
+    def test_run_jobs(self):
+        """
+        The worker does the fan-out, counting and indexing of new Dweets and deletes the finished jobs
+        """
+        dweet = Dweet.objects.create(user=self.user_1, body="#later @user_2")
+        Dweet.objects.create(user=self.user_1, body="deleted before the job ran").delete()
+        self.assertEqual(Job.objects.count(), 2)
+
+        out = StringIO()
+        call_command("run_jobs", "--once", "--workers", "1", stdout=out)
+        self.assertIn("2 jobs succeeded, 0 failed", out.getvalue())
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(Profile.objects.get(user=self.user_1).dweet_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(profile=self.user_2.profile, dweet=dweet).exists())
+        self.assertEqual(list(DweetTag.objects.values_list("tag", flat=True)), ["later"])
+        self.assertEqual(TagCount.objects.get().count, 1)
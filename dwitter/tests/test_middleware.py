@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dwitter.metrics import registry
+from dwitter.models import Dweet
+
+User = get_user_model()
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.user_1 = User.objects.create(username="user_1")
+        Dweet.objects.create(user=self.user_1, body="this is a dweet by user_1")
+
+    @override_settings(DWITTER_METRICS_SAMPLE_RATE=1.0)
+    def test_server_timing_header(self):
+        """
+        Sampled requests report total, sql and template time and are aggregated per view name
+        """
+        response = self.client.get(reverse("dwitter:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response["Server-Timing"], r'^total;dur=[\d.]+, sql;dur=[\d.]+;desc="1 queries", template;dur='
+        )
+
+        self.client.get(reverse("dwitter:profile-detail", args=[self.user_1.username]))
+        self.client.get(reverse("dwitter:profile-detail", args=[self.user_1.username]))
+
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot["dwitter:dashboard"]["queries"]["count"], 1)
+        self.assertEqual(snapshot["dwitter:dashboard"]["queries"]["sum"], 1)
+        self.assertEqual(snapshot["dwitter:profile-detail"]["wall_ms"]["count"], 2)
+        self.assertGreater(snapshot["dwitter:profile-detail"]["template_ms"]["sum"], 0)
+
+    @override_settings(DWITTER_METRICS_SAMPLE_RATE=0.0)
+    def test_not_sampled(self):
+        """
+        Requests that are not sampled are left alone
+        """
+        response = self.client.get(reverse("dwitter:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(registry.snapshot(), {})
+
+    @override_settings(DWITTER_METRICS_SAMPLE_RATE=1.0)
+    def test_MetricsView(self):
+        """
+        Only staff can read the histograms
+        """
+        url = reverse("dwitter:metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.user_1)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.user_1.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("dwitter:metrics", response.json()["views"])
@@ -1,7 +1,9 @@
+from unittest import mock
+
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from dwitter.models import Dweet, Profile
+from dwitter.models import Dweet, Profile, TimelineEntry
 
 
 class DweetModelTests(TestCase):
@@ -50,3 +52,118 @@ class ProfileModelTests(TestCase):
         # verify the user follows themselves as part of the post_save action
         self.assertTrue(profile in user.profile.followed_by.all())
         self.assertTrue(profile in user.profile.follows.all())
+
+
+class TimelineEntryModelTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+
+    def test_timeline_fan_out(self):
+        # a new dweet lands on the author's own timeline since every user follows themselves
+        dweet = Dweet.objects.create(user=self.user_2, body="dweet by user_2")
+        self.assertTrue(TimelineEntry.objects.filter(profile=self.user_2.profile, dweet=dweet).exists())
+        self.assertFalse(TimelineEntry.objects.filter(profile=self.user_1.profile, dweet=dweet).exists())
+
+        # once followed, new dweets are pushed to the follower as well
+        self.user_1.profile.follows.add(self.user_2.profile)
+        new_dweet = Dweet.objects.create(user=self.user_2, body="another dweet by user_2")
+        self.assertTrue(TimelineEntry.objects.filter(profile=self.user_1.profile, dweet=new_dweet).exists())
+
+    def test_timeline_follow_backfill_and_unfollow_prune(self):
+        Dweet.objects.create(user=self.user_2, body="dweet by user_2")
+
+        # following backfills existing dweets, from either side of the relation
+        self.user_1.profile.follows.add(self.user_2.profile)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_1.profile).count(), 1)
+
+        self.user_2.profile.followed_by.remove(self.user_1.profile)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_1.profile).count(), 0)
+
+        self.user_2.profile.followed_by.add(self.user_1.profile)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_1.profile).count(), 1)
+
+        # unfollowing prunes them again while leaving the author's own timeline alone
+        self.user_1.profile.follows.remove(self.user_2.profile)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_1.profile).count(), 0)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_2.profile).count(), 1)
+
+    @override_settings(DWITTER_TIMELINE_MAX_ENTRIES=3)
+    def test_timeline_cap(self):
+        dweets = [Dweet.objects.create(user=self.user_1, body=f"dweet {i}") for i in range(5)]
+
+        # only the newest entries are kept
+        entries = TimelineEntry.objects.filter(profile=self.user_1.profile)
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual({entry.dweet for entry in entries}, set(dweets[2:]))
+
+    @override_settings(DWITTER_TIMELINE_MAX_ENTRIES=2)
+    def test_timeline_trim_followers(self):
+        followers = [User.objects.create(username=f"follower_{i}") for i in range(12)]
+        for follower in followers:
+            follower.profile.follows.add(self.user_2.profile)
+        for i in range(3):
+            Dweet.objects.create(user=self.user_2, body=f"dweet {i}")
+
+        # trimming costs the same few queries however many followers there are
+        with self.assertNumQueries(1):
+            TimelineEntry.objects.trim([follower.profile.pk for follower in followers])
+        with override_settings(DWITTER_TIMELINE_MAX_ENTRIES=1), mock.patch.object(
+            TimelineEntry.objects, "TRIM_BATCH_SIZE", 5
+        ), self.assertNumQueries(3):
+            TimelineEntry.objects.trim([follower.profile.pk for follower in followers])
+        for follower in followers:
+            self.assertEqual(
+                list(TimelineEntry.objects.filter(profile=follower.profile).values_list("dweet__body", flat=True)),
+                ["dweet 2"],
+            )
+
+    def test_timeline_rebuild(self):
+        self.user_1.profile.follows.add(self.user_2.profile)
+        Dweet.objects.create(user=self.user_1, body="dweet by user_1")
+        Dweet.objects.create(user=self.user_2, body="dweet by user_2")
+
+        TimelineEntry.objects.all().delete()
+        TimelineEntry.objects.rebuild(self.user_1.profile)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_1.profile).count(), 2)
+        self.assertEqual(TimelineEntry.objects.filter(profile=self.user_2.profile).count(), 0)
+
+
+class ProfileCounterTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+
+    def assertCounts(self, user, following, followers, dweets):
+        profile = Profile.objects.get(user=user)
+        self.assertEqual(
+            (profile.following_count, profile.followers_count, profile.dweet_count), (following, followers, dweets)
+        )
+
+    def test_follow_counters(self):
+        # self follows are not counted
+        self.assertCounts(self.user_1, 0, 0, 0)
+
+        self.user_1.profile.follows.add(self.user_2.profile)
+        self.assertCounts(self.user_1, 1, 0, 0)
+        self.assertCounts(self.user_2, 0, 1, 0)
+
+        # following again or unfollowing twice must not double count
+        self.user_1.profile.follows.add(self.user_2.profile)
+        self.user_2.profile.followed_by.remove(self.user_1.profile)
+        self.user_2.profile.followed_by.remove(self.user_1.profile)
+        self.assertCounts(self.user_1, 0, 0, 0)
+        self.assertCounts(self.user_2, 0, 0, 0)
+
+        self.user_2.profile.follows.add(self.user_1.profile)
+        self.user_2.profile.follows.clear()
+        self.assertCounts(self.user_1, 0, 0, 0)
+        self.assertCounts(self.user_2, 0, 0, 0)
+
+    def test_dweet_counter(self):
+        dweet = Dweet.objects.create(user=self.user_1, body="dweet by user_1")
+        Dweet.objects.create(user=self.user_1, body="another dweet by user_1")
+        self.assertCounts(self.user_1, 0, 0, 2)
+
+        dweet.delete()
+        self.assertCounts(self.user_1, 0, 0, 1)
@@ -0,0 +1,105 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from dwitter.models import Suggestion
+from dwitter.recommendations import GraphSnapshot, write_snapshot
+from dwitter.templatetags.dwitter_tags import follow_suggestions
+
+User = get_user_model()
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.profiles = {name: User.objects.create(username=name).profile for name in "abcdef"}
+        follows = {"a": "bc", "b": "de", "c": "d", "d": "a", "e": "", "f": "a"}
+        for name, followees in follows.items():
+            self.profiles[name].follows.add(*(self.profiles[followee] for followee in followees))
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "follows.graph")
+
+    def test_snapshot(self):
+        """
+        The snapshot holds every profile and follow, self follows left out
+        """
+        self.assertEqual(write_snapshot(self.path, chunk_size=2), (6, 7))
+        snapshot = GraphSnapshot(self.path)
+        self.addCleanup(snapshot.close)
+
+        a = snapshot.index_of(self.profiles["a"].pk)
+        self.assertEqual(snapshot.ids[a], self.profiles["a"].pk)
+        self.assertEqual(
+            [snapshot.ids[i] for i in snapshot.followees(a)], [self.profiles["b"].pk, self.profiles["c"].pk]
+        )
+        self.assertEqual(list(snapshot.followees(snapshot.index_of(self.profiles["e"].pk))), [])
+        self.assertIsNone(snapshot.index_of(max(snapshot.ids) + 1))
+
+    def test_recommend(self):
+        """
+        Friends of friends are ranked by mutual connections, never the profile itself or who it already follows
+        """
+        write_snapshot(self.path)
+        snapshot = GraphSnapshot(self.path)
+        self.addCleanup(snapshot.close)
+
+        self.assertEqual(
+            snapshot.recommend(snapshot.index_of(self.profiles["a"].pk), 10),
+            [(self.profiles["d"].pk, 2), (self.profiles["e"].pk, 1)],
+        )
+        self.assertEqual(snapshot.recommend(snapshot.index_of(self.profiles["a"].pk), 1), [(self.profiles["d"].pk, 2)])
+        self.assertEqual(
+            snapshot.recommend(snapshot.index_of(self.profiles["f"].pk), 10),
+            [(self.profiles["b"].pk, 1), (self.profiles["c"].pk, 1)],
+        )
+
+    def test_not_a_snapshot(self):
+        """
+        Reusing a file that is not a snapshot fails cleanly
+        """
+        with open(self.path, "wb") as snapshot:
+            snapshot.write(b"\0" * 64)
+        with self.assertRaisesMessage(CommandError, "is not a follow graph snapshot"):
+            call_command("recommend_follows", "--snapshot", self.path, "--reuse-snapshot", stdout=StringIO())
+
+    def test_recommend_follows(self):
+        """
+        Every profile is scored, in one process or in a pool, and stale suggestions are replaced
+        """
+        stale = Suggestion.objects.create(profile=self.profiles["e"], suggested=self.profiles["a"], score=9)
+        for workers in ("1", "2"):
+            with self.subTest(workers=workers):
+                out = StringIO()
+                call_command(
+                    "recommend_follows", "--snapshot", self.path, "--workers", workers, "--batch-size", "4", stdout=out
+                )
+                self.assertIn("Wrote 8 suggestions for 6 profiles", out.getvalue())
+                self.assertFalse(Suggestion.objects.filter(pk=stale.pk).exists())
+                self.assertEqual(
+                    list(self.profiles["a"].suggestions.values_list("suggested", "score")),
+                    [(self.profiles["d"].pk, 2), (self.profiles["e"].pk, 1)],
+                )
+
+    def test_sidebar(self):
+        """
+        Suggestions are read with a single query and leave out profiles followed since
+        """
+        call_command("recommend_follows", "--snapshot", self.path, "--workers", "1", stdout=StringIO())
+        user_a = self.profiles["a"].user
+
+        with self.assertNumQueries(1):
+            suggestions = follow_suggestions(user_a)
+            self.assertEqual([suggestion.suggested.user.username for suggestion in suggestions], ["d", "e"])
+
+        self.profiles["a"].follows.add(self.profiles["d"])
+        self.client.force_login(user_a)
+        response = self.client.get(reverse("dwitter:profile-list"))
+        self.assertContains(response, "Who to follow")
+        self.assertContains(response, "1 mutual")
+        self.assertNotContains(response, "2 mutual")
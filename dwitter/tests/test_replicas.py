@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dwitter.middleware import ReplicaRoutingMiddleware
+from dwitter.models import Dweet
+from dwitter.routers import ReplicaRouter, replica_reads
+
+User = get_user_model()
+
+
+@override_settings(DWITTER_REPLICA_DATABASE="replica", DWITTER_REPLICA_PIN=5)
+class ReplicaRoutingTests(TestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user_1 = User.objects.create(username="user_1")
+        Dweet.objects.create(user=self.user_1, body="only on the primary")
+
+        # the replica lags behind, it only has an older dweet
+        User.objects.using("replica").bulk_create([User(username="replica_user")])
+        replica_user = User.objects.using("replica").get()
+        Dweet.objects.using("replica").bulk_create([Dweet(user=replica_user, body="already on the replica")])
+
+    def test_router(self):
+        """
+        Writes of replica objects go to the primary, reads only go to the replica inside replica_reads
+        """
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Dweet))
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Dweet), "replica")
+            self.assertIsNone(router.db_for_write(Dweet))
+            replica_user = User.objects.get()
+            self.assertEqual(router.db_for_write(Dweet, instance=replica_user), "default")
+            self.assertEqual(list(Dweet.objects.values_list("body", flat=True)), ["already on the replica"])
+            with override_settings(DWITTER_REPLICA_DATABASE=None):
+                self.assertIsNone(router.db_for_read(Dweet))
+
+    def test_get_reads_replica(self):
+        """
+        GET dwitter views read the replica, unless no replica is configured
+        """
+        content = self.client.get(reverse("dwitter:dashboard")).content.decode("utf-8")
+        self.assertIn("already on the replica", content)
+        self.assertNotIn("only on the primary", content)
+
+        with override_settings(DWITTER_REPLICA_DATABASE=None):
+            cache.clear()
+            content = self.client.get(reverse("dwitter:dashboard")).content.decode("utf-8")
+        self.assertIn("only on the primary", content)
+        self.assertNotIn("already on the replica", content)
+
+    def test_read_your_writes(self):
+        """
+        After a write the client reads the primary until the pin expires
+        """
+        self.client.force_login(self.user_1)
+        response = self.client.post(reverse("dwitter:dweet-create"), {"body": "my own dweet"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.cookies[ReplicaRoutingMiddleware.PIN_COOKIE]["max-age"], 5)
+
+        response = self.client.get(reverse("dwitter:dashboard"))
+        self.assertEqual(response.context["user"], self.user_1)
+        self.assertIn("my own dweet", response.content.decode("utf-8"))
+
+        # once pinned, the replica is expected to have caught up, this one never does
+        self.client.cookies[ReplicaRoutingMiddleware.PIN_COOKIE] = "0"
+        response = self.client.get(reverse("dwitter:dashboard"))
+        self.assertNotIn("my own dweet", response.content.decode("utf-8"))
+        # the session and the viewer come from the cache, so the lag does not log the user out
+        self.assertEqual(response.context["user"], self.user_1)
+
+        # failed writes do not pin
+        self.client.logout()
+        response = self.client.post(reverse("dwitter:dweet-create"), {"body": "x" * 200})
+        self.assertNotIn(ReplicaRoutingMiddleware.PIN_COOKIE, response.cookies)
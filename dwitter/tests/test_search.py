@@ -0,0 +1,164 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dwitter.models import Dweet, SearchTerm
+from dwitter.search import SearchPaginator, get_search_backend
+
+User = get_user_model()
+
+
+class SearchBackendTestsMixin:
+    """
+    Behaviour every search backend shares, run once per backend
+    """
+
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.often = Dweet.objects.create(user=self.user_1, body="django django django")
+        self.both = Dweet.objects.create(user=self.user_1, body="Django and python, a love story told in many words")
+        self.once = Dweet.objects.create(user=self.user_1, body="I wrote some django today, it went well all in all")
+        Dweet.objects.create(user=self.user_1, body="nothing to see here")
+
+    def search(self, query, per_page=10):
+        return [dweet.pk for dweet in SearchPaginator(query, per_page).page()]
+
+    def test_search_ranked(self):
+        """
+        Every term must match, dweets mentioning the terms more often rank first
+        """
+        self.assertEqual(get_search_backend().name, self.backend)
+        self.assertEqual(self.search("DJANGO")[0], self.often.pk)
+        self.assertEqual(set(self.search("django")), {self.often.pk, self.both.pk, self.once.pk})
+        self.assertEqual(self.search("python django"), [self.both.pk])
+        self.assertEqual(self.search("flask"), [])
+        self.assertEqual(self.search("   "), [])
+
+        # query syntax is not interpreted
+        self.assertEqual(self.search('django OR body:"python" NEAR(*'), [])
+
+    def test_search_cursor(self):
+        """
+        Walking the results one at a time visits every match exactly once, in rank order
+        """
+        expected = self.search("django")
+        seen, cursor = [], None
+        while True:
+            page = SearchPaginator("django", 1).page(cursor)
+            seen.extend(dweet.pk for dweet in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_search_index_sync(self):
+        """
+        Edited and deleted dweets are reflected in the results
+        """
+        self.once.body = "switched to flask"
+        self.once.save()
+        self.assertEqual(self.search("flask"), [self.once.pk])
+        self.assertNotIn(self.once.pk, self.search("django"))
+
+        self.once.delete()
+        self.assertEqual(self.search("flask"), [])
+
+
+@override_settings(DWITTER_SEARCH_BACKEND="fts5")
+class FTS5SearchTests(SearchBackendTestsMixin, TestCase):
+    backend = "fts5"
+
+    def test_search_bulk_create(self):
+        """
+        The triggers index rows written without save()
+        """
+        Dweet.objects.bulk_create([Dweet(user=self.user_1, body="bulk loaded flask")])
+        self.assertEqual(len(self.search("flask")), 1)
+
+
+@override_settings(DWITTER_SEARCH_BACKEND="python")
+class PythonSearchTests(SearchBackendTestsMixin, TestCase):
+    backend = "python"
+
+    def test_rebuild_search_index(self):
+        """
+        Rows written without save() are only found after rebuilding the index
+        """
+        Dweet.objects.bulk_create([Dweet(user=self.user_1, body="bulk loaded flask")])
+        self.assertEqual(self.search("flask"), [])
+
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Reindexed 5 dweets with the python search backend", out.getvalue())
+        self.assertEqual(len(self.search("flask")), 1)
+        self.assertEqual(SearchTerm.objects.filter(term="django").count(), 3)
+
+
+class SearchViewTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        for i in range(7):
+            Dweet.objects.create(user=self.user_1, body=f"searchable dweet number {i}")
+
+    def test_auto_backend(self):
+        """
+        SQLite with FTS5 picks the FTS5 index
+        """
+        self.assertEqual(get_search_backend().name, "fts5")
+
+    def test_SearchView(self):
+        """
+        Results are shown five at a time with a link to the next page
+        """
+        url = reverse("dwitter:search")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = self.client.get(url, {"q": "searchable"})
+        self.assertEqual(len(response.context["results"]), 5)
+        self.assertContains(response, "searchable dweet number", count=5)
+        self.assertContains(response, f"?q=searchable&cursor={response.context['results'].next_cursor}")
+
+        response = self.client.get(url, {"q": "searchable", "cursor": response.context["results"].next_cursor})
+        self.assertEqual(len(response.context["results"]), 2)
+        self.assertNotContains(response, "More results")
+
+        self.assertContains(self.client.get(url, {"q": "missing"}), "No dweets match")
+        self.assertEqual(self.client.get(url, {"q": "searchable", "cursor": "tacos"}).status_code, 404)
+
+    def test_SearchAPIView(self):
+        """
+        The JSON endpoint pages with next_cursor and rejects malformed parameters
+        """
+        url = reverse("dwitter:api-search")
+        data = self.client.get(url, {"q": "searchable", "count": 4}).json()
+        self.assertEqual(len(data["dweets"]), 4)
+        self.assertEqual(data["dweets"][0]["username"], self.user_1.username)
+
+        data = self.client.get(url, {"q": "searchable", "cursor": data["next_cursor"]}).json()
+        self.assertEqual(len(data["dweets"]), 3)
+        self.assertIsNone(data["next_cursor"])
+
+        for params in ({"q": "x", "cursor": "tacos"}, {"q": "x", "count": "0"}, {"q": "x", "count": "many"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+
+    @override_settings(DWITTER_SEARCH_BACKEND=None)
+    def test_search_turned_off(self):
+        """
+        Without a backend the search pages are gone, new Dweets are not indexed and the form is not shown
+        """
+        self.assertEqual(self.client.get(reverse("dwitter:search"), {"q": "searchable"}).status_code, 404)
+        self.assertEqual(self.client.get(reverse("dwitter:api-search"), {"q": "searchable"}).status_code, 404)
+        self.assertNotContains(self.client.get(reverse("dwitter:dashboard")), reverse("dwitter:search"))
+
+        with override_settings(DWITTER_SEARCH_BACKEND="python"):
+            call_command("rebuild_search_index", stdout=StringIO())
+        Dweet.objects.create(user=self.user_1, body="unindexed dweet")
+        self.assertFalse(SearchTerm.objects.filter(term="unindexed").exists())
+
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Search is turned off", out.getvalue())
@@ -0,0 +1,246 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError, SystemCheckError
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dwitter import sharding
+from dwitter.checks import check_sharded_features
+from dwitter.models import Dweet, Profile
+from dwitter.routers import ShardRouter
+
+User = get_user_model()
+SHARDS = ["shard_0", "shard_1"]
+
+
+@override_settings(DWITTER_DWEET_SHARDS=SHARDS, DWITTER_SHARD_READ_WORKERS=1)
+class ShardingTests(TestCase):
+    databases = {"default", "shard_0", "shard_1"}
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(sharding, "_seeded", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        users = [User.objects.create(username=f"user_{i}") for i in range(8)]
+        self.placed = {shard: [user for user in users if user.profile.dweet_shard == shard] for shard in SHARDS}
+        self.user_1, self.user_2 = self.placed["shard_0"][0], self.placed["shard_1"][0]
+        self.reader = self.placed["shard_0"][1]
+        self.reader.profile.follows.add(self.user_1.profile, self.user_2.profile)
+
+    def test_placement(self):
+        """
+        New authors are hashed onto a shard, their Dweets are written there with ids unique across shards
+        """
+        self.assertTrue(all(self.placed.values()))
+        self.assertEqual(sharding.shard_of(self.user_2.pk), "shard_1")
+
+        dweets = [
+            Dweet.objects.create(user=user, body=f"dweet {i}") for i in range(3) for user in (self.user_1, self.user_2)
+        ]
+        self.assertEqual(len({dweet.pk for dweet in dweets}), 6)
+        self.assertEqual(Dweet.objects.using("shard_0").filter(user=self.user_1).count(), 3)
+        self.assertEqual(Dweet.objects.using("shard_1").filter(user=self.user_2).count(), 3)
+        self.assertFalse(Dweet.objects.using("default").exists())
+        self.assertEqual(Profile.objects.get(user=self.user_2).dweet_count, 3)
+
+        # related objects are routed to the primary, sharded Dweets stay where they are
+        dweet = Dweet.objects.using("shard_1").get(pk=dweets[1].pk)
+        self.assertEqual(dweet.user, self.user_2)
+        dweet.body = "edited"
+        dweet.save()
+        self.assertEqual(Dweet.objects.using("shard_1").get(pk=dweet.pk).body, "edited")
+        dweet.delete()
+        self.assertEqual(Profile.objects.get(user=self.user_2).dweet_count, 2)
+
+    def test_router(self):
+        """
+        Only the Dweet table is created on the shards
+        """
+        router = ShardRouter()
+        self.assertTrue(router.allow_migrate("shard_0", "dwitter", model_name="dweet"))
+        self.assertFalse(router.allow_migrate("shard_0", "dwitter", model_name="profile"))
+        self.assertFalse(router.allow_migrate("shard_0", "auth", model_name="user"))
+        self.assertFalse(router.allow_migrate("shard_0", "dwitter"))
+        self.assertIsNone(router.allow_migrate("default", "dwitter", model_name="profile"))
+
+    def test_profile(self):
+        """
+        Profile pages read a single shard
+        """
+        Dweet.objects.create(user=self.user_2, body="on shard_1")
+        Dweet.objects.create(user=self.user_1, body="on shard_0")
+
+        response = self.client.get(reverse("dwitter:profile-detail", args=[self.user_2.username]))
+        self.assertEqual([dweet.body for dweet in response.context["page_obj"]], ["on shard_1"])
+        self.assertContains(response, self.user_2.username)
+
+    def test_timeline(self):
+        """
+        Timelines merge the followed authors of every shard newest first, page after page
+        """
+        for i in range(6):
+            Dweet.objects.create(user=(self.user_1, self.user_2)[i % 2], body=f"dweet {i}")
+        other = self.placed["shard_1"][1]
+        Dweet.objects.create(user=other, body="not followed")
+
+        self.client.force_login(self.reader)
+        bodies = []
+        url = reverse("dwitter:dashboard")
+        while url:
+            response = self.client.get(url)
+            page = response.context["page_obj"]
+            bodies += [dweet.body for dweet in page]
+            url = f"{reverse('dwitter:dashboard')}?cursor={page.next_cursor}" if page.has_next() else None
+        self.assertEqual(bodies, [f"dweet {i}" for i in reversed(range(6))])
+
+        # anonymous users see everyone but deleted accounts
+        Profile.objects.soft_delete(self.user_1.profile)
+        self.client.logout()
+        response = self.client.get(reverse("dwitter:dashboard"))
+        self.assertEqual(
+            [dweet.body for dweet in response.context["page_obj"]],
+            ["not followed", "dweet 5", "dweet 3", "dweet 1"],
+        )
+
+    def test_api(self):
+        """
+        The JSON timeline merges the shards and the JSON profile reads the author's shard
+        """
+        for i in range(4):
+            Dweet.objects.create(user=(self.user_1, self.user_2)[i % 2], body=f"dweet {i}")
+        Dweet.objects.create(user=self.placed["shard_1"][1], body="not followed")
+
+        self.client.force_login(self.reader)
+        data = self.client.get(reverse("dwitter:api-timeline"), {"count": 3}).json()
+        self.assertEqual([dweet["body"] for dweet in data["dweets"]], ["dweet 3", "dweet 2", "dweet 1"])
+        data = self.client.get(reverse("dwitter:api-timeline"), {"max_id": data["oldest_id"]}).json()
+        self.assertEqual([dweet["body"] for dweet in data["dweets"]], ["dweet 0"])
+
+        url = reverse("dwitter:api-profile-dweets", args=[self.user_2.username])
+        data = self.client.get(url).json()
+        self.assertEqual(
+            [(dweet["body"], dweet["username"]) for dweet in data["dweets"]],
+            [("dweet 3", self.user_2.username), ("dweet 1", self.user_2.username)],
+        )
+
+        # deleted accounts drop out of both
+        Profile.objects.soft_delete(self.user_2.profile)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        data = self.client.get(reverse("dwitter:api-timeline")).json()
+        self.assertEqual([dweet["body"] for dweet in data["dweets"]], ["dweet 2", "dweet 0"])
+
+    def test_purge_deleted_users(self):
+        """
+        The Dweets of a deleted author are purged from its shard before the User, the firehose keeps working
+        """
+        Dweet.objects.create(user=self.user_2, body="on shard_1")
+        Dweet.objects.create(user=self.user_1, body="on shard_0")
+        Profile.objects.soft_delete(self.user_2.profile)
+
+        # the User stays while its sharded Dweets exist
+        with self.assertRaises(ProtectedError), transaction.atomic():
+            self.user_2.delete()
+
+        call_command("purge_deleted_users", "--batch-size", "1", "--sleep", "0", stdout=StringIO())
+        self.assertFalse(User.objects.filter(pk=self.user_2.pk).exists())
+        self.assertFalse(Dweet.objects.using("shard_1").filter(user_id=self.user_2.pk).exists())
+        self.assertTrue(Dweet.objects.using("shard_0").filter(user=self.user_1).exists())
+
+        response = self.client.get(reverse("dwitter:dashboard"))
+        self.assertEqual([dweet.body for dweet in response.context["page_obj"]], ["on shard_0"])
+
+    def test_repair_profile_counters(self):
+        """
+        Dweets are recounted on every shard, and on the primary for authors being moved
+        """
+        for i in range(3):
+            Dweet.objects.create(user=self.user_2, body=f"dweet {i}")
+        with override_settings(DWITTER_DWEET_SHARDS=[]):
+            Dweet.objects.create(user=self.user_2, body="left on the primary")
+        Profile.objects.update(dweet_count=0)
+
+        out = StringIO()
+        call_command("repair_profile_counters", stdout=out)
+        self.assertIn("repaired 1", out.getvalue())
+        self.assertEqual(Profile.objects.get(user=self.user_2).dweet_count, 4)
+
+    def test_rebalance_shards(self):
+        """
+        Authors from before sharding are moved from the primary to their shard, chosen authors to any shard
+        """
+        Profile.objects.filter(user=self.user_1).update(dweet_shard="")
+        with override_settings(DWITTER_DWEET_SHARDS=[]):
+            legacy = [Dweet.objects.create(user=self.user_1, body=f"#old {i}") for i in range(3)]
+        self.assertEqual(Dweet.objects.using("default").count(), 3)
+
+        out = StringIO()
+        call_command("rebalance_shards", "--dry-run", stdout=out)
+        self.assertIn(f"Would move {self.user_1.username} from default to shard_0", out.getvalue())
+        self.assertEqual(Dweet.objects.using("default").count(), 3)
+
+        call_command("rebalance_shards", "--batch-size", "2", stdout=out)
+        self.assertIn("Moved 3 dweets of 1 authors", out.getvalue())
+        self.assertFalse(Dweet.objects.using("default").exists())
+        self.assertEqual(
+            set(Dweet.objects.using("shard_0").values_list("id", "created_at")),
+            {(dweet.pk, dweet.created_at) for dweet in legacy},
+        )
+        self.assertEqual(Profile.objects.get(user=self.user_1).dweet_shard, "shard_0")
+        self.assertEqual(Profile.objects.get(user=self.user_1).dweet_count, 3)
+
+        # new ids do not collide with the moved ones
+        self.assertGreater(Dweet.objects.create(user=self.user_1, body="new").pk, legacy[-1].pk)
+
+        call_command("rebalance_shards", "--author", self.user_1.username, "--to", "shard_1", stdout=out)
+        self.assertIn(f"Moved {self.user_1.username} from shard_0 to shard_1, 4 dweets", out.getvalue())
+        self.assertEqual(Dweet.objects.using("shard_1").filter(user=self.user_1).count(), 4)
+        self.assertFalse(Dweet.objects.using("shard_0").filter(user=self.user_1).exists())
+
+        with self.assertRaises(CommandError):
+            call_command("rebalance_shards", "--to", "shard_1", stdout=out)
+        with self.assertRaises(CommandError):
+            call_command("rebalance_shards", "--author", "nobody", stdout=out)
+
+    def test_rebalance_shards_clash(self):
+        """
+        A move stops before deleting anything when a Dweet id is taken on the target by another author
+        """
+        taken = Dweet.objects.create(user=self.user_2, body="on shard_1")
+        Profile.objects.filter(user=self.user_1).update(dweet_shard="")
+        with override_settings(DWITTER_DWEET_SHARDS=[]):
+            Dweet.objects.create(pk=taken.pk, user=self.user_1, body="legacy")
+
+        with self.assertRaises(CommandError):
+            call_command("rebalance_shards", "--author", self.user_1.username, "--to", "shard_1", stdout=StringIO())
+        self.assertEqual(Dweet.objects.using("default").get(pk=taken.pk).body, "legacy")
+        self.assertEqual(Dweet.objects.using("shard_1").get(pk=taken.pk).body, "on shard_1")
+
+    def test_bulk_loads(self):
+        """
+        The bulk loaders do not run while sharded
+        """
+        with self.assertRaises(CommandError):
+            call_command("generate_social_graph", "--users", "10", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("import_dwitter", "export.jsonl", stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith="synthetic_").exists())
+
+    def test_checks(self):
+        """
+        The system checks refuse to start while search or the hashtag and mention pages are on
+        """
+        self.assertEqual([error.id for error in check_sharded_features(None)], ["dwitter.E001", "dwitter.E002"])
+        with self.assertRaises(SystemCheckError):
+            call_command("check", stdout=StringIO())
+        with override_settings(DWITTER_SEARCH_BACKEND=None, DWITTER_ENTITY_VIEWS=False):
+            self.assertEqual(check_sharded_features(None), [])
+        with override_settings(DWITTER_DWEET_SHARDS=[]):
+            self.assertEqual(check_sharded_features(None), [])
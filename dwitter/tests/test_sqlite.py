@@ -0,0 +1,53 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class TunedSQLiteTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.databases["tuned"] = {
+            "ENGINE": "dwitter.backends.sqlite3",
+            "NAME": os.path.join(directory.name, "tuned.sqlite3"),
+        }
+        self.addCleanup(connections.databases.pop, "tuned")
+        self.addCleanup(connections.__delitem__, "tuned")
+        self.addCleanup(lambda: connections["tuned"].close())
+
+    def test_pragmas(self):
+        """
+        New connections run the pragmas, transactions take the write lock up front
+        """
+        with connections["tuned"].cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("CREATE TABLE counter (value INTEGER)")
+
+        with CaptureQueriesContext(connections["tuned"]) as queries:
+            with transaction.atomic(using="tuned"), connections["tuned"].cursor() as cursor:
+                cursor.execute("INSERT INTO counter VALUES (1)")
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+
+    def test_benchmark_sqlite(self):
+        """
+        The benchmark reports both backends and cleans up after itself
+        """
+        out = StringIO()
+        call_command(
+            "benchmark_sqlite", "--threads", "2", "--seconds", "0.2", "--rows", "100", "--seed", "1", stdout=out
+        )
+        output = out.getvalue()
+        for backend in ("stock", "tuned"):
+            self.assertRegex(output, rf"{backend}\s+read\s+\d+")
+            self.assertRegex(output, rf"{backend}\s+write\s+\d+")
+        self.assertNotIn("benchmark_tuned", connections.databases)
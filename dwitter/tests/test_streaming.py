@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from dwitter.models import Dweet
+from dwitter.streaming import TimelineStreamApplication, hub
+
+User = get_user_model()
+
+
+class TimelineStreamTests(TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_3 = User.objects.create(username="user_3")
+        self.user_1.profile.follows.add(self.user_2.profile)
+        self.url = reverse("dwitter:timeline-stream")
+
+    def get_scope(self, user=None):
+        headers = []
+        if user is not None:
+            self.client.force_login(user)
+            headers.append(
+                (b"cookie", f"{settings.SESSION_COOKIE_NAME}={self.client.cookies['sessionid'].value}".encode())
+            )
+        return {"type": "http", "method": "GET", "path": self.url, "headers": headers}
+
+    def run_stream(self, scope, on_start=None, stop_after=1):
+        """
+        Run the ASGI application until it finishes or stop_after dweet events were received
+        """
+        messages = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+            if message["type"] == "http.response.start" and on_start is not None:
+                await sync_to_async(on_start)()
+            body = b"".join(m.get("body", b"") for m in messages)
+            if body.count(b"event: dweet") >= stop_after:
+                disconnect.set()
+
+        async def django_application(scope, receive, send):
+            raise AssertionError("should not reach django")
+
+        async def run():
+            await asyncio.wait_for(TimelineStreamApplication(django_application)(scope, receive, send), timeout=5)
+
+        async_to_sync(run)()
+        return messages
+
+    def test_stream_unauthenticated(self):
+        """
+        Anonymous users have no timeline to stream
+        """
+        messages = self.run_stream(self.get_scope())
+        self.assertEqual(messages[0]["status"], 403)
+
+    def test_stream_followed_dweets(self):
+        """
+        Only dweets of followed users are streamed, and the subscription is dropped when the client goes away
+        """
+
+        def dweet():
+            hub.publish(Dweet.objects.create(user=self.user_3, body="not followed"))
+            hub.publish(Dweet.objects.create(user=self.user_2, body="this is a dweet by user_2"))
+
+        messages = self.run_stream(self.get_scope(self.user_1), on_start=dweet)
+        self.assertEqual(messages[0]["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), messages[0]["headers"])
+
+        body = b"".join(message.get("body", b"") for message in messages).decode()
+        self.assertNotIn("not followed", body)
+        event = json.loads(body.split("data: ", 1)[1].split("\n", 1)[0])
+        self.assertEqual(event["body"], "this is a dweet by user_2")
+        self.assertEqual(event["url"], reverse("dwitter:profile-detail", args=[self.user_2.username]))
+        self.assertEqual(hub.subscriber_count(), 0)
+
+    @override_settings(DWITTER_STREAM_QUEUE_SIZE=1)
+    def test_stream_backpressure(self):
+        """
+        A client that falls behind is told to resync instead of buffering without bounds
+        """
+
+        def dweet():
+            for i in range(3):
+                hub.publish(Dweet.objects.create(user=self.user_2, body=f"dweet {i}"))
+
+        messages = self.run_stream(self.get_scope(self.user_1), on_start=dweet)
+        body = b"".join(message.get("body", b"") for message in messages).decode()
+        self.assertIn("event: resync", body)
+        self.assertEqual(body.count("event: dweet"), 1)
+
+    @override_settings(DWITTER_STREAM_IDLE_TIMEOUT=0.2, DWITTER_STREAM_HEARTBEAT=0.05)
+    def test_stream_idle_timeout(self):
+        """
+        Idle streams send keep-alive comments, then close
+        """
+        messages = self.run_stream(self.get_scope(self.user_1))
+        body = b"".join(message.get("body", b"") for message in messages).decode()
+        self.assertIn(": ping", body)
+        self.assertTrue(body.endswith("event: timeout\ndata: {}\n\n"))
+        self.assertFalse(messages[-1].get("more_body", False))
+
+    def test_DweetCreateView_publishes(self):
+        """
+        Dweeting through the view publishes the dweet, the fallback view tells clients there is no stream
+        """
+
+        client = Client()
+        client.force_login(self.user_2)
+
+        def dweet():
+            client.post(reverse("dwitter:dweet-create"), data={"body": "this is a dweet by user_2"})
+
+        scope = self.get_scope(self.user_1)
+        messages = self.run_stream(scope, on_start=dweet)
+        self.assertIn(b"this is a dweet by user_2", b"".join(message.get("body", b"") for message in messages))
+
+        self.assertEqual(self.client.get(self.url).status_code, 204)
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from dwitter.cache import get_trending_cache
+from dwitter.models import TagCount
+from dwitter.trending import compact_buckets, compute_trending, get_trending, record_tags
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        get_trending_cache().clear()
+        self.now = timezone.now()
+
+    def test_record_tags(self):
+        """
+        Dweets are counted per tag in the bucket of their minute
+        """
+        record_tags(["django", "python"], self.now)
+        record_tags(["django"], self.now)
+        record_tags(["django"], self.now - timedelta(minutes=2))
+
+        self.assertEqual(TagCount.objects.count(), 3)
+        self.assertEqual(TagCount.objects.get(tag="django", bucket=self.now.replace(second=0, microsecond=0)).count, 2)
+
+    def test_windows(self):
+        """
+        Each window sums its own buckets, most used first
+        """
+        record_tags(["django"], self.now)
+        for _ in range(3):
+            record_tags(["python"], self.now - timedelta(hours=3))
+        record_tags(["ancient"], self.now - timedelta(days=2))
+
+        self.assertEqual(compute_trending("1h", 5), [("django", 1)])
+        self.assertEqual(compute_trending("24h", 5), [("python", 3), ("django", 1)])
+        self.assertEqual(compute_trending("24h", 1), [("python", 3)])
+
+    def test_get_trending_cached(self):
+        """
+        The top tags are computed once and then served from the cache
+        """
+        record_tags(["django"], self.now)
+        self.assertEqual(get_trending("1h"), [("django", 1)])
+
+        record_tags(["python", "flask"], self.now)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_trending("1h"), [("django", 1)])
+
+        get_trending_cache().clear()
+        self.assertEqual(get_trending("1h"), [("django", 1), ("flask", 1), ("python", 1)])
+
+    def test_compact_buckets(self):
+        """
+        Old minute buckets are merged into hours without changing the long window, expired ones are deleted
+        """
+        now = self.now.replace(minute=30)
+        hour = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+        for minute in (5, 10, 50):
+            record_tags(["django"], hour + timedelta(minutes=minute))
+        record_tags(["django"], now - timedelta(minutes=50))
+        record_tags(["django"], now - timedelta(days=2))
+
+        self.assertEqual(compact_buckets(now), (1, 3))
+        self.assertEqual(TagCount.objects.get(bucket=hour).count, 3)
+        self.assertEqual(TagCount.objects.count(), 2)
+
+        # merging again changes nothing
+        self.assertEqual(compact_buckets(now), (0, 0))
+        self.assertEqual(TagCount.objects.count(), 2)
+
+    def test_compact_trending(self):
+        """
+        The command reports what it compacted
+        """
+        record_tags(["django"], self.now - timedelta(days=2))
+        out = StringIO()
+        call_command("compact_trending", stdout=out)
+        self.assertIn("Deleted 1 expired buckets, merged 0 into hours", out.getvalue())
+
+    def test_sidebar(self):
+        """
+        Posting a tagged Dweet counts it and the sidebar lists it
+        """
+        user_1 = User.objects.create(username="user_1")
+        self.client.force_login(user_1)
+        self.client.post(reverse("dwitter:dweet-create"), data={"body": "hello #Django"})
+        self.assertEqual(TagCount.objects.get().count, 1)
+
+        response = self.client.get(reverse("dwitter:dashboard"))
+        # once per window plus the link in the card of the Dweet itself
+        self.assertContains(response, f'href="{reverse("dwitter:tag-detail", args=["django"])}"', count=3)
+        self.assertContains(response, "Last 24h")
@@ -0,0 +1,137 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dwitter.models import Profile
+from dwitter.usernames import (
+    USERNAME_INDEX,
+    UsernameCache,
+    filter_username_prefix,
+    prefix_upper_bound,
+    typeahead,
+    username_cache,
+)
+
+User = get_user_model()
+
+
+class UsernamePrefixTests(TestCase):
+    def setUp(self):
+        username_cache.clear()
+        self.users = {name: User.objects.create(username=name) for name in ["Alice", "alex", "alfred", "bob", "al"]}
+        # followers: alfred 3, alex 2, Alice 1
+        for follower in ["bob", "al", "Alice"]:
+            self.users[follower].profile.follows.add(self.users["alfred"].profile)
+        for follower in ["bob", "al"]:
+            self.users[follower].profile.follows.add(self.users["alex"].profile)
+        self.users["bob"].profile.follows.add(self.users["Alice"].profile)
+
+    def test_filter_username_prefix(self):
+        """
+        Prefixes match case insensitively in lowercased username order, on the username_lower index
+        """
+        queryset = filter_username_prefix(Profile.objects.all(), "AL")
+        self.assertEqual(list(queryset.values_list("user__username", flat=True)), ["al", "alex", "alfred", "Alice"])
+        self.assertEqual(
+            list(
+                filter_username_prefix(User.objects.all(), "ali", field="profile__username_lower").values_list(
+                    "username", flat=True
+                )
+            ),
+            ["Alice"],
+        )
+        self.assertFalse(filter_username_prefix(Profile.objects.all(), "alz").exists())
+        self.assertIn(USERNAME_INDEX, queryset.explain())
+
+    def test_unicode(self):
+        """
+        Non-ASCII letters are lowercased the same way by the database and the cache, renames follow
+        """
+        emile = User.objects.create(username="Émile")
+        for prefix in ("ém", "ÉM"):
+            with self.subTest(prefix=prefix):
+                queryset = filter_username_prefix(Profile.objects.all(), prefix)
+                self.assertEqual(list(queryset.values_list("user__username", flat=True)), ["Émile"])
+                self.assertEqual(UsernameCache(size=10, timeout=60).lookup(prefix, 5), ([("Émile", 0)], True))
+                with override_settings(DWITTER_TYPEAHEAD_CACHE_SIZE=1):
+                    username_cache.clear()
+                    self.assertEqual(typeahead(prefix, 5), [("Émile", 0)])
+
+        emile.username = "Ödön"
+        emile.save()
+        self.assertEqual(Profile.objects.get(user=emile).username_lower, "ödön")
+
+    def test_prefix_upper_bound(self):
+        """
+        The last code point has no successor, it is dropped or the range left open
+        """
+        last = chr(sys.maxunicode)
+        self.assertEqual(prefix_upper_bound("al"), "am")
+        self.assertEqual(prefix_upper_bound(f"a{last}{last}"), "b")
+        self.assertIsNone(prefix_upper_bound(last))
+
+        User.objects.create(username=f"{last}x")
+        for url in (reverse("dwitter:profile-list"), reverse("dwitter:api-profile-typeahead")):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {"q": last}).status_code, 200)
+        self.assertEqual(typeahead(last, 5), [(f"{last}x", 0)])
+
+    def test_username_cache(self):
+        """
+        Cached usernames answer without queries, most followed first, and know when they are every match
+        """
+        cache = UsernameCache(size=10, timeout=60)
+        cache.load()
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.lookup("AL", 2), ([("alfred", 3), ("alex", 2)], True))
+            self.assertEqual(cache.lookup("b", 5), ([("bob", 0)], True))
+
+        cache = UsernameCache(size=2, timeout=60)
+        cache.load()
+        self.assertEqual(cache.lookup("al", 2), ([("alfred", 3), ("alex", 2)], True))
+        self.assertEqual(cache.lookup("al", 3), ([("alfred", 3), ("alex", 2)], False))
+        self.assertEqual(cache.lookup("b", 3), ([], False))
+
+    @override_settings(DWITTER_TYPEAHEAD_CACHE_SIZE=2)
+    def test_typeahead(self):
+        """
+        Hot usernames come first, topped up from the database when they are not enough
+        """
+        with self.assertNumQueries(1):
+            self.assertEqual(typeahead("al", 2), [("alfred", 3), ("alex", 2)])
+        with self.assertNumQueries(1):
+            self.assertEqual(typeahead("al", 4), [("alfred", 3), ("alex", 2), ("al", 0), ("Alice", 1)])
+
+    def test_ProfileTypeaheadAPIView(self):
+        """
+        The JSON endpoint completes usernames and rejects malformed counts
+        """
+        url = reverse("dwitter:api-profile-typeahead")
+        data = self.client.get(url, {"q": "Al", "count": 2}).json()
+        self.assertEqual(
+            data["profiles"],
+            [
+                {"username": "alfred", "followers_count": 3, "url": reverse("dwitter:profile-detail", args=["alfred"])},
+                {"username": "alex", "followers_count": 2, "url": reverse("dwitter:profile-detail", args=["alex"])},
+            ],
+        )
+        self.assertEqual(self.client.get(url).json(), {"profiles": []})
+        self.assertEqual(self.client.get(url, {"q": "al", "count": "0"}).status_code, 400)
+
+    def test_ProfileListView_prefix(self):
+        """
+        ?q= lists the matching profiles and the page links keep it
+        """
+        url = reverse("dwitter:profile-list")
+        response = self.client.get(url, {"q": "AL"})
+        self.assertEqual(
+            [profile.user.username for profile in response.context["object_list"]], ["al", "alex", "alfred", "Alice"]
+        )
+
+        User.objects.create(username="alma")
+        User.objects.create(username="alpha")
+        response = self.client.get(url, {"q": "al"})
+        self.assertContains(response, "?page=2&q=al")
+        self.assertContains(self.client.get(url, {"q": "zed"}), "No usernames start with")
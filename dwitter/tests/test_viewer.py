@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from dwitter.cache import viewer_version_key
+from dwitter.models import Profile
+from dwitter.tests.query_budget import QueryBudgetMixin
+from dwitter.viewer import Viewer
+
+User = get_user_model()
+
+
+class ViewerTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_1.set_password("password_1")
+        self.user_1.save()
+        self.client.force_login(self.user_1)
+
+    def test_load(self):
+        """
+        A viewer holds the user, its profile id and the profiles and users it follows, itself included
+        """
+        self.user_1.profile.follows.add(self.user_2.profile)
+        viewer = Viewer.load(self.user_1)
+        self.assertTrue(viewer.is_authenticated)
+        self.assertEqual(viewer.username, "user_1")
+        self.assertEqual(viewer.profile_id, self.user_1.profile.pk)
+        self.assertEqual(viewer.following_ids, {self.user_1.profile.pk, self.user_2.profile.pk})
+        self.assertEqual(viewer.following_user_ids, {self.user_1.pk, self.user_2.pk})
+        self.assertTrue(viewer.is_following(self.user_2.profile.pk))
+
+    def test_cached(self):
+        """
+        Once cached, neither the session, the user, its profile nor its follows are read from the database
+        """
+        url = reverse("dwitter:dashboard")
+        self.client.get(url)
+        with self.assertQueryBudget(2) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.context["viewer"].user, self.user_1)
+        self.assertEqual(response.context["user"], self.user_1)
+        tables = " ".join(query["sql"] for query in context.captured_queries)
+        for table in ("django_session", "auth_user", "dwitter_profile_follows"):
+            self.assertNotIn(f'FROM "{table}"', tables)
+
+    def test_follow_invalidates(self):
+        """
+        Following and unfollowing through ProfileFollowView shows on the next page, of every session
+        """
+        other_client = self.client_class()
+        other_client.force_login(self.user_1)
+        detail_url = reverse("dwitter:profile-detail", args=[self.user_2.username])
+        follow_url = reverse("dwitter:profile-follow", args=[self.user_2.username])
+        for client in (self.client, other_client):
+            self.assertFalse(client.get(detail_url).context["is_following"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(follow_url, data={"follow": "follow"})
+        for client in (self.client, other_client):
+            self.assertTrue(client.get(detail_url).context["is_following"])
+
+        # changes made from the other side of the relation too
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_2.profile.followed_by.remove(self.user_1.profile)
+        self.assertFalse(self.client.get(detail_url).context["is_following"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_2.profile.followed_by.add(self.user_1.profile)
+        self.assertTrue(self.client.get(detail_url).context["is_following"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_2.profile.followed_by.clear()
+        self.assertFalse(self.client.get(detail_url).context["is_following"])
+
+    def test_user_changes_invalidate(self):
+        """
+        Renames show at once, password changes and deleted accounts log the cached sessions out
+        """
+        url = reverse("dwitter:dashboard")
+        self.client.get(url)
+
+        self.user_1.username = "user_1_renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.save()
+        self.assertEqual(self.client.get(url).context["viewer"].username, "user_1_renamed")
+
+        self.user_1.set_password("password_2")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.save()
+        self.assertFalse(self.client.get(url).context["viewer"].is_authenticated)
+
+        self.client.force_login(self.user_1)
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.soft_delete(self.user_1.profile)
+        self.assertFalse(self.client.get(url).context["user"].is_authenticated)
+
+    def test_invalidated_on_commit(self):
+        """
+        The cached viewers are only invalidated once the transaction changing the user commits
+        """
+        cache.set(viewer_version_key(self.user_1.pk), "version")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.profile.follows.add(self.user_2.profile)
+            self.assertEqual(cache.get(viewer_version_key(self.user_1.pk)), "version")
+        self.assertIsNone(cache.get(viewer_version_key(self.user_1.pk)))
+
+    def test_sessions_written_through(self):
+        """
+        Sessions are served from the cache but stored in the database, so they survive the cache being flushed
+        """
+        url = reverse("dwitter:dashboard")
+        self.assertTrue(Session.objects.filter(pk=self.client.session.session_key).exists())
+        cache.clear()
+        self.assertEqual(self.client.get(url).context["user"], self.user_1)
+
+    @override_settings(DWITTER_VIEWER_CACHE=None, SESSION_ENGINE="django.contrib.sessions.backends.db")
+    def test_not_cached(self):
+        """
+        Without a shared cache the viewer is loaded on every request and nothing is cached
+        """
+        url = reverse("dwitter:dashboard")
+        self.client.force_login(self.user_1)
+        self.client.get(url)
+        self.user_1.profile.follows.add(self.user_2.profile)
+        response = self.client.get(url)
+        self.assertEqual(response.context["viewer"].following_user_ids, {self.user_1.pk, self.user_2.pk})
+        self.assertIsNone(cache.get(viewer_version_key(self.user_1.pk)))
@@ -1,14 +1,30 @@
+import tempfile
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
-
-from dwitter.models import Dweet
+from django.utils import timezone
+
+from dwitter.cache import (
+    dweet_card_key,
+    get_dweet_card_cache,
+    get_timeline_cache,
+    get_timeline_window,
+    get_trending_cache,
+)
+from dwitter.metrics import registry
+from dwitter.models import Dweet, TimelineEntry
+from dwitter.pagination import MergedCursorPaginator
+from dwitter.tests.query_budget import QueryBudgetMixin
+from dwitter.trending import WINDOWS, get_trending
 
 User = get_user_model()
 
 
 class DashboardViewTests(TestCase):
     def setUp(self):
+        get_timeline_cache().clear()
         self.user_1 = User.objects.create(username="user_1")
         self.user_1_dweet = Dweet.objects.create(user=self.user_1, body="this is a dweet by user_1")
         self.user_2 = User.objects.create(username="user_2")
@@ -60,7 +76,8 @@ class DashboardViewTests(TestCase):
         self.assertNotIn(self.user_2_dweet.body, content)
 
         # have user_1 follow user_2
-        self.user_1.profile.follows.add(self.user_2.profile)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.profile.follows.add(self.user_2.profile)
 
         # dashboard should show user_2 dweets
         response = self.client.get(url)
@@ -207,6 +224,27 @@ class ProfileDetailViewTests(TestCase):
         self.assertNotIn(self.user_2.username, content)
         self.assertNotIn(self.user_2_dweet.body, content)
 
+    def test_ProfileDetailView_follow_state(self):
+        """
+        The follow button should reflect whether the logged in user already follows the profile
+        """
+        url = reverse("dwitter:profile-detail", args=[self.user_2.username])
+        unfollow_button = '<button class="button is-danger" name="follow" value="unfollow">'
+        follow_button = '<button class="button is-success" name="follow" value="follow">'
+
+        self.client.force_login(self.user_1)
+        response = self.client.get(url)
+        self.assertFalse(response.context["is_following"])
+        self.assertContains(response, follow_button)
+        self.assertNotContains(response, unfollow_button)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.profile.follows.add(self.user_2.profile)
+        response = self.client.get(url)
+        self.assertTrue(response.context["is_following"])
+        self.assertContains(response, unfollow_button)
+        self.assertNotContains(response, follow_button)
+
 
 class ProfileFollowViewTests(TestCase):
     def setUp(self):
@@ -380,3 +418,483 @@ class ProfileListViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(self.user_1.username, content)
         self.assertIn(self.user_2.username, content)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        get_timeline_cache().clear()
+        self.user_1 = User.objects.create(username="user_1")
+        self.dweets = [Dweet.objects.create(user=self.user_1, body=f"dweet number {i:02}") for i in range(12)]
+
+    def walk(self, url):
+        """
+        Follow the "next" cursors from the first page and return the pages seen
+        """
+        pages = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page_obj = response.context["page_obj"]
+            pages.append([dweet.pk for dweet in page_obj.object_list])
+            if not page_obj.has_next():
+                return pages
+            response = self.client.get(url, {"cursor": page_obj.next_cursor})
+
+    def test_cursor_pagination_unauthenticated(self):
+        """
+        Walking the firehose with cursors should visit every dweet exactly once, newest first
+        """
+        pages = self.walk(reverse("dwitter:dashboard"))
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), [dweet.pk for dweet in reversed(self.dweets)])
+
+    def test_cursor_pagination_authenticated(self):
+        """
+        The logged in timeline and profile pages paginate the same way
+        """
+        self.client.force_login(self.user_1)
+        expected = [dweet.pk for dweet in reversed(self.dweets)]
+        self.assertEqual(sum(self.walk(reverse("dwitter:dashboard")), []), expected)
+        self.assertEqual(sum(self.walk(reverse("dwitter:profile-detail", args=[self.user_1.username])), []), expected)
+
+    def test_cursor_pagination_previous(self):
+        """
+        The previous cursor on the second page should lead back to the first page
+        """
+        url = reverse("dwitter:dashboard")
+        first_page = self.client.get(url).context["page_obj"]
+        self.assertFalse(first_page.has_previous())
+
+        second_page = self.client.get(url, {"cursor": first_page.next_cursor}).context["page_obj"]
+        response = self.client.get(url, {"cursor": second_page.previous_cursor})
+        self.assertContains(response, f'?cursor={first_page.next_cursor}"')
+        self.assertEqual(list(response.context["page_obj"]), list(first_page))
+        self.assertFalse(response.context["page_obj"].has_previous())
+
+    def test_cursor_pagination_legacy_page_number(self):
+        """
+        Old ?page=N links still work and link onwards with cursors, bad input is a 404
+        """
+        url = reverse("dwitter:dashboard")
+        response = self.client.get(url, {"page": 2})
+        self.assertEqual(response.status_code, 200)
+        page_obj = response.context["page_obj"]
+        self.assertEqual([dweet.pk for dweet in page_obj], [dweet.pk for dweet in reversed(self.dweets)][5:10])
+        self.assertTrue(page_obj.has_previous())
+        self.assertTrue(page_obj.has_next())
+
+        self.assertEqual(self.client.get(url, {"page": 10}).status_code, 404)
+        self.assertEqual(self.client.get(url, {"page": "tacos"}).status_code, 404)
+        self.assertEqual(self.client.get(url, {"cursor": "tacos"}).status_code, 404)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        # the trending hashtags are recomputed once a minute, page views read them from the cache
+        get_trending_cache().clear()
+        for window in WINDOWS:
+            get_trending(window)
+
+    def add_users(self, count):
+        """
+        Add users following and followed by user_1, each with a dweet
+        """
+        for i in range(count):
+            user = User.objects.create(username=f"user_{User.objects.count() + 1}_{i}")
+            self.user_1.profile.follows.add(user.profile)
+            user.profile.follows.add(self.user_1.profile)
+            Dweet.objects.create(user=user, body=f"this is a dweet by {user.username}")
+
+    def assertViewBudgets(self, budgets):
+        """
+        Every listing should stay within budget for a single row and for a full page of rows
+        """
+        for count in (1, 10):
+            self.add_users(count)
+            for url, budget in budgets.items():
+                with self.subTest(url=url, rows=count), self.assertQueryBudget(budget):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_query_budget_unauthenticated(self):
+        """
+        Anonymous listings run a fixed number of queries no matter how many rows are shown
+        """
+        self.assertViewBudgets(
+            {
+                reverse("dwitter:dashboard"): 1,
+                reverse("dwitter:profile-detail", args=[self.user_1.username]): 4,
+                reverse("dwitter:profile-list"): 2,
+            }
+        )
+
+    def test_query_budget_authenticated(self):
+        """
+        Logged in listings only add follow suggestions on top, the session and the viewer come from the cache
+
+        The dashboard comes first after the follows changed, so it reloads the user, its profile and its follows
+        """
+        self.client.force_login(self.user_1)
+        self.assertViewBudgets(
+            {
+                reverse("dwitter:dashboard"): 5,
+                reverse("dwitter:profile-detail", args=[self.user_1.username]): 5,
+                reverse("dwitter:profile-detail", args=[self.user_2.username]): 5,
+                reverse("dwitter:profile-list"): 3,
+            }
+        )
+
+    def test_query_budget_exceeded(self):
+        """
+        Going over budget fails the test and lists the queries that ran
+        """
+        with self.assertRaisesMessage(AssertionError, "2 queries executed, budget is 1"):
+            with self.assertQueryBudget(1):
+                list(User.objects.all())
+                list(Dweet.objects.all())
+
+
+class DweetCardCacheTests(TestCase):
+    def setUp(self):
+        get_dweet_card_cache().clear()
+        self.user_1 = User.objects.create(username="user_1")
+        self.dweet = Dweet.objects.create(user=self.user_1, body="this is a dweet by user_1")
+
+    def test_dweet_card_cache(self):
+        """
+        Cards are rendered once, then served from the cache until the dweet or its author changes
+        """
+        url = reverse("dwitter:dashboard")
+        cache = get_dweet_card_cache()
+
+        response = self.client.get(url)
+        self.assertContains(response, self.dweet.body)
+        self.assertIn(self.dweet.body, cache.get(dweet_card_key(self.dweet)))
+
+        # a cached card is used as is
+        cache.set(dweet_card_key(self.dweet), "served from the cache")
+        self.assertContains(self.client.get(url), "served from the cache")
+
+        # editing the dweet invalidates its card
+        self.dweet.body = "this is an edited dweet by user_1"
+        self.dweet.save()
+        self.assertContains(self.client.get(url), self.dweet.body)
+
+        # so does renaming its author
+        cache.set(dweet_card_key(self.dweet), "served from the cache")
+        self.user_1.username = "user_1_renamed"
+        self.user_1.save()
+        response = self.client.get(url)
+        self.assertNotContains(response, "served from the cache")
+        self.assertContains(response, "@user_1_renamed")
+
+
+class TimelineCacheTests(TestCase):
+    def setUp(self):
+        get_timeline_cache().clear()
+        registry.reset()
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_1_dweet = Dweet.objects.create(user=self.user_1, body="this is a dweet by user_1")
+        self.user_2_dweet = Dweet.objects.create(user=self.user_2, body="this is a dweet by user_2")
+        self.url = reverse("dwitter:dashboard")
+        self.client.force_login(self.user_1)
+
+    def assertCacheCounters(self, hits, misses):
+        counters = registry.counters()
+        self.assertEqual(
+            (counters.get("timeline_cache_hits", 0), counters.get("timeline_cache_misses", 0)), (hits, misses)
+        )
+
+    def assertTimelineCached(self):
+        """
+        A reload of the dashboard should only be served from the cache when nothing changed
+        """
+        get_timeline_cache().clear()
+        registry.reset()
+
+        self.assertContains(self.client.get(self.url), self.user_1_dweet.body)
+        self.assertContains(self.client.get(self.url), self.user_1_dweet.body)
+        self.assertCacheCounters(hits=1, misses=1)
+
+        # following someone, them dweeting and dweeting yourself all bump the version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.profile.follows.add(self.user_2.profile)
+        self.assertContains(self.client.get(self.url), self.user_2_dweet.body)
+        self.assertCacheCounters(hits=1, misses=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_dweet = Dweet.objects.create(user=self.user_2, body="this is a new dweet by user_2")
+        self.assertContains(self.client.get(self.url), new_dweet.body)
+        self.assertCacheCounters(hits=1, misses=3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("dwitter:dweet-create"), data={"body": "this is a new dweet by user_1"})
+        self.assertContains(self.client.get(self.url), "this is a new dweet by user_1")
+        self.assertCacheCounters(hits=1, misses=4)
+
+        # unfollowing through the view as well
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("dwitter:profile-follow", args=[self.user_2.username]), data={"follow": "unfollow"}
+            )
+        self.assertNotContains(self.client.get(self.url), self.user_2_dweet.body)
+        self.assertCacheCounters(hits=1, misses=5)
+
+    def test_timeline_version_bumped_on_commit(self):
+        """
+        A fanned out Dweet or a follow only bumps the timeline versions once its transaction commits
+        """
+        version, _ = get_timeline_window(self.user_1.profile.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user_1.profile.follows.add(self.user_2.profile)
+            self.assertEqual(get_timeline_window(self.user_1.profile.pk)[0], version)
+        self.assertNotEqual(get_timeline_window(self.user_1.profile.pk)[0], version)
+
+        version, _ = get_timeline_window(self.user_1.profile.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Dweet.objects.create(user=self.user_2, body="this is a new dweet by user_2")
+            self.assertEqual(get_timeline_window(self.user_1.profile.pk)[0], version)
+        self.assertNotEqual(get_timeline_window(self.user_1.profile.pk)[0], version)
+
+    def test_timeline_cache_locmem(self):
+        self.assertTimelineCached()
+
+    def test_timeline_cache_filebased(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches_setting = {
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "timelines": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+            }
+            with self.settings(CACHES=caches_setting, DWITTER_TIMELINE_CACHE="timelines"):
+                self.assertTimelineCached()
+
+    def test_timeline_cache_pages(self):
+        """
+        Pages inside the cached window are served from it, deeper pages fall back to the database
+        """
+        for i in range(20):
+            Dweet.objects.create(user=self.user_1, body=f"dweet number {i:02}")
+        expected = list(Dweet.objects.filter(user=self.user_1).order_by("-created_at").values_list("pk", flat=True))
+
+        # walk forwards, then back from the last page
+        pages, response = [], self.client.get(self.url)
+        while True:
+            pages.append(response.context["page_obj"])
+            if not pages[-1].has_next():
+                break
+            response = self.client.get(self.url, {"cursor": pages[-1].next_cursor})
+        self.assertEqual([dweet.pk for page in pages for dweet in page], expected)
+        self.assertCacheCounters(hits=4, misses=1)
+
+        previous = self.client.get(self.url, {"cursor": pages[2].previous_cursor}).context["page_obj"]
+        self.assertEqual(list(previous), list(pages[1]))
+        self.assertEqual(previous.next_cursor, pages[1].next_cursor)
+
+
+class DweetListAPITests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_1.profile.follows.add(self.user_2.profile)
+        self.dweets = [Dweet.objects.create(user=self.user_2, body=f"dweet {i}") for i in range(5)]
+        self.timeline_url = reverse("dwitter:api-timeline")
+        self.profile_url = reverse("dwitter:api-profile-dweets", args=[self.user_2.username])
+
+    def test_TimelineAPIView_unauthenticated(self):
+        """
+        Anonymous users have no timeline
+        """
+        self.assertEqual(self.client.get(self.timeline_url).status_code, 403)
+
+    def test_TimelineAPIView_since_max_id(self):
+        """
+        Dweets come newest first, since_id polls for newer dweets and max_id pages back
+        """
+        self.client.force_login(self.user_1)
+        ids = [dweet.pk for dweet in reversed(self.dweets)]
+
+        data = self.client.get(self.timeline_url, {"count": 2}).json()
+        self.assertEqual([dweet["id"] for dweet in data["dweets"]], ids[:2])
+        self.assertEqual(data["dweets"][0]["username"], self.user_2.username)
+        self.assertEqual((data["newest_id"], data["oldest_id"]), (ids[0], ids[1]))
+
+        data = self.client.get(self.timeline_url, {"max_id": data["oldest_id"], "count": 2}).json()
+        self.assertEqual([dweet["id"] for dweet in data["dweets"]], ids[2:4])
+
+        data = self.client.get(self.timeline_url, {"since_id": ids[0]}).json()
+        self.assertEqual(data["dweets"], [])
+        self.assertEqual(data["newest_id"], ids[0])
+
+        dweet = Dweet.objects.create(user=self.user_2, body="new dweet")
+        data = self.client.get(self.timeline_url, {"since_id": ids[0]}).json()
+        self.assertEqual([dweet["id"] for dweet in data["dweets"]], [dweet.pk])
+
+    def test_ids_out_of_order(self):
+        """
+        Polls and pages follow the (created_at, id) order of the list even when ids do not, by id or by cursor
+        """
+        loaded = Dweet.objects.create(user=self.user_2, body="loaded", created_at=timezone.now() - timedelta(days=1))
+        ids = [dweet.pk for dweet in reversed(self.dweets)] + [loaded.pk]
+        self.client.force_login(self.user_1)
+        for url in (self.timeline_url, self.profile_url):
+            with self.subTest(url=url):
+                first = self.client.get(url, {"count": 3}).json()
+                self.assertEqual([dweet["id"] for dweet in first["dweets"]], ids[:3])
+                for params in ({"max_id": first["oldest_id"]}, {"max": first["oldest_cursor"]}):
+                    data = self.client.get(url, params).json()
+                    self.assertEqual([dweet["id"] for dweet in data["dweets"]], ids[3:])
+                for params in ({"since_id": first["newest_id"]}, {"since": first["newest_cursor"]}):
+                    data = self.client.get(url, params).json()
+                    self.assertEqual(data["dweets"], [])
+                    self.assertEqual(
+                        (data["newest_id"], data["newest_cursor"]), (params.get("since_id"), params.get("since"))
+                    )
+
+        # a Dweet that is gone falls back to comparing ids
+        Dweet.objects.filter(pk=ids[0]).delete()
+        data = self.client.get(self.profile_url, {"since_id": ids[0]}).json()
+        self.assertEqual([dweet["id"] for dweet in data["dweets"]], [loaded.pk])
+
+    def test_TimelineAPIView_bad_parameters(self):
+        """
+        Malformed ids and counts are rejected
+        """
+        self.client.force_login(self.user_1)
+        for params in ({"since_id": "abc"}, {"max_id": "-1"}, {"count": "0"}, {"since": "abc"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.timeline_url, params).status_code, 400)
+
+    def test_ProfileDweetsAPIView_etag(self):
+        """
+        Polling with the ETag of the last response costs one query and no body until someone dweets
+        """
+        response = self.client.get(self.profile_url)
+        etag = response["ETag"]
+        self.assertEqual(len(response.json()["dweets"]), 5)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with self.assertQueryBudget(1):
+            response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        Dweet.objects.create(user=self.user_2, body="new dweet")
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        # a different list never shares an ETag
+        other_url = reverse("dwitter:api-profile-dweets", args=[self.user_1.username])
+        self.assertEqual(self.client.get(other_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_ProfileDweetsAPIView_unknown_user(self):
+        """
+        Unknown users are a 404, users without dweets an empty list
+        """
+        url = reverse("dwitter:api-profile-dweets", args=["nobody"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        url = reverse("dwitter:api-profile-dweets", args=[self.user_1.username])
+        self.assertEqual(self.client.get(url).json()["dweets"], [])
+
+    def test_TimelineAPIView_etag_follows(self):
+        """
+        Following or unfollowing an author of older dweets and deleting an older dweet change the ETag
+        """
+        user_3 = User.objects.create(username="user_3")
+        old_dweet = Dweet.objects.create(user=user_3, body="older dweet")
+        Dweet.objects.filter(pk=old_dweet.pk).update(created_at=timezone.now() - timedelta(days=1))
+        self.client.force_login(self.user_1)
+
+        etags = [self.client.get(self.timeline_url)["ETag"]]
+        self.user_1.profile.follows.add(user_3.profile)
+        response = self.client.get(self.timeline_url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["dweets"][-1]["body"], "older dweet")
+        etags.append(response["ETag"])
+
+        self.user_1.profile.follows.remove(user_3.profile)
+        response = self.client.get(self.timeline_url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], etags[0])
+
+        self.dweets[0].delete()
+        response = self.client.get(self.timeline_url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["dweets"]), 4)
+
+        # the page asked for is part of the ETag
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(self.timeline_url, {"count": 2}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_TimelineAPIView_etag_per_user(self):
+        """
+        Users share the timeline url, but not its ETag
+        """
+        self.client.force_login(self.user_1)
+        etag = self.client.get(self.timeline_url)["ETag"]
+        self.assertEqual(self.client.get(self.timeline_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.force_login(self.user_2)
+        self.assertEqual(self.client.get(self.timeline_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(DWITTER_TIMELINE_ENGINE="pull")
+class PullTimelineTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.user_1 = User.objects.create(username="user_1")
+        self.user_2 = User.objects.create(username="user_2")
+        self.user_3 = User.objects.create(username="user_3")
+        self.user_1.profile.follows.add(self.user_2.profile)
+        for i in range(6):
+            for user in (self.user_1, self.user_2, self.user_3):
+                Dweet.objects.create(user=user, body=f"dweet {i} by {user.username}")
+        # ties on created_at are broken by id
+        Dweet.objects.filter(body__startswith="dweet 3").update(created_at=Dweet.objects.first().created_at)
+        self.url = reverse("dwitter:dashboard")
+        self.expected = list(
+            Dweet.objects.filter(user__in=[self.user_1, self.user_2])
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+
+    def test_pull_timeline_skips_fan_out(self):
+        """
+        Nothing is materialized on write with the pull engine
+        """
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_pull_timeline_pages(self):
+        """
+        Walking the merged timeline visits every followed dweet once, newest first, in both directions
+        """
+        self.client.force_login(self.user_1)
+        pages = CursorPaginationTests.walk(self, self.url)
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sum(pages, []), self.expected)
+
+        first_page = self.client.get(self.url).context["page_obj"]
+        second_page = self.client.get(self.url, {"cursor": first_page.next_cursor}).context["page_obj"]
+        page_obj = self.client.get(self.url, {"cursor": second_page.previous_cursor}).context["page_obj"]
+        self.assertEqual(list(page_obj), list(first_page))
+        self.assertFalse(page_obj.has_previous())
+
+        page_obj = self.client.get(self.url, {"page": 2}).context["page_obj"]
+        self.assertEqual([dweet.pk for dweet in page_obj], self.expected[5:10])
+
+        data = self.client.get(reverse("dwitter:api-timeline"), {"count": 3}).json()
+        self.assertEqual([dweet["id"] for dweet in data["dweets"]], self.expected[:3])
+
+    def test_pull_timeline_bounded_reads(self):
+        """
+        Each followed user costs one short index range, however many dweets they have
+        """
+        paginator = MergedCursorPaginator(
+            Dweet.objects.all(), 2, partition_field="user", partitions=[self.user_1.pk, self.user_2.pk]
+        )
+        with self.assertQueryBudget(3) as context:
+            page = paginator.page()
+        self.assertEqual([dweet.pk for dweet in page], self.expected[:2])
+        self.assertTrue(all("LIMIT 3" in query["sql"] for query in context.captured_queries[:2]))
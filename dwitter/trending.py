@@ -0,0 +1,134 @@
+"""Trending hashtags of the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/ref/models/expressions/#f-expressions
+
+Counting the tags of recent Dweets with a GROUP BY on every page view would read every Dweet of the last day, so each
+Dweet instead adds one to a TagCount row per tag in the bucket of the minute it was written.  A window is the sum of
+its buckets, at most a few thousand small rows, and the top tags of every window are cached for
+DWITTER_TRENDING_TIMEOUT seconds so page views only ever read the cache.  compact_trending merges the minute buckets
+that fell out of the shortest window into hour buckets and drops the ones older than the longest window.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .cache import get_trending_cache, trending_key
+from .models import TagCount
+
+# name, length of the windows, shortest first.  Only buckets older than the shortest window are merged into hours
+WINDOWS: Dict[str, timedelta] = {"1h": timedelta(hours=1), "24h": timedelta(hours=24)}
+
+
+def bucket_of(moment: datetime) -> datetime:
+    """Start of the minute bucket a moment falls in.
+
+    Args:
+        moment (datetime): aware datetime
+
+    Returns
+        datetime: moment truncated to the minute
+
+    """
+    return moment.replace(second=0, microsecond=0)
+
+
+def record_tags(tags: Iterable[str], moment: Optional[datetime] = None) -> None:
+    """Count a Dweet in the minute bucket of each of its tags.
+
+    The rows of the bucket are created if missing, then incremented with a single UPDATE ... SET count = count + 1,
+    so concurrent writers never lose a count.
+
+    Args:
+        tags (Iterable[str]): distinct tags of the Dweet, see dwitter.entities.extract_tags
+        moment (Optional[datetime]): when the Dweet was written, now by default
+
+    """
+    tags = list(tags)
+    if not tags:
+        return
+
+    bucket: datetime = bucket_of(moment or timezone.now())
+    TagCount.objects.bulk_create([TagCount(tag=tag, bucket=bucket) for tag in tags], ignore_conflicts=True)
+    TagCount.objects.filter(bucket=bucket, tag__in=tags).update(count=F("count") + 1)
+
+
+def compute_trending(window: str, size: int) -> List[Tuple[str, int]]:
+    """Sum the buckets of a window.
+
+    Args:
+        window (str): name of the window, see WINDOWS
+        size (int): number of tags to return
+
+    Returns
+        List[Tuple[str, int]]: (tag, number of Dweets) of the most used tags, most used first
+
+    """
+    since: datetime = timezone.now() - WINDOWS[window]
+    return list(
+        TagCount.objects.filter(bucket__gte=since)
+        .values("tag")
+        .annotate(total=Sum("count"))
+        .order_by("-total", "tag")
+        .values_list("tag", "total")[:size]
+    )
+
+
+def get_trending(window: str) -> List[Tuple[str, int]]:
+    """Precomputed top tags of a window, recomputed at most once every DWITTER_TRENDING_TIMEOUT seconds.
+
+    Args:
+        window (str): name of the window, see WINDOWS
+
+    Returns
+        List[Tuple[str, int]]: (tag, number of Dweets) of the DWITTER_TRENDING_SIZE most used tags, most used first
+
+    """
+    cache = get_trending_cache()
+    trending: Optional[List[Tuple[str, int]]] = cache.get(trending_key(window))
+    if trending is None:
+        trending = compute_trending(window, settings.DWITTER_TRENDING_SIZE)
+        cache.set(trending_key(window), trending, timeout=settings.DWITTER_TRENDING_TIMEOUT)
+    return trending
+
+
+def compact_buckets(now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Merge the minute buckets no window reads at minute precision into hour buckets, drop the expired ones.
+
+    A minute bucket is merged once its whole hour is older than the shortest window, so the shortest window only
+    ever reads minute buckets, the longer ones see at most an hour of imprecision at their far end.
+
+    Args:
+        now (Optional[datetime]): current time, for tests
+
+    Returns
+        Tuple[int, int]: number of buckets deleted as expired, number of minute buckets merged into hours
+
+    """
+    now = now or timezone.now()
+    windows: List[timedelta] = sorted(WINDOWS.values())
+    expired_before: datetime = now - windows[-1]
+    merge_before: datetime = (now - windows[0]).replace(minute=0, second=0, microsecond=0)
+
+    with transaction.atomic():
+        expired, _ = TagCount.objects.filter(bucket__lt=expired_before).delete()
+
+        # hour buckets from earlier runs are read back too, so the merge can simply replace every row it read.
+        # Dweets are only ever counted in the current minute, nothing writes to these buckets meanwhile
+        minutes = TagCount.objects.filter(bucket__lt=merge_before)
+        hours: Dict[Tuple[str, datetime], int] = {}
+        merged: int = 0
+        for tag, bucket, count in minutes.values_list("tag", "bucket", "count"):
+            hour: datetime = bucket.replace(minute=0)
+            hours[(tag, hour)] = hours.get((tag, hour), 0) + count
+            merged += bucket != hour
+        if merged:
+            minutes.delete()
+            TagCount.objects.bulk_create(
+                [TagCount(tag=tag, bucket=hour, count=count) for (tag, hour), count in hours.items()]
+            )
+    return expired, merged
@@ -5,7 +5,23 @@ https://docs.djangoproject.com/en/3.2/topics/http/urls/
 """
 from django.urls import path
 
-from .views import DashboardView, DweetCreateView, ProfileDetailView, ProfileFollowView, ProfileListView
+from .views import (
+    AccountDeleteView,
+    DashboardView,
+    DweetCreateView,
+    MentionListView,
+    MetricsView,
+    ProfileDetailView,
+    ProfileDweetsAPIView,
+    ProfileFollowView,
+    ProfileListView,
+    ProfileTypeaheadAPIView,
+    SearchAPIView,
+    SearchView,
+    TagView,
+    TimelineAPIView,
+    TimelineStreamView,
+)
 
 app_name = "dwitter"
 
@@ -15,4 +31,15 @@ urlpatterns: list = [
     path("profiles/<str:username>/", ProfileDetailView.as_view(), name="profile-detail"),
     path("profiles/<str:username>/follow/", ProfileFollowView.as_view(), name="profile-follow"),
     path("profiles/", ProfileListView.as_view(), name="profile-list"),
+    path("account/delete/", AccountDeleteView.as_view(), name="account-delete"),
+    path("search/", SearchView.as_view(), name="search"),
+    path("tags/<str:tag>/", TagView.as_view(), name="tag-detail"),
+    path("mentions/", MentionListView.as_view(), name="mention-list"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    # served by dwitter.streaming.TimelineStreamApplication under ASGI, see social/asgi.py
+    path("stream/timeline/", TimelineStreamView.as_view(), name="timeline-stream"),
+    path("api/timeline/", TimelineAPIView.as_view(), name="api-timeline"),
+    path("api/profiles/", ProfileTypeaheadAPIView.as_view(), name="api-profile-typeahead"),
+    path("api/profiles/<str:username>/dweets/", ProfileDweetsAPIView.as_view(), name="api-profile-dweets"),
+    path("api/search/", SearchAPIView.as_view(), name="api-search"),
 ]
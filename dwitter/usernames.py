@@ -0,0 +1,170 @@
+"""Username prefix search of the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/ref/models/indexes/
+
+Prefixes are lowercased by Python and matched against Profile.username_lower, the username lowercased the same way
+and indexed, so a prefix is a single index range read.  The lower() of SQLite only knows ASCII, which would miss
+"Émile" for "ém".  SQLite only uses an index for LIKE when it is case insensitive, so the prefix is turned into a
+[prefix, next prefix) range there; PostgreSQL indexes with varchar_pattern_ops and reads LIKE 'prefix%' directly,
+which stays correct whatever the database collation.
+
+Typeahead requests arrive at keystroke rate, so each process also keeps the most followed usernames in a sorted
+array answering prefixes with a binary search.  The database is only read when the hot usernames alone cannot fill
+the response.  The array is reloaded every DWITTER_TYPEAHEAD_CACHE_TIMEOUT seconds, new and renamed users may take
+that long to show up in it.
+"""
+import sys
+import threading
+import time
+from bisect import bisect_left
+from heapq import nlargest
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import QuerySet
+
+from .models import Profile
+
+USERNAME_INDEX: str = "profile_username_lower"
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with prefix.
+
+    Args:
+        prefix (str): non-empty prefix
+
+    Returns
+        Optional[str]: prefix with its last character incremented, trailing U+10FFFF dropped first as they cannot be,
+        None when no string is greater, e.g. for a prefix of only U+10FFFF
+
+    """
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def filter_username_prefix(queryset: QuerySet, prefix: str, field: str = "username_lower") -> QuerySet:
+    """Restrict a QuerySet to the usernames starting with a prefix, case insensitively, on the username_lower index.
+
+    Args:
+        queryset (QuerySet): QuerySet of Profiles or of a model related to them
+        prefix (str): prefix, matched case insensitively
+        field (str): path to Profile.username_lower, e.g. profile__username_lower for Users
+
+    Returns
+        QuerySet: QuerySet ordered on the lowercased username
+
+    """
+    prefix = prefix.lower()
+    queryset = queryset.order_by(field)
+    if connections[queryset.db].vendor == "postgresql":
+        return queryset.filter(**{f"{field}__startswith": prefix})
+    upper_bound: Optional[str] = prefix_upper_bound(prefix)
+    if upper_bound is None:
+        return queryset.filter(**{f"{field}__gte": prefix})
+    return queryset.filter(**{f"{field}__gte": prefix, f"{field}__lt": upper_bound})
+
+
+class UsernameCache:
+    """Sorted array of the most followed usernames, shared by the threads of a process.
+
+    Args:
+        size (Optional[int]): number of usernames kept, DWITTER_TYPEAHEAD_CACHE_SIZE by default
+        timeout (Optional[int]): seconds before reloading, DWITTER_TYPEAHEAD_CACHE_TIMEOUT by default
+
+    """
+
+    def __init__(self, size: Optional[int] = None, timeout: Optional[int] = None) -> None:
+        """Create an empty cache, loaded on first use."""
+        self.size: Optional[int] = size
+        self.timeout: Optional[int] = timeout
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self._keys: List[str] = []
+        self._entries: List[Tuple[str, int]] = []
+        self._complete: bool = False
+
+    def load(self) -> None:
+        """Read the most followed usernames, sorted by lowercased username."""
+        size: int = self.size or settings.DWITTER_TYPEAHEAD_CACHE_SIZE
+        rows: List[Tuple[str, int]] = list(
+            Profile.objects.filter(user__is_active=True)
+            .order_by("-followers_count", "id")
+            .values_list("user__username", "followers_count")[: size + 1]
+        )
+        complete: bool = len(rows) <= size
+        rows = sorted(rows[:size], key=lambda row: row[0].lower())
+        with self._lock:
+            self._keys = [username.lower() for username, _ in rows]
+            self._entries = rows
+            self._complete = complete
+            self._loaded_at = time.monotonic()
+
+    def clear(self) -> None:
+        """Forget the usernames, the next lookup reloads them."""
+        with self._lock:
+            self._loaded_at = None
+
+    def lookup(self, prefix: str, count: int) -> Tuple[List[Tuple[str, int]], bool]:
+        """Most followed cached usernames starting with a prefix.
+
+        Args:
+            prefix (str): non-empty prefix, matched case insensitively
+            count (int): maximum number of usernames
+
+        Returns
+            Tuple[List[Tuple[str, int]], bool]: (username, followers count) most followed first, and whether they
+            are every match there is (all usernames fit in the cache, or it holds at least count matches)
+
+        """
+        timeout: int = self.timeout if self.timeout is not None else settings.DWITTER_TYPEAHEAD_CACHE_TIMEOUT
+        with self._lock:
+            stale: bool = self._loaded_at is None or time.monotonic() - self._loaded_at > timeout
+        if stale:
+            self.load()
+
+        prefix = prefix.lower()
+        with self._lock:
+            start: int = bisect_left(self._keys, prefix)
+            upper_bound: Optional[str] = prefix_upper_bound(prefix)
+            stop: int = len(self._keys) if upper_bound is None else bisect_left(self._keys, upper_bound, lo=start)
+            matches: List[Tuple[str, int]] = self._entries[start:stop]
+            complete: bool = self._complete
+        best: List[Tuple[str, int]] = nlargest(count, matches, key=lambda entry: entry[1])
+        return best, complete or len(matches) >= count
+
+
+def typeahead(prefix: str, count: int, using: str = DEFAULT_DB_ALIAS) -> List[Tuple[str, int]]:
+    """Usernames starting with a prefix for typeahead, most followed first.
+
+    Answered from username_cache when it can, otherwise topped up with the alphabetically first matches read from
+    the username_lower index.
+
+    Args:
+        prefix (str): non-empty prefix, matched case insensitively
+        count (int): maximum number of usernames
+        using (str): database alias
+
+    Returns
+        List[Tuple[str, int]]: (username, followers count)
+
+    """
+    matches, complete = username_cache.lookup(prefix, count)
+    if complete:
+        return matches
+
+    seen = {username for username, _ in matches}
+    rows = filter_username_prefix(Profile.objects.using(using).filter(user__is_active=True), prefix).values_list(
+        "user__username", "followers_count"
+    )
+    for username, followers_count in rows[: count + len(seen)]:
+        if username not in seen and len(matches) < count:
+            matches.append((username, followers_count))
+    return matches
+
+
+username_cache = UsernameCache()
@@ -0,0 +1,192 @@
+"""Per-request view of the logged in user for the "dwitter" application.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/topics/auth/default/#how-to-log-a-user-in
+
+Every authenticated page needs the User, the id of its Profile and, for the timeline, the follow buttons and the
+suggestions, the Profiles it follows.  Read lazily that is a query each, on top of the session.  A Viewer bundles
+them and is cached per session, so with the cached_db session engine a page starts without touching the database.
+Both need a cache shared by every process, see DWITTER_VIEWER_CACHE:
+
+    request.viewer  set by dwitter.middleware.ViewerMiddleware, also the "viewer" of the templates
+    request.user    the User of the viewer, loaded by django.contrib.auth on a miss
+
+Cached viewers carry the version of their user's viewers, which every change to the User or to the Profiles it
+follows invalidates for all its sessions, see dwitter.cache.invalidate_viewers.
+"""
+import uuid
+from typing import Any, FrozenSet, Optional
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import BaseCache
+from django.http import HttpRequest
+from django.utils.crypto import constant_time_compare
+
+from .cache import get_viewer_cache, viewer_key, viewer_version_key
+from .metrics import registry
+from .models import Profile
+
+
+class Viewer:
+    """The logged in user, the id of its Profile and whom it follows, or an anonymous user."""
+
+    def __init__(
+        self,
+        user: Any,
+        profile_id: Optional[int] = None,
+        following_ids: FrozenSet[int] = frozenset(),
+        following_user_ids: FrozenSet[int] = frozenset(),
+    ) -> None:
+        """Store the user and its follows.
+
+        Args:
+            user (Any): User, or AnonymousUser
+            profile_id (Optional[int]): primary key of the user's Profile, None for anonymous users
+            following_ids (FrozenSet[int]): primary keys of the Profiles followed, the user's own included
+            following_user_ids (FrozenSet[int]): primary keys of the Users of those Profiles
+
+        """
+        self.user: Any = user
+        self.profile_id: Optional[int] = profile_id
+        self.following_ids: FrozenSet[int] = following_ids
+        self.following_user_ids: FrozenSet[int] = following_user_ids
+
+    @classmethod
+    def load(cls, user: Any) -> "Viewer":
+        """Read the Profile and the follows of a user, in two queries.
+
+        Args:
+            user (Any): User, or AnonymousUser
+
+        Returns
+            Viewer: viewer of the user
+
+        """
+        if not user.is_authenticated:
+            return cls(user)
+
+        profile_id: int = Profile.objects.filter(user=user).values_list("pk", flat=True).get()
+        follows: list = list(
+            Profile.follows.through.objects.filter(from_profile_id=profile_id).values_list(
+                "to_profile_id", "to_profile__user_id"
+            )
+        )
+        return cls(
+            user,
+            profile_id,
+            frozenset(following_id for following_id, _ in follows),
+            frozenset(user_id for _, user_id in follows),
+        )
+
+    @property
+    def is_authenticated(self) -> bool:
+        """Whether the user is logged in.
+
+        Returns
+            bool: False for anonymous users
+
+        """
+        return self.user.is_authenticated
+
+    @property
+    def username(self) -> str:
+        """Username of the user.
+
+        Returns
+            str: username, empty for anonymous users
+
+        """
+        return self.user.get_username()
+
+    def is_following(self, profile_id: int) -> bool:
+        """Whether the user follows a Profile, without a query.
+
+        Args:
+            profile_id (int): primary key of the Profile
+
+        Returns
+            bool: True if the user follows the Profile
+
+        """
+        return profile_id in self.following_ids
+
+
+def get_viewer(request: HttpRequest) -> Viewer:
+    """Viewer of the session of a request, from the cache when its user and follows did not change.
+
+    A cached viewer is only used while the session still names its user and backend and carries the hash of its
+    password, like django.contrib.auth.get_user checks, everything else goes through get_user.
+
+    Args:
+        request (HttpRequest): incoming request, with its session
+
+    Returns
+        Viewer: viewer of the request
+
+    """
+    session = request.session
+    user_id: Optional[str] = session.get(SESSION_KEY)
+    cache: Optional[BaseCache] = get_viewer_cache()
+    if cache is None or user_id is None or session.session_key is None:
+        return Viewer.load(get_user(request))
+
+    key: str = viewer_key(session.session_key)
+    version_key: str = viewer_version_key(user_id)
+    cached: dict = cache.get_many([key, version_key])
+    version: Optional[str] = cached.get(version_key)
+    entry: Optional[tuple] = cached.get(key)
+    if version is not None and entry is not None and entry[0] == version and is_valid(entry[1], session):
+        registry.increment("viewer_cache_hits")
+        entry[1].user.backend = session[BACKEND_SESSION_KEY]
+        return entry[1]
+
+    registry.increment("viewer_cache_misses")
+    if version is None:
+        # picked before loading, so a change made while loading invalidates what is about to be stored
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, timeout=None):
+            version = cache.get(version_key, version)
+
+    viewer: Viewer = Viewer.load(get_user(request))
+    if viewer.is_authenticated and session.session_key is not None:
+        cache.set(viewer_key(session.session_key), (version, viewer), timeout=settings.DWITTER_VIEWER_CACHE_TIMEOUT)
+    return viewer
+
+
+def is_valid(viewer: Viewer, session: Any) -> bool:
+    """Whether a cached viewer still belongs to a session.
+
+    Args:
+        viewer (Viewer): cached viewer
+        session (Any): session of the request
+
+    Returns
+        bool: True if the session is logged in as the active user of the viewer with the current password
+
+    """
+    user: Any = viewer.user
+    return (
+        str(user.pk) == str(session.get(SESSION_KEY))
+        and session.get(BACKEND_SESSION_KEY) in settings.AUTHENTICATION_BACKENDS
+        and user.is_active
+        and constant_time_compare(session.get(HASH_SESSION_KEY, ""), user.get_session_auth_hash())
+    )
+
+
+def get_request_viewer(request: HttpRequest) -> Viewer:
+    """Viewer of a request that did not go through ViewerMiddleware, such as one built by a test.
+
+    Args:
+        request (HttpRequest): request
+
+    Returns
+        Viewer: viewer of request.user
+
+    """
+    viewer: Optional[Viewer] = getattr(request, "viewer", None)
+    if viewer is None:
+        viewer = Viewer.load(getattr(request, "user", AnonymousUser()))
+        request.viewer = viewer  # type: ignore
+    return viewer
@@ -3,22 +3,65 @@
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/ref/views/
 """
+import hashlib
 import json
-from typing import Any, Dict, Optional, Type
+from typing import Any, Dict, List, Optional, Tuple, Type
 
+from django.conf import settings
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Model, QuerySet
+from django.contrib.auth import get_user_model, logout
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Model, Prefetch, QuerySet
 from django.forms import BaseForm, BaseModelForm
-from django.http import HttpRequest, HttpResponse, HttpResponseForbidden, HttpResponseRedirect
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views import View
-from django.views.generic import DetailView, ListView
+from django.views.generic import DetailView, ListView, TemplateView
 from django.views.generic.detail import SingleObjectMixin
 from django.views.generic.edit import FormMixin, ProcessFormView
 
+from .cache import get_timeline_window, set_timeline_window
 from .forms import DweetForm
+from .metrics import registry
 from .models import Dweet, Profile
+from .pagination import NEXT, PREVIOUS, CursorPage, CursorPaginationMixin, CursorPaginator, MergedCursorPaginator
+from .search import SearchPaginator
+from .sharding import ShardedCursorPaginator, active_authors, dweet_databases, get_shards
+from .streaming import hub
+from .usernames import filter_username_prefix, typeahead
+from .viewer import Viewer
+
+User = get_user_model()
+
+
+class FeatureRequiredMixin:
+    """Mixin to answer 404 while the optional feature of a view is turned off.
+
+    feature_setting names the setting turning it on, falsy (None or False) when off.
+    """
+
+    feature_setting: str = ""
+
+    def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Refuse the request before anything else, login included, while the feature is off.
+
+        Args:
+            request (HttpRequest): incoming request
+
+        Raises
+            Http404: the feature is turned off
+
+        Returns
+            HttpResponse: response of the view
+
+        """
+        if not getattr(settings, self.feature_setting):
+            raise Http404("This page is turned off")
+        return super().dispatch(request, *args, **kwargs)  # type: ignore
 
 
 class DweetFormMixin(FormMixin):
@@ -102,33 +145,161 @@ class DweetFormMixin(FormMixin):
         return HttpResponseRedirect(self.get_success_url())
 
 
-class DashboardView(DweetFormMixin, ListView):
+class DashboardView(CursorPaginationMixin, DweetFormMixin, ListView):
     """Render the homepage with a paginated list of Dweets.
 
     Args:
+        CursorPaginationMixin (Mixin): Paginate with ?cursor= tokens instead of page numbers
         DweetFormMixin (FormMixin): Mixin to render/submit DweetForm
         ListView (_type_): List Dweet objects
 
+    The logged in user's timeline is read according to DWITTER_TIMELINE_ENGINE: "push" reads the materialized
+    timeline filled on write, "pull" merges the newest Dweets of every followed user on read.  Sharded Dweets are
+    always pulled, from every shard at once, see dwitter.sharding
     """
 
     model: Optional[Type[Model]] = Dweet
+    queryset: QuerySet = Dweet.objects.visible().select_related("user")
     template_name: str = "dwitter/dashboard.html"
     paginate_by: int = 5
 
     def get_queryset(self) -> QuerySet[Dweet]:
         """Overwrite method to only show Dweets of profiles the logged in user follows.
 
+        Dweets are read from the materialized timeline of the logged in user, see TimelineEntry
+
         Returns
             QuerySet[Dweet]: List of Dweet objects
 
         """
-        if self.request.user.is_authenticated:
-            follows: list[Profile] = list(
-                self.request.user.profile.follows.values_list("user", flat=True)  # type: ignore
-            )
-            return Dweet.objects.filter(user__in=follows)
+        if get_shards():
+            # the authors live on the primary, ShardedCursorPaginator loads them
+            return Dweet.objects.all()
+
+        queryset: QuerySet[Dweet] = super().get_queryset()  # type: ignore
+        if self.get_timeline_engine() == "push":
+            return queryset.filter(
+                timeline_entries__profile_id=self.request.viewer.profile_id  # type: ignore
+            ).annotate(timeline_created_at=F("timeline_entries__created_at"), timeline_id=F("timeline_entries__id"))
+
+        return queryset
+
+    def get_cursor_keys(self) -> Tuple[str, str]:
+        """Paginate the logged in user's timeline on the TimelineEntry index rather than the Dweet columns.
+
+        Returns
+            Tuple[str, str]: datetime and tie-breaker fields to paginate on
+        """
+        if self.get_timeline_engine() == "push":
+            return ("timeline_created_at", "timeline_id")
+
+        return super().get_cursor_keys()
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int) -> Tuple[CursorPaginator, CursorPage, list, bool]:
+        """Serve the first DWITTER_TIMELINE_CACHE_PAGES pages of the logged in user's timeline from the cache.
+
+        Args:
+            queryset (QuerySet): QuerySet to paginate
+            page_size (int): maximum number of objects per page
+
+        Returns
+            Tuple[CursorPaginator, CursorPage, list, bool]: same shape as MultipleObjectMixin.paginate_queryset
+        """
+        if self.get_timeline_engine() == "push" and "page" not in self.request.GET:
+            paginator = CursorPaginator(queryset, page_size, keys=self.get_cursor_keys())
+            page: Optional[CursorPage] = self.get_cached_page(paginator)
+            if page is not None:
+                return (paginator, page, page.object_list, page.has_other_pages())
+
+        return super().paginate_queryset(queryset, page_size)
+
+    def get_timeline_engine(self) -> Optional[str]:
+        """Engine reading the logged in user's timeline.
+
+        Returns
+            Optional[str]: DWITTER_TIMELINE_ENGINE, "pull" when sharded, None for anonymous users who see every Dweet
+        """
+        if not self.request.user.is_authenticated:
+            return None
+
+        return "pull" if get_shards() else settings.DWITTER_TIMELINE_ENGINE
+
+    def get_cursor_paginator(self, queryset: QuerySet, page_size: int) -> CursorPaginator:
+        """Merge the Dweets of every followed user, one (user, created_at, id) index range each, with the pull engine.
+
+        Sharded Dweets are gathered from every shard, anonymous users' too.
+
+        Args:
+            queryset (QuerySet): QuerySet to paginate
+            page_size (int): maximum number of objects per page
+
+        Returns
+            CursorPaginator: paginator for the timeline
+        """
+        engine: Optional[str] = self.get_timeline_engine()
+        if get_shards() and engine is None:
+            return ShardedCursorPaginator(queryset, page_size)
+        if engine != "pull":
+            return super().get_cursor_paginator(queryset, page_size)
+
+        followed_user_ids: frozenset = self.request.viewer.following_user_ids  # type: ignore
+        if get_shards():
+            return ShardedCursorPaginator(queryset, page_size, user_ids=active_authors(followed_user_ids))
+        return MergedCursorPaginator(queryset, page_size, partition_field="user", partitions=sorted(followed_user_ids))
 
-        return super().get_queryset()  # type: ignore
+    def get_cached_page(self, paginator: CursorPaginator) -> Optional[CursorPage]:
+        """Build a page out of the cached window of the newest (created_at, timeline id, dweet id) timeline rows.
+
+        On a miss the whole window is read with the Dweets in one indexed range query, on a hit only the Dweets of
+        the page are fetched by primary key.
+
+        Args:
+            paginator (CursorPaginator): paginator for the logged in user's timeline
+
+        Returns
+            Optional[CursorPage]: requested page, None when it falls outside of the window (or the cursor is invalid)
+        """
+        profile_id: int = self.request.viewer.profile_id  # type: ignore
+        window_size: int = settings.DWITTER_TIMELINE_CACHE_PAGES * paginator.per_page + 1
+        dweets: Dict[int, Dweet] = {}
+
+        version, rows = get_timeline_window(profile_id)
+        if rows is None:
+            window: list = list(paginator.get_ordered_queryset()[:window_size])
+            rows = [(dweet.timeline_created_at, dweet.timeline_id, dweet.pk) for dweet in window]
+            dweets = {dweet.pk: dweet for dweet in window}
+            set_timeline_window(profile_id, version, rows)
+
+        cursor: Optional[str] = self.request.GET.get("cursor")
+        start: int = 0
+        stop: int = paginator.per_page
+        if cursor:
+            try:
+                direction, _, timeline_id = paginator.decode_cursor(cursor)
+            except InvalidPage:
+                return None
+            index: Optional[int] = next((i for i, row in enumerate(rows) if row[1] == timeline_id), None)
+            if index is None:
+                return None
+            start = index + 1 if direction == NEXT else max(0, index - paginator.per_page)
+            stop = start + paginator.per_page if direction == NEXT else index
+
+        # the row after the page tells whether there is an older page, unless the window holds the whole timeline
+        if stop >= len(rows) and len(rows) == window_size:
+            return None
+
+        page_rows: list = rows[start:stop]
+        if not dweets:
+            dweets = Dweet.objects.visible().select_related("user").in_bulk([dweet_id for _, _, dweet_id in page_rows])
+
+        object_list: list = []
+        for created_at, timeline_id, dweet_id in page_rows:
+            if dweet_id in dweets:
+                dweet: Dweet = dweets[dweet_id]
+                dweet.timeline_created_at, dweet.timeline_id = created_at, timeline_id  # type: ignore
+                object_list.append(dweet)
+
+        return paginator.build_page(object_list, has_newer=start > 0, has_older=stop < len(rows))
 
 
 class DweetCreateView(DweetFormMixin, ProcessFormView):
@@ -138,8 +309,22 @@ class DweetCreateView(DweetFormMixin, ProcessFormView):
         DweetFormMixin (Form): Adds methods to handle the Dweet Model Form
         ProcessFormView (View): Remainder of the plumbing to validate the Form and create Dweet model
 
+    New Dweets are published to the live timeline streams, see dwitter.streaming
     """
 
+    def form_valid(self, form: BaseModelForm) -> HttpResponse:
+        """Create the Dweet and push it to the followers connected to the live timeline.
+
+        Args:
+            form (BaseModelForm): pre-validated DweetForm
+
+        Returns
+            HttpResponse: redirect from DweetFormMixin.form_valid
+        """
+        response: HttpResponse = super().form_valid(form)
+        hub.publish(form.instance)
+        return response
+
     def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
         """Redirect user to the Dashboard.
 
@@ -171,10 +356,11 @@ class DweetCreateView(DweetFormMixin, ProcessFormView):
         return self.form_invalid(form)
 
 
-class ProfileDetailView(DweetFormMixin, DetailView):
+class ProfileDetailView(CursorPaginationMixin, DweetFormMixin, DetailView):
     """Render a single instace of User/Profile model.
 
     Args:
+        CursorPaginationMixin (Mixin): Paginate the Profile's Dweets with ?cursor= tokens
         DweetFormMixin (Form): Adds methods to handle the Dweet Model Form
         DetailView (View): Adds remaining methods to render a single instance of Profile
 
@@ -186,6 +372,14 @@ class ProfileDetailView(DweetFormMixin, DetailView):
     """
 
     model: Type[Model] = Profile
+    queryset: QuerySet = (
+        Profile.objects.filter(user__is_active=True)
+        .select_related("user")
+        .prefetch_related(
+            Prefetch("follows", queryset=Profile.objects.filter(user__is_active=True).select_related("user")),
+            Prefetch("followed_by", queryset=Profile.objects.filter(user__is_active=True).select_related("user")),
+        )
+    )
     slug_field: str = "user__username"
     slug_url_kwarg: str = "username"
     paginate_by: int = 5
@@ -194,17 +388,25 @@ class ProfileDetailView(DweetFormMixin, DetailView):
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         """Adds custom pagination for dweets.
 
+        self.object is already set by DetailView.get(), the follows/followed_by shown in the sidebar are prefetched
+
         Returns
             Dict[str, Any]: context dictionary referenced when rendering a Django template
         """
         context: Dict[str, Any] = super().get_context_data(**kwargs)
-        self.object: Profile = self.get_object()
-        dweets: QuerySet = Dweet.objects.filter(user=self.object.user)
-        paginator = Paginator(dweets, self.paginate_by)
-        page_number: int = int(self.request.GET.get("page", 1))
-        context["page_obj"] = paginator.page(page_number)
+        dweets: QuerySet = Dweet.objects.select_related("user").filter(user=self.object.user)
+        if get_shards():
+            # a single shard, the author lives on the primary
+            dweets = Dweet.objects.using(self.object.dweet_database).filter(user_id=self.object.user_id)
+            dweets = dweets.prefetch_related("user")
+        paginator, page, _, is_paginated = self.paginate_queryset(dweets, self.paginate_by)
+        context["page_obj"] = page
         context["paginator"] = paginator
+        context["is_paginated"] = is_paginated
         context["display_follow"] = True
+        viewer: Viewer = self.request.viewer  # type: ignore
+        if viewer.is_authenticated and viewer.profile_id != self.object.pk:
+            context["is_following"] = viewer.is_following(self.object.pk)
         return context
 
 
@@ -218,6 +420,7 @@ class ProfileFollowView(SingleObjectMixin, View):
     """
 
     model: Type[Model] = Profile
+    queryset: QuerySet = Profile.objects.filter(user__is_active=True)
     slug_field: str = "user__username"
     slug_url_kwarg: str = "username"
     object: Profile
@@ -251,17 +454,61 @@ class ProfileFollowView(SingleObjectMixin, View):
         current_user_profile: Profile = request.user.profile  # type: ignore
 
         # Users cannot follow/unfollow themselves
+        # the follows/followers counters are updated with F() expressions by the m2m_changed receivers, the
+        # profile itself must not be saved here or the stale counters loaded with it would overwrite them
+        # redundant follows/unfollows are skipped rather than sent to the database
         if self.object != current_user_profile:
             action: Optional[str] = request.POST.get("follow")
-            if action == "follow":
-                current_user_profile.follows.add(self.object)
-            elif action == "unfollow":
-                current_user_profile.follows.remove(self.object)
-            current_user_profile.save()
+            if action in ("follow", "unfollow"):
+                is_following: bool = Profile.objects.is_following(request.user.pk, self.object.pk)
+                if action == "follow" and not is_following:
+                    current_user_profile.follows.add(self.object)
+                elif action == "unfollow" and is_following:
+                    current_user_profile.follows.remove(self.object)
 
         return HttpResponseRedirect(reverse("dwitter:profile-detail", kwargs={"username": self.object.user.username}))
 
 
+class AccountDeleteView(View):
+    """Delete the logged in user's account.
+
+    Args:
+        View (View): Base view
+
+    The account is soft deleted, its Profile and Dweets disappear at once and its rows are purged later by
+    purge_deleted_users
+    """
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponseRedirect:
+        """Redirect user to the Dashboard.
+
+        Args:
+            request (HttpRequest):
+
+        Returns
+            HttpResponseRedirect: Redirect to the Dashboard
+        """
+        return HttpResponseRedirect(reverse("dwitter:dashboard"))
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Soft delete the account and log the user out.
+
+        Args:
+            request (HttpRequest): POST from the delete button of the user's own Profile
+
+        Returns
+            HttpResponse: Could either return a 403 Forbidden or 302 Redirect
+        """
+        # AnonymousUser has no account to delete
+        if not request.user.is_authenticated:
+            return HttpResponseForbidden()
+
+        Profile.objects.soft_delete(request.user.profile)  # type: ignore
+        logout(request)
+        messages.success(request, "Your account was deleted")
+        return HttpResponseRedirect(reverse("dwitter:dashboard"))
+
+
 class ProfileListView(DweetFormMixin, ListView):
     """List all profiles and allow the submission of a Dweet Form.
 
@@ -273,4 +520,604 @@ class ProfileListView(DweetFormMixin, ListView):
     """
 
     model: Optional[Type[Model]] = Profile
+    queryset: QuerySet = Profile.objects.filter(user__is_active=True).select_related("user")
     paginate_by: int = 5
+
+    def get_queryset(self) -> QuerySet[Profile]:
+        """Only list the usernames starting with ?q= when given, read from the username_lower index.
+
+        Returns
+            QuerySet[Profile]: List of Profile objects
+        """
+        queryset: QuerySet[Profile] = super().get_queryset()
+        query: str = self.request.GET.get("q", "").strip()
+        if query:
+            return filter_username_prefix(queryset, query)
+        return queryset
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        """Add the prefix searched for.
+
+        Context
+            query (str): stripped ?q=
+
+        Returns
+            Dict[str, Any]: context dictionary referenced when rendering a Django template
+        """
+        context: Dict[str, Any] = super().get_context_data(**kwargs)
+        context["query"] = self.request.GET.get("q", "").strip()
+        return context
+
+
+class TagView(FeatureRequiredMixin, CursorPaginationMixin, DweetFormMixin, ListView):
+    """List the Dweets using a hashtag, newest first.
+
+    Args:
+        FeatureRequiredMixin (Mixin): 404 without DWITTER_ENTITY_VIEWS
+        CursorPaginationMixin (Mixin): Paginate with ?cursor= tokens instead of page numbers
+        DweetFormMixin (Form): Adds methods to handle the Dweet Model Form
+        ListView (View): Adds remaining methods to render a list of Dweets
+
+    Reads the (tag, created_at, id) index of DweetTag rather than the Dweet bodies, see dwitter.entities
+    """
+
+    feature_setting: str = "DWITTER_ENTITY_VIEWS"
+    template_name: str = "dwitter/tag_detail.html"
+    paginate_by: int = 5
+    cursor_keys: Tuple[str, str] = ("tag_created_at", "tag_id")
+
+    def get_queryset(self) -> QuerySet[Dweet]:
+        """Dweets joined to their DweetTag row, tags are case insensitive.
+
+        Returns
+            QuerySet[Dweet]: List of Dweet objects
+        """
+        return (
+            Dweet.objects.visible()
+            .select_related("user")
+            .filter(tags__tag=self.kwargs["tag"].lower())
+            .annotate(tag_created_at=F("tags__created_at"), tag_id=F("tags__id"))
+        )
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        """Add the tag.
+
+        Context
+            tag (str): lowercased tag, without the #
+
+        Returns
+            Dict[str, Any]: context dictionary referenced when rendering a Django template
+        """
+        context: Dict[str, Any] = super().get_context_data(**kwargs)
+        context["tag"] = self.kwargs["tag"].lower()
+        return context
+
+
+class MentionListView(FeatureRequiredMixin, LoginRequiredMixin, CursorPaginationMixin, DweetFormMixin, ListView):
+    """List the Dweets mentioning the logged in user, newest first.
+
+    Args:
+        FeatureRequiredMixin (Mixin): 404 without DWITTER_ENTITY_VIEWS
+        LoginRequiredMixin (Mixin): Send anonymous users to the login page
+        CursorPaginationMixin (Mixin): Paginate with ?cursor= tokens instead of page numbers
+        DweetFormMixin (Form): Adds methods to handle the Dweet Model Form
+        ListView (View): Adds remaining methods to render a list of Dweets
+
+    Reads the (user, created_at, id) index of Mention rather than the Dweet bodies, see dwitter.entities
+    """
+
+    feature_setting: str = "DWITTER_ENTITY_VIEWS"
+    template_name: str = "dwitter/mention_list.html"
+    paginate_by: int = 5
+    cursor_keys: Tuple[str, str] = ("mention_created_at", "mention_id")
+
+    def get_queryset(self) -> QuerySet[Dweet]:
+        """Dweets joined to the logged in user's Mention rows.
+
+        Returns
+            QuerySet[Dweet]: List of Dweet objects
+        """
+        return (
+            Dweet.objects.visible()
+            .select_related("user")
+            .filter(mentions__user=self.request.user)
+            .annotate(mention_created_at=F("mentions__created_at"), mention_id=F("mentions__id"))
+        )
+
+
+class MetricsView(View):
+    """Dump the in-process request metrics histograms and counters as JSON, staff only.
+
+    Args:
+        View (View): Base view
+
+    Only covers requests handled by this worker process, see dwitter.middleware.RequestMetricsMiddleware
+    """
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Return the histograms of every view handled so far along with the counters.
+
+        Args:
+            request (HttpRequest): must come from a staff user
+
+        Returns
+            HttpResponse: Could either return a 403 Forbidden or 200 JSON
+        """
+        if not request.user.is_staff:
+            return HttpResponseForbidden()
+
+        return JsonResponse({"views": registry.snapshot(), "counters": registry.counters()})
+
+
+class TimelineStreamView(View):
+    """Fallback for dwitter:timeline-stream when not served by dwitter.streaming.TimelineStreamApplication.
+
+    Args:
+        View (View): Base view
+
+    Under WSGI (or runserver) there is no live timeline, a 204 tells EventSource clients to stop reconnecting
+    """
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Tell the client there is no event stream here.
+
+        Args:
+            request (HttpRequest): EventSource request
+
+        Returns
+            HttpResponse: 204 No Content
+        """
+        return HttpResponse(status=204)
+
+
+class DweetListAPIView(View):
+    """Base for the JSON lists of Dweets, newest first, for polling clients.
+
+    Args:
+        View (View): Base view
+
+    Query string
+        since (str): only Dweets newer than this cursor, pass the newest_cursor of the last response to poll
+        max (str): only Dweets older than this cursor, pass the oldest_cursor of the last response to page back
+        since_id (int): only Dweets listed before this Dweet, pass the newest_id of the last response to poll
+        max_id (int): only Dweets listed after this Dweet, pass the oldest_id of the last response to page back
+        count (int): number of Dweets, paginate_by by default and at most max_count
+
+    The list is ordered on (created_at, id) and ids do not follow created_at for loaded or moved Dweets, so polls
+    seek past the position of a Dweet in that order rather than comparing ids.  The cursors carry that position,
+    since_id and max_id cost a query to look it up, or fall back to comparing ids when that Dweet is gone.
+
+    Every response carries a strong ETag, a digest of the list, the query string and the JSON it answers with, so
+    following, unfollowing, deleted or edited Dweets and renamed authors all change it.  An idle poll sending
+    If-None-Match costs the single indexed query of the page and gets an empty 304 Not Modified
+    """
+
+    paginate_by: int = 20
+    max_count: int = 100
+    cursor_keys: Tuple[str, str] = ("created_at", "id")
+
+    def get_queryset(self) -> QuerySet[Dweet]:
+        """Dweets to list, in any order.
+
+        Raises
+            NotImplementedError: subclasses must say which Dweets to list
+
+        """
+        raise NotImplementedError
+
+    def get_cursor_keys(self) -> Tuple[str, str]:
+        """Datetime and tie-breaker fields the list is ordered on.
+
+        Returns
+            Tuple[str, str]: keys passed to CursorPaginator
+
+        """
+        return self.cursor_keys
+
+    def get_etag_prefix(self) -> str:
+        """Tell the ETags of different lists apart.
+
+        Returns
+            str: prefix of the ETag
+
+        """
+        return self.request.path
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """List the Dweets, or tell the client its copy is still fresh.
+
+        Args:
+            request (HttpRequest): request with the optional since_id, max_id and count query parameters
+
+        Returns
+            HttpResponse: 200 JSON, 304 Not Modified or 400 Bad Request for malformed parameters
+        """
+        try:
+            since_id: Optional[int] = self.get_id_parameter("since_id")
+            max_id: Optional[int] = self.get_id_parameter("max_id")
+            count: int = min(self.get_id_parameter("count") or self.paginate_by, self.max_count)
+            since: Optional[Tuple[Any, int]] = self.get_cursor_parameter("since")
+            until: Optional[Tuple[Any, int]] = self.get_cursor_parameter("max")
+        except (ValueError, InvalidPage):
+            return JsonResponse(
+                {"error": "since_id, max_id and count must be positive integers, since and max cursors"}, status=400
+            )
+
+        paginator = CursorPaginator(self.get_queryset(), count, keys=self.get_cursor_keys())
+        queryset: QuerySet[Dweet] = paginator.get_ordered_queryset()
+        if since is None and since_id is not None:
+            since = self.locate(queryset, since_id)
+            if since is None:
+                queryset = queryset.filter(id__gt=since_id)
+        if until is None and max_id is not None:
+            until = self.locate(queryset, max_id)
+            if until is None:
+                queryset = queryset.filter(id__lt=max_id)
+        queryset = paginator.seek(paginator.seek(queryset, False, since), True, until)
+
+        dweets: List[Dweet] = self.get_dweets(queryset, count)
+        content: str = json.dumps(
+            {
+                "dweets": [dweet.to_dict() for dweet in dweets],
+                "newest_id": dweets[0].pk if dweets else since_id,
+                "oldest_id": dweets[-1].pk if dweets else max_id,
+                "newest_cursor": paginator.encode_cursor(dweets[0], PREVIOUS)
+                if dweets
+                else self.request.GET.get("since"),
+                "oldest_cursor": paginator.encode_cursor(dweets[-1], NEXT) if dweets else self.request.GET.get("max"),
+            },
+            cls=DjangoJSONEncoder,
+        )
+        digest: str = hashlib.sha1(  # nosec - not used for security
+            f"{self.get_etag_prefix()}\n{request.GET.urlencode()}\n{content}".encode()
+        ).hexdigest()
+        etag: str = quote_etag(digest)
+
+        response: Optional[HttpResponse] = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type="application/json")
+
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_dweets(self, queryset: QuerySet[Dweet], count: int) -> List[Dweet]:
+        """Read the page, the only query of a 304.
+
+        Args:
+            queryset (QuerySet[Dweet]): ordered and filtered Dweets to list
+            count (int): maximum number of Dweets
+
+        Returns
+            List[Dweet]: Dweets of the page, newest first, with their users and cursor keys
+        """
+        if get_shards():
+            # the authors live on the primary, see dwitter.routers.ShardRouter
+            return list(queryset.prefetch_related("user")[:count])
+        return list(queryset.select_related("user")[:count])
+
+    def locate(self, queryset: QuerySet[Dweet], pk: int) -> Optional[Tuple[Any, int]]:
+        """Position of a Dweet in the list, what since_id and max_id seek past.
+
+        Args:
+            queryset (QuerySet[Dweet]): ordered Dweets to list
+            pk (int): primary key of the Dweet
+
+        Returns
+            Optional[Tuple[Any, int]]: values of the cursor keys of the Dweet, None when it is not in the list
+        """
+        return queryset.filter(pk=pk).values_list(*self.get_cursor_keys()).first()
+
+    def get_cursor_parameter(self, name: str) -> Optional[Tuple[Any, int]]:
+        """Read an optional cursor of a previous response from the query string.
+
+        Args:
+            name (str): name of the query parameter
+
+        Raises
+            InvalidCursor: parameter is not a cursor
+
+        Returns
+            Optional[Tuple[Any, int]]: values of the cursor keys it points past, None when not given
+        """
+        token: Optional[str] = self.request.GET.get(name)
+        if not token:
+            return None
+
+        _, timestamp, pk = CursorPaginator.decode_cursor(token)
+        return timestamp, pk
+
+    def get_id_parameter(self, name: str) -> Optional[int]:
+        """Read an optional positive integer from the query string.
+
+        Args:
+            name (str): name of the query parameter
+
+        Raises
+            ValueError: parameter is not a positive integer
+
+        Returns
+            Optional[int]: the value, None when not given
+        """
+        value: Optional[str] = self.request.GET.get(name)
+        if not value:
+            return None
+
+        number: int = int(value)
+        if number < 1:
+            raise ValueError(f"{name} must be positive")
+        return number
+
+
+class TimelineAPIView(DweetListAPIView):
+    """JSON home timeline of the logged in user, read from the materialized timeline like DashboardView.
+
+    Args:
+        DweetListAPIView (View): since_id/max_id/count parameters and ETag handling
+
+    Sharded Dweets are pulled from every shard at once, like DashboardView does, see dwitter.sharding
+    """
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """List the home timeline.
+
+        Args:
+            request (HttpRequest): request from a logged in user
+
+        Returns
+            HttpResponse: Could either return a 403 Forbidden or the response of DweetListAPIView.get
+        """
+        # AnonymousUser has no timeline
+        if not request.user.is_authenticated:
+            return HttpResponseForbidden()
+
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self) -> QuerySet[Dweet]:
+        """Dweets on the logged in user's timeline, filtered through the Profile join to avoid loading the Profile.
+
+        Without materialized timelines (the "pull" DWITTER_TIMELINE_ENGINE) the follows are joined instead
+
+        Returns
+            QuerySet[Dweet]: Dweets, with the timeline keys annotated for the "push" engine
+        """
+        if get_shards():
+            # the authors live on the primary, get_dweets picks the followed ones
+            return Dweet.objects.all()
+        if settings.DWITTER_TIMELINE_ENGINE != "push":
+            return Dweet.objects.visible().filter(user__profile__followed_by__user=self.request.user)
+
+        return (
+            Dweet.objects.visible()
+            .filter(timeline_entries__profile__user=self.request.user)
+            .annotate(timeline_created_at=F("timeline_entries__created_at"), timeline_id=F("timeline_entries__id"))
+        )
+
+    def get_cursor_keys(self) -> Tuple[str, str]:
+        """Order the materialized timeline on its own keys, like DashboardView.
+
+        Returns
+            Tuple[str, str]: datetime and tie-breaker fields to order on
+        """
+        if settings.DWITTER_TIMELINE_ENGINE == "push" and not get_shards():
+            return ("timeline_created_at", "timeline_id")
+
+        return super().get_cursor_keys()
+
+    def get_dweets(self, queryset: QuerySet[Dweet], count: int) -> List[Dweet]:
+        """Merge the newest Dweets of every followed author across the shards when sharded.
+
+        Args:
+            queryset (QuerySet[Dweet]): ordered and filtered Dweets to list
+            count (int): maximum number of Dweets
+
+        Returns
+            List[Dweet]: Dweets of the page, newest first
+        """
+        if not get_shards():
+            return super().get_dweets(queryset, count)
+
+        followed_user_ids: frozenset = self.request.viewer.following_user_ids  # type: ignore
+        paginator = ShardedCursorPaginator(queryset, count, user_ids=active_authors(followed_user_ids))
+        return paginator.get_objects(count)
+
+    def locate(self, queryset: QuerySet[Dweet], pk: int) -> Optional[Tuple[Any, int]]:
+        """Look the Dweet up on every shard when sharded.
+
+        Args:
+            queryset (QuerySet[Dweet]): ordered Dweets to list
+            pk (int): primary key of the Dweet
+
+        Returns
+            Optional[Tuple[Any, int]]: (created_at, id) of the Dweet, None when it is gone
+        """
+        if not get_shards():
+            return super().locate(queryset, pk)
+
+        for alias in dweet_databases():
+            position: Optional[Tuple[Any, int]] = (
+                Dweet.objects.using(alias).filter(pk=pk).values_list(*self.get_cursor_keys()).first()
+            )
+            if position is not None:
+                return position
+        return None
+
+    def get_etag_prefix(self) -> str:
+        """Timelines of different users share the url.
+
+        Returns
+            str: prefix of the ETag
+        """
+        return f"timeline:{self.request.user.pk}"
+
+
+class ProfileDweetsAPIView(DweetListAPIView):
+    """JSON list of the Dweets of a single User/Profile.
+
+    Args:
+        DweetListAPIView (View): since_id/max_id/count parameters and ETag handling
+
+    """
+
+    def get_queryset(self) -> QuerySet[Dweet]:
+        """Dweets of the User in the URL path, joined on the unique username rather than loading the User first.
+
+        Sharded Dweets are read from the author's shard, which takes looking the author up first
+
+        Raises
+            Http404: no active User has that username, only checked here when sharded
+
+        Returns
+            QuerySet[Dweet]: Dweets of the User
+        """
+        if not get_shards():
+            return Dweet.objects.visible().filter(user__username=self.kwargs["username"])
+
+        profile: Optional[Profile] = (
+            Profile.objects.filter(user__username=self.kwargs["username"], user__is_active=True)
+            .only("user_id", "dweet_shard")
+            .first()
+        )
+        if profile is None:
+            raise Http404("No user found matching the query")
+        return Dweet.objects.using(profile.dweet_database).filter(user_id=profile.user_id)
+
+    def get_dweets(self, queryset: QuerySet[Dweet], count: int) -> List[Dict[str, Any]]:
+        """Only look the User up when the page is empty.
+
+        Args:
+            queryset (QuerySet[Dweet]): ordered and filtered Dweets to list
+            count (int): maximum number of Dweets
+
+        Raises
+            Http404: no User has that username
+
+        Returns
+            List[Dweet]: Dweets of the page, newest first
+        """
+        dweets: List[Dweet] = super().get_dweets(queryset, count)
+        if not dweets and not User.objects.filter(username=self.kwargs["username"], is_active=True).exists():
+            raise Http404("No user found matching the query")
+        return dweets
+
+
+class SearchView(FeatureRequiredMixin, DweetFormMixin, TemplateView):
+    """Full-text search of Dweets, best matches first.
+
+    Args:
+        FeatureRequiredMixin (Mixin): 404 without DWITTER_SEARCH_BACKEND
+        DweetFormMixin (Form): Adds methods to handle the Dweet Model Form
+        TemplateView (View): Adds remaining methods to render the results
+
+    Results are paged forward with ?cursor= tokens, see dwitter.search
+    """
+
+    feature_setting: str = "DWITTER_SEARCH_BACKEND"
+    template_name: str = "dwitter/search.html"
+    paginate_by: int = 5
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        """Add the query and its page of results.
+
+        Context
+            query (str): stripped ?q=
+            results (CursorPage): matching Dweets, only when there is a query
+
+        Raises
+            Http404: cursor is invalid
+
+        Returns
+            Dict[str, Any]: context dictionary referenced when rendering a Django template
+        """
+        context: Dict[str, Any] = super().get_context_data(**kwargs)
+        query: str = self.request.GET.get("q", "").strip()
+        context["query"] = query
+        if query:
+            try:
+                context["results"] = SearchPaginator(query, self.paginate_by).page(self.request.GET.get("cursor"))
+            except InvalidPage as err:
+                raise Http404(str(err)) from err
+        return context
+
+
+class SearchAPIView(FeatureRequiredMixin, View):
+    """JSON full-text search of Dweets, best matches first.
+
+    Args:
+        FeatureRequiredMixin (Mixin): 404 without DWITTER_SEARCH_BACKEND
+        View (View): Base view
+
+    Query string
+        q (str): search query
+        cursor (str): next_cursor of the previous response
+        count (int): number of Dweets, paginate_by by default and at most max_count
+    """
+
+    feature_setting: str = "DWITTER_SEARCH_BACKEND"
+    paginate_by: int = 20
+    max_count: int = 100
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Search the Dweets.
+
+        Args:
+            request (HttpRequest): request with the q, cursor and count query parameters
+
+        Returns
+            HttpResponse: 200 JSON or 400 Bad Request for a malformed cursor or count
+        """
+        try:
+            count: int = min(int(request.GET.get("count", self.paginate_by)), self.max_count)
+            if count < 1:
+                raise ValueError("count must be positive")
+            page: CursorPage = SearchPaginator(request.GET.get("q", "").strip(), count).page(request.GET.get("cursor"))
+        except (InvalidPage, ValueError):
+            return JsonResponse({"error": "count must be a positive integer and cursor a next_cursor"}, status=400)
+
+        return JsonResponse({"dweets": [dweet.to_dict() for dweet in page], "next_cursor": page.next_cursor})
+
+
+class ProfileTypeaheadAPIView(View):
+    """JSON usernames starting with a prefix, for typeahead, most followed first.
+
+    Args:
+        View (View): Base view
+
+    Query string
+        q (str): prefix, matched case insensitively
+        count (int): number of profiles, paginate_by by default and at most max_count
+
+    Served from an in-process cache of the most followed usernames when possible, see dwitter.usernames
+    """
+
+    paginate_by: int = 8
+    max_count: int = 20
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Complete a username.
+
+        Args:
+            request (HttpRequest): request with the q and count query parameters
+
+        Returns
+            HttpResponse: 200 JSON or 400 Bad Request for a malformed count
+        """
+        try:
+            count: int = min(int(request.GET.get("count", self.paginate_by)), self.max_count)
+            if count < 1:
+                raise ValueError("count must be positive")
+        except ValueError:
+            return JsonResponse({"error": "count must be a positive integer"}, status=400)
+
+        query: str = request.GET.get("q", "").strip()
+        profiles: list = [
+            {
+                "username": username,
+                "followers_count": followers_count,
+                "url": reverse("dwitter:profile-detail", args=[username]),
+            }
+            for username, followers_count in (typeahead(query, count) if query else [])
+        ]
+        response: HttpResponse = JsonResponse({"profiles": profiles})
+        patch_cache_control(response, private=True, max_age=settings.DWITTER_TYPEAHEAD_CACHE_TIMEOUT)
+        return response
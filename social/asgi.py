@@ -4,6 +4,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+
+The live timeline (server-sent events) is served by dwitter.streaming in front of Django, so it is only available
+when running under an ASGI server, e.g.
+    uvicorn social.asgi:application
 """
 
 import os
@@ -12,4 +16,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "social.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# must be imported once Django is set up
+from dwitter.streaming import TimelineStreamApplication  # noqa: E402
+
+application = TimelineStreamApplication(django_application)
@@ -15,7 +15,7 @@ Some settings are read in as environmental variables and have common sense
 defaults set.  The required environmental variables can be found in env.dist in
 the base of the project.  It should be renamed to .env and filled out
 """
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 import environ
 from django.core.management.utils import get_random_secret_key
@@ -37,6 +37,53 @@ DEBUG: bool = env.bool("DJANGO_DEBUG", default=False)
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
 DATABASES: dict = {"default": env.db_url("DATABASE_URL", default="sqlite:///db.sqlite3")}
+if env("DATABASE_REPLICA_URL", default=""):
+    DATABASES["replica"] = env.db_url("DATABASE_REPLICA_URL")
+    DWITTER_REPLICA_DATABASE: Optional[str] = "replica"
+# Dweets sharded by author across these databases, e.g. sqlite:///shard0.sqlite3,sqlite:///shard1.sqlite3
+DWITTER_DWEET_SHARDS: List[str] = []
+for index, url in enumerate(env.list("DATABASE_SHARD_URLS", default=[])):
+    DATABASES[f"shard_{index}"] = env.db_url_config(url)
+    DWITTER_DWEET_SHARDS.append(f"shard_{index}")
+
+# SQLite tuned for concurrent readers and writers (WAL, pragmas, BEGIN IMMEDIATE), see dwitter.backends.sqlite3
+if env.bool("DWITTER_SQLITE_TUNING", default=False):
+    for database in DATABASES.values():
+        if database["ENGINE"] == "django.db.backends.sqlite3":
+            database["ENGINE"] = "dwitter.backends.sqlite3"
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# eviction is configured through the url, e.g. locmemcache://dwitter?max_entries=10000&cull_frequency=3
+
+CACHES: dict = {"default": env.cache_url("CACHE_URL", default="locmemcache://dwitter?max_entries=10000")}
+
+# Sessions and per-session viewers are only cached in a cache shared by every process, a per-process local-memory
+# cache would keep serving logged out sessions and stale follows from the other workers
+# https://docs.djangoproject.com/en/3.2/topics/http/sessions/#using-cached-sessions
+if CACHES["default"]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+):
+    SESSION_ENGINE: str = "django.contrib.sessions.backends.cached_db"
+    DWITTER_VIEWER_CACHE: str = "default"
+
+# Dwitter Settings
+# the defaults are the ones of social/settings_base.py
+DWITTER_DWEET_CARD_TIMEOUT: int = env.int(
+    "DWITTER_DWEET_CARD_TIMEOUT", default=DWITTER_DWEET_CARD_TIMEOUT  # noqa: F405
+)
+DWITTER_METRICS_SAMPLE_RATE: float = env.float(
+    "DWITTER_METRICS_SAMPLE_RATE", default=DWITTER_METRICS_SAMPLE_RATE  # noqa: F405
+)
+DWITTER_TIMELINE_ENGINE: str = env("DWITTER_TIMELINE_ENGINE", default=DWITTER_TIMELINE_ENGINE)  # noqa: F405
+DWITTER_JOBS_EAGER: bool = env.bool("DWITTER_JOBS_EAGER", default=DWITTER_JOBS_EAGER)  # noqa: F405
+DWITTER_REPLICA_PIN: int = env.int("DWITTER_REPLICA_PIN", default=DWITTER_REPLICA_PIN)  # noqa: F405
+# both must be off while DATABASE_SHARD_URLS is set, an empty DWITTER_SEARCH_BACKEND turns search off
+DWITTER_SEARCH_BACKEND: Optional[str] = (
+    env("DWITTER_SEARCH_BACKEND", default=DWITTER_SEARCH_BACKEND) or None  # noqa: F405
+)
+DWITTER_ENTITY_VIEWS: bool = env.bool("DWITTER_ENTITY_VIEWS", default=DWITTER_ENTITY_VIEWS)  # noqa: F405
 
 # Security Settings
 CSRF_COOKIE_SECURE: bool = env.bool("DJANGO_CSRF_COOKIE_SECURE", default=True)
@@ -10,7 +10,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,15 +38,23 @@ INSTALLED_APPS: List = [
 ]
 
 MIDDLEWARE: List = [
+    # first so it times everything below it
+    "dwitter.middleware.RequestMetricsMiddleware",
+    # before the session and authentication are read
+    "dwitter.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # right after the authentication, it serves request.user from the cached viewer
+    "dwitter.middleware.ViewerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+DATABASE_ROUTERS: List = ["dwitter.routers.ShardRouter", "dwitter.routers.ReplicaRouter"]
+
 ROOT_URLCONF: str = "social.urls"
 
 TEMPLATES: List[Dict[str, Any]] = [
@@ -63,6 +71,8 @@ TEMPLATES: List[Dict[str, Any]] = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "dwitter.context_processors.viewer",
+                "dwitter.context_processors.features",
             ],
         },
     },
@@ -109,6 +119,16 @@ SOCIALACCOUNT_PROVIDERS: Dict[str, Any] = {
     },
 }
 
+# Caching
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 10000, "CULL_FREQUENCY": 3},
+    }
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -139,3 +159,87 @@ DEFAULT_AUTO_FIELD: str = "django.db.models.BigAutoField"
 
 LOGIN_REDIRECT_URL = "dwitter:dashboard"
 LOGOUT_REDIRECT_URL = "dwitter:dashboard"
+
+# Dwitter
+
+# How home timelines are built, "push" fans new dweets out to materialized timelines on write, "pull" merges the
+# newest dweets of every followed user on read and skips the fan-out (run rebuild_timelines when switching back)
+DWITTER_TIMELINE_ENGINE: str = "push"
+
+# Maximum number of entries kept in each materialized home timeline
+DWITTER_TIMELINE_MAX_ENTRIES: int = 800
+
+# Share of requests (0.0 - 1.0) timed by dwitter.middleware.RequestMetricsMiddleware, one in ten by default to keep
+# the overhead low under load, also the default of DWITTER_METRICS_SAMPLE_RATE in social/settings.py
+DWITTER_METRICS_SAMPLE_RATE: float = 0.1
+
+# Cache alias and timeout (seconds) of the rendered dweet cards, see dwitter.templatetags.dwitter_tags
+DWITTER_DWEET_CARD_CACHE: str = "default"
+DWITTER_DWEET_CARD_TIMEOUT: int = 60 * 60 * 24
+
+# Cache alias, timeout (seconds) and number of pages of the per-user timeline windows, see dwitter.cache
+DWITTER_TIMELINE_CACHE: str = "default"
+DWITTER_TIMELINE_CACHE_TIMEOUT: int = 60 * 15
+DWITTER_TIMELINE_CACHE_PAGES: int = 3
+
+# Live timeline over server-sent events, see dwitter.streaming
+# events buffered per connection, seconds between keep-alive comments and seconds without dweets before closing
+DWITTER_STREAM_QUEUE_SIZE: int = 100
+DWITTER_STREAM_HEARTBEAT: int = 15
+DWITTER_STREAM_IDLE_TIMEOUT: int = 60 * 5
+
+# Full-text search index, "auto", "fts5" (SQLite), "postgres" or "python" (SearchTerm table), None to turn search
+# off, see dwitter.search.  Must be None while the Dweets are sharded, see dwitter.checks
+DWITTER_SEARCH_BACKEND: Optional[str] = "auto"
+
+# Hashtag and mention pages, read from the DweetTag and Mention tables, see dwitter.entities.  Must be False while the
+# Dweets are sharded, see dwitter.checks
+DWITTER_ENTITY_VIEWS: bool = True
+
+# Trending hashtags, see dwitter.trending
+# cache alias, seconds the top tags are reused before being recomputed and number of tags shown per window
+DWITTER_TRENDING_CACHE: str = "default"
+DWITTER_TRENDING_TIMEOUT: int = 60
+DWITTER_TRENDING_SIZE: int = 5
+
+# Number of "who to follow" suggestions kept per profile by recommend_follows, see dwitter.recommendations
+DWITTER_SUGGESTIONS_SIZE: int = 10
+
+# Most followed usernames each process keeps for typeahead, and seconds before reloading them, see dwitter.usernames
+DWITTER_TYPEAHEAD_CACHE_SIZE: int = 10000
+DWITTER_TYPEAHEAD_CACHE_TIMEOUT: int = 60
+
+# Background jobs, see dwitter.jobs
+# run jobs inline when queued instead of in run_jobs workers, seconds a worker leases a job for, attempts before a
+# failing job is dead-lettered and seconds before the first retry, doubled for every further attempt
+DWITTER_JOBS_EAGER: bool = True
+DWITTER_JOBS_LEASE: int = 60 * 5
+DWITTER_JOBS_MAX_ATTEMPTS: int = 5
+DWITTER_JOBS_RETRY_DELAY: int = 10
+
+# Alias of the read replica the GET dwitter views read from, None to read everything from "default", and seconds a
+# client keeps reading the primary after a write, see dwitter.routers and dwitter.middleware
+DWITTER_REPLICA_DATABASE: Optional[str] = None
+DWITTER_REPLICA_PIN: int = 5
+
+# Aliases of the databases the Dweets are sharded across by author, empty to keep them all on "default", and threads
+# reading the shards in parallel, see dwitter.sharding
+DWITTER_DWEET_SHARDS: List[str] = []
+DWITTER_SHARD_READ_WORKERS: int = 4
+
+# Cache alias and timeout (seconds) of the per-session viewers, the logged in user with its follows, None to load
+# them on every request, see dwitter.viewer.  The cache must be shared by every process (e.g. Redis), invalidations
+# would only reach the worker they are made in with a per-process local-memory cache
+DWITTER_VIEWER_CACHE: Optional[str] = None
+DWITTER_VIEWER_CACHE_TIMEOUT: int = 60 * 15
+
+# Pragmas run on every new connection of the tuned SQLite backend, selected with DWITTER_SQLITE_TUNING in
+# social/settings.py, see dwitter.backends.sqlite3.  mmap_size in bytes, a negative cache_size in KiB
+DWITTER_SQLITE_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
@@ -34,9 +34,23 @@ SECURE_HSTS_SECONDS: int = 0
 
 ADMIN_URL_PREPEND: str = "prepend"
 
+# the tests run in a single process, so the local-memory cache is shared and sessions and viewers can be cached
+SESSION_ENGINE: str = "django.contrib.sessions.backends.cached_db"
+DWITTER_VIEWER_CACHE: str = "default"
+
 DATABASES: dict = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": "db.sqlite3",
     }
 }
+
+# Second SQLite file standing in for a read replica, only created for the tests using it, see test_replicas.py
+DATABASES["replica"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": "db_replica.sqlite3",
+}
+
+# SQLite files standing in for Dweet shards, only created for the tests using them, see test_sharding.py
+DATABASES["shard_0"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": "db_shard_0.sqlite3"}
+DATABASES["shard_1"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": "db_shard_1.sqlite3"}